@@ -68,7 +68,10 @@ export async function uploadReport(reportDto: Report, files: Express.Multer.File
   }
 
   // Normalize to the DAO expected shape: { Coordinates: { latitude, longitude } }
-  const normalizedLocation = { Coordinates: { latitude: Number(coords.latitude), longitude: Number(coords.longitude) } };
+  const normalizedLocation = {
+    ...(typeof rawLocation.name === 'string' && rawLocation.name ? { name: rawLocation.name } : {}),
+    Coordinates: { latitude: Number(coords.latitude), longitude: Number(coords.longitude) }
+  };
 
   // check min 1 max 3 photos
   validatePhotosCount(files);
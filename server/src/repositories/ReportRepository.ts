@@ -71,6 +71,21 @@ export class ReportRepository {
     });
   }
 
+  async getReportsByUserIdPage(userId: number, page: number, limit: number): Promise<[ReportDAO[], number]> {
+    const where = [ReportState.ASSIGNED, ReportState.IN_PROGRESS, ReportState.SUSPENDED].map(state => ({
+      state,
+      author: { id: userId }
+    }));
+    return this.repo.findAndCount({
+      where,
+      relations: ["author"],
+      // Stable order, so consecutive pages neither repeat nor skip reports
+      order: { id: "ASC" },
+      skip: page * limit,
+      take: limit
+    });
+  }
+
   async getReportsByAssignedOfficer(officerId: number): Promise<ReportDAO[]> {
     return this.repo.find({
       where: {
@@ -27,7 +27,13 @@ router.post("/", authenticateToken, requireUserType(["user"]), uploadPhotos, asy
             document: {
                 description: req.body.description || undefined
             },
-            location: (lat !== undefined && lng !== undefined) ? { Coordinates: { latitude: lat, longitude: lng } } : undefined
+            location: (lat !== undefined && lng !== undefined)
+                ? {
+                    // Optional human-readable address (e.g. reverse-geocoded by the Telegram bot)
+                    ...(req.body.address ? { name: String(req.body.address) } : {}),
+                    Coordinates: { latitude: lat, longitude: lng }
+                }
+                : undefined
         };
 
                 const files = req.files as Express.Multer.File[];
@@ -7,12 +7,23 @@ import { FaqRepository } from "@repositories/FaqRepository";
 
 
 const router = Router({ mergeParams: true });
+const MAX_PAGE_SIZE = 50;
 
 router.get("/reports", authenticateToken, requireUserType(["user"]), async (req, res, next) => {
     try {
         const reportRepo = new ReportRepository();
         const userId = (req as any).user?.id;
 
+        // ?page=&limit= returns one page with the total; without them, the whole list
+        const limit = Number.parseInt(String(req.query.limit ?? ""));
+        if (Number.isInteger(limit) && limit > 0) {
+            const page = Math.max(0, Number.parseInt(String(req.query.page ?? "0")) || 0);
+            const pageSize = Math.min(limit, MAX_PAGE_SIZE);
+            const [pageReports, total] = await reportRepo.getReportsByUserIdPage(userId, page, pageSize);
+            res.status(200).json({ reports: pageReports.map(ReportFromJSON), page, limit: pageSize, total });
+            return;
+        }
+
         let reports;
         reports = await reportRepo.getReportsByUserId(userId);
 
@@ -266,6 +266,33 @@ describe('reportController', () => {
       expect(result).toBeDefined();
     });
 
+    it('should keep the address name of the location when provided', async () => {
+      const namedReport: Report = {
+        ...validReportDto,
+        anonymity: true,
+        location: {
+          name: 'Via Roma 12, Centro',
+          Coordinates: { latitude: 45.0703, longitude: 7.6869 }
+        }
+      } as any;
+
+      mockReportRepo.createReport.mockResolvedValue({ id: 12 } as any);
+
+      await uploadReport(namedReport, mockFiles);
+
+      expect(mockReportRepo.createReport).toHaveBeenCalledWith(
+        'New Report',
+        {
+          name: 'Via Roma 12, Centro',
+          Coordinates: { latitude: 45.0703, longitude: 7.6869 }
+        },
+        null,
+        true,
+        OfficeType.WATER_SUPPLY,
+        expect.any(Object)
+      );
+    });
+
     it('should upload anonymous report without user', async () => {
       const anonymousReport: Report = {
         ...validReportDto,
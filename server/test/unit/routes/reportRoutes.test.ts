@@ -242,6 +242,35 @@ describe("ReportRoutes", () => {
       );
     });
 
+    it("should pass the address as the location name", async () => {
+      (reportController.uploadReport as jest.Mock).mockResolvedValue({ id: 6 });
+
+      const res = await request(app)
+        .post("/reports")
+        .send({
+          title: "Report with address",
+          category: OfficeType.ROAD_SIGNS_AND_TRAFFIC_LIGHTS,
+          latitude: "45.1234",
+          longitude: "7.5678",
+          address: "Via Roma 12, Centro",
+        });
+
+      expect(res.status).toBe(200);
+      expect(reportController.uploadReport).toHaveBeenCalledWith(
+        expect.objectContaining({
+          location: {
+            name: "Via Roma 12, Centro",
+            Coordinates: {
+              latitude: 45.1234,
+              longitude: 7.5678,
+            },
+          },
+        }),
+        expect.any(Array),
+        1
+      );
+    });
+
     it("should upload report without coordinates when not provided", async () => {
       const mockReport = {
         id: 6,
@@ -44,6 +44,7 @@ describe("Telegram Routes - Unit Tests", () => {
     // Mock repositories
     mockReportRepository = {
       getReportsByUserId: jest.fn(),
+      getReportsByUserIdPage: jest.fn(),
     } as any;
 
     mockFollowRepository = {
@@ -139,6 +140,28 @@ describe("Telegram Routes - Unit Tests", () => {
 
       expect(mockReportRepository.getReportsByUserId).toHaveBeenCalledWith(42);
     });
+
+    it("should return one page with the total when limit is given", async () => {
+      const mockReport = { id: 7, title: "Paged", state: ReportState.ASSIGNED, author: { id: 1 } } as ReportDAO;
+      mockReportRepository.getReportsByUserIdPage.mockResolvedValue([[mockReport], 11]);
+
+      const response = await request(app).get("/telegram/reports?page=2&limit=5");
+
+      expect(response.status).toBe(200);
+      expect(response.body.reports).toHaveLength(1);
+      expect(response.body).toMatchObject({ page: 2, limit: 5, total: 11 });
+      expect(mockReportRepository.getReportsByUserIdPage).toHaveBeenCalledWith(1, 2, 5);
+      expect(mockReportRepository.getReportsByUserId).not.toHaveBeenCalled();
+    });
+
+    it("should cap the page size", async () => {
+      mockReportRepository.getReportsByUserIdPage.mockResolvedValue([[], 0]);
+
+      const response = await request(app).get("/telegram/reports?limit=1000");
+
+      expect(response.body).toMatchObject({ page: 0, limit: 50, total: 0 });
+      expect(mockReportRepository.getReportsByUserIdPage).toHaveBeenCalledWith(1, 0, 50);
+    });
   });
 
   describe("POST /telegram/reports", () => {
@@ -0,0 +1,251 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from . import metrics
+
+try:
+    import redis.asyncio as aioredis
+except ImportError:  # redis is optional, single-instance deployments don't need it
+    aioredis = None
+
+# ------------------------------------------------------------------ #
+# Configuration
+# ------------------------------------------------------------------ #
+REDIS_URL = os.getenv("REDIS_URL", "")
+LOCK_TTL_MS = int(os.getenv("CHAT_LOCK_TTL_MS", "5000"))
+LOCK_WAIT_S = float(os.getenv("CHAT_LOCK_WAIT_S", "10"))
+MAX_CONCURRENT_UPDATES = int(os.getenv("MAX_CONCURRENT_UPDATES", "64"))
+# Updates accepted at once, running or waiting for their chat
+MAX_QUEUED_UPDATES = int(os.getenv("MAX_QUEUED_UPDATES", "1024"))
+# Updates of one chat waiting behind the one being processed; more are dropped
+CHAT_MAX_PENDING = int(os.getenv("CHAT_MAX_PENDING", "4"))
+
+
+# ------------------------------------------------------------------ #
+# Lease stores
+# ------------------------------------------------------------------ #
+class LocalLeaseStore:
+    """In-process stand-in for Redis, used when REDIS_URL is not set."""
+
+    def __init__(self) -> None:
+        self._leases: Dict[str, Tuple[int, float]] = {}
+        self._last_token = 0
+
+    async def acquire(self, key: str, ttl_ms: int) -> Optional[int]:
+        now = time.monotonic()
+        lease = self._leases.get(key)
+        if lease is not None and lease[1] > now:
+            return None
+        self._last_token += 1
+        self._leases[key] = (self._last_token, now + ttl_ms / 1000)
+        return self._last_token
+
+    async def extend(self, key: str, token: int, ttl_ms: int) -> bool:
+        lease = self._leases.get(key)
+        if lease is None or lease[0] != token:
+            return False
+        self._leases[key] = (token, time.monotonic() + ttl_ms / 1000)
+        return True
+
+    async def release(self, key: str, token: int) -> bool:
+        lease = self._leases.get(key)
+        if lease is None or lease[0] != token:
+            return False
+        del self._leases[key]
+        return True
+
+    async def close(self) -> None:
+        self._leases.clear()
+
+
+# Acquire: SET NX with a token unique across replicas, in a single round trip
+_ACQUIRE_LUA = """
+if redis.call('EXISTS', KEYS[1]) == 1 then return 0 end
+local token = redis.call('INCR', KEYS[2])
+redis.call('SET', KEYS[1], token, 'PX', ARGV[1])
+return token
+"""
+_EXTEND_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('PEXPIRE', KEYS[1], ARGV[2]) end
+return 0
+"""
+_RELEASE_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then return redis.call('DEL', KEYS[1]) end
+return 0
+"""
+
+
+class RedisLeaseStore:
+    """Lease store shared by every bot replica."""
+
+    def __init__(self, url: str, prefix: str = "participium:chatlock:") -> None:
+        self._redis = aioredis.from_url(url)
+        self._prefix = prefix
+        self._acquire = self._redis.register_script(_ACQUIRE_LUA)
+        self._extend = self._redis.register_script(_EXTEND_LUA)
+        self._release = self._redis.register_script(_RELEASE_LUA)
+
+    async def acquire(self, key: str, ttl_ms: int) -> Optional[int]:
+        token = await self._acquire(keys=[self._prefix + key, self._prefix + "tokens"], args=[ttl_ms])
+        return int(token) or None
+
+    async def extend(self, key: str, token: int, ttl_ms: int) -> bool:
+        return bool(await self._extend(keys=[self._prefix + key], args=[token, ttl_ms]))
+
+    async def release(self, key: str, token: int) -> bool:
+        return bool(await self._release(keys=[self._prefix + key], args=[token]))
+
+    async def close(self) -> None:
+        await self._redis.aclose()
+
+
+def build_lease_store():
+    if REDIS_URL and aioredis is not None:
+        return RedisLeaseStore(REDIS_URL)
+    if REDIS_URL:
+        print("REDIS_URL is set but the redis package is missing; using local chat locks.")
+    return LocalLeaseStore()
+
+
+# ------------------------------------------------------------------ #
+# Update processor
+# ------------------------------------------------------------------ #
+class ChatLockUpdateProcessor(BaseUpdateProcessor):
+    """Processes updates concurrently across chats but one at a time per chat.
+
+    Updates of the same chat first queue on a local asyncio.Lock, so only
+    one of them at a time talks to the lease store, then take a short lease
+    that is renewed while the handler runs. The lease only keeps replicas
+    from handling the same chat at once: a holder stalled past its TTL can
+    overlap with the next one.
+
+    PTB holds one of its slots (``max_queued_updates`` here) for as long as
+    an update is in ``do_process_update``, waiting included. Handlers run
+    under a separate ``max_concurrent_updates`` semaphore taken only once
+    the chat's lock is held, and a chat can have at most
+    ``max_pending_per_chat`` updates waiting, so a busy chat cannot starve
+    the others.
+
+    ``bypass`` sees each update before it queues; when it returns True the
+    update was fully handled there and is not processed further.
+
+    Work started outside of an update (e.g. a debounced album) goes through
+    ``run_for_chat`` to be serialized with the chat's updates.
+    """
+
+    def __init__(self, store=None, max_concurrent_updates: int = MAX_CONCURRENT_UPDATES,
+                 ttl_ms: int = LOCK_TTL_MS, wait_s: float = LOCK_WAIT_S,
+                 max_queued_updates: int = MAX_QUEUED_UPDATES,
+                 max_pending_per_chat: int = CHAT_MAX_PENDING,
+                 bypass: Optional[Callable[[Update], Awaitable[bool]]] = None) -> None:
+        super().__init__(max(max_queued_updates, max_concurrent_updates))
+        self.store = store if store is not None else build_lease_store()
+        self.ttl_ms = ttl_ms
+        self.wait_s = wait_s
+        self.max_pending_per_chat = max_pending_per_chat
+        self.bypass = bypass
+        self._running = asyncio.Semaphore(max_concurrent_updates)
+        # chat -> (lock, updates holding or waiting for it); dropped when the last one leaves
+        self._chats: Dict[str, Tuple[asyncio.Lock, int]] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        await self.store.close()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        chat = update.effective_chat if isinstance(update, Update) else None
+        if chat is None:
+            async with self._running:
+                await coroutine
+            return
+        if self.bypass is not None and await self.bypass(update):
+            metrics.inc("chatlock.bypassed")
+            coroutine.close()
+            return
+        await self._run(str(chat.id), coroutine, f"update {update.update_id}", bounded=True)
+
+    async def run_for_chat(self, chat_id: int, coroutine: Awaitable[Any]) -> None:
+        """Run ``coroutine`` like an update of the chat: after the ones already
+        queued for it, before later ones. Never dropped for overflow."""
+        await self._run(str(chat_id), coroutine, "chat task", bounded=False)
+
+    async def _run(self, key: str, coroutine: Awaitable[Any], what: str, bounded: bool) -> None:
+        local, count = self._chats.get(key, (None, 0))
+        if local is None:
+            local = asyncio.Lock()
+        elif bounded and count > self.max_pending_per_chat:
+            metrics.inc("chatlock.overflow")
+            print(f"Dropping {what}: too many pending updates for chat {key}")
+            coroutine.close()
+            return
+        self._chats[key] = (local, count + 1)
+        try:
+            async with local:
+                await self._process_locked(key, coroutine, what)
+        finally:
+            local, count = self._chats[key]
+            if count == 1:
+                del self._chats[key]
+            else:
+                self._chats[key] = (local, count - 1)
+
+    async def _process_locked(self, key: str, coroutine: Awaitable[Any], what: str) -> None:
+        token = await self._acquire(key)
+        if token is None:
+            metrics.inc("chatlock.timeouts")
+            print(f"Dropping {what}: chat {key} is locked by another instance")
+            coroutine.close()
+            return
+        renew = asyncio.create_task(self._renew(key, token))
+        try:
+            async with self._running:
+                await coroutine
+            metrics.mark_first_response()
+        finally:
+            renew.cancel()
+            await self.store.release(key, token)
+
+    async def _acquire(self, key: str) -> Optional[int]:
+        # Fast path: a single round trip to the lease store
+        token = await self.store.acquire(key, self.ttl_ms)
+        metrics.inc("chatlock.attempts")
+        if token is not None:
+            return token
+        metrics.inc("chatlock.contended")
+        started = time.perf_counter()
+        deadline = started + self.wait_s
+        delay = 0.02
+        while time.perf_counter() < deadline:
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 0.5)
+            token = await self.store.acquire(key, self.ttl_ms)
+            if token is not None:
+                metrics.observe("chatlock.wait_seconds", time.perf_counter() - started)
+                return token
+        return None
+
+    async def _renew(self, key: str, token: int) -> None:
+        interval = self.ttl_ms / 3000
+        while True:
+            await asyncio.sleep(interval)
+            if not await self.store.extend(key, token, self.ttl_ms):
+                metrics.inc("chatlock.lost")
+                print(f"Lost chat lock for {key} (token {token})")
+                return
+
+
+def run_for_chat(application, chat_id: int, coroutine: Awaitable[Any]) -> Awaitable[Any]:
+    """``coroutine`` serialized with the chat's updates when the application
+    uses the chat lock; unchanged otherwise."""
+    processor = getattr(application, "update_processor", None)
+    if isinstance(processor, ChatLockUpdateProcessor):
+        return processor.run_for_chat(chat_id, coroutine)
+    return coroutine
@@ -0,0 +1,206 @@
+from __future__ import annotations
+import json
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+from .photos import close_all
+
+# ------------------------------------------------------------------ #
+# Conversation states
+# ------------------------------------------------------------------ #
+WAITING_TITLE = 1
+WAITING_DESCRIPTION = 2
+WAITING_CATEGORY = 3
+WAITING_PHOTO = 4
+WAITING_LOCATION = 5
+WAITING_ANONYMOUS = 6
+
+# Bump when the positional layout of dumps() changes
+_SERIAL_VERSION = 4
+
+
+class ReportDraft:
+    """State of a report being composed, one instance per chat.
+
+    Replaces the loose ``context.user_data`` keys: each step of the
+    conversation has a typed field and a transition method that returns the
+    next state, so handlers only need ``return draft.set_xxx(...)``.
+    """
+
+    __slots__ = (
+        "title",
+        "description",
+        "category",
+        "photos",
+        "latitude",
+        "longitude",
+        "address",
+        "photo_location",
+        "anonymous",
+        "step",
+        "idempotency_key",
+    )
+
+    def __init__(self) -> None:
+        self.title: Optional[str] = None
+        self.description: Optional[str] = None
+        self.category: Optional[str] = None
+        # PhotoBuffer objects; drafts restored with loads() hold Telegram file_ids
+        self.photos: List[Any] = []
+        self.latitude: Optional[float] = None
+        self.longitude: Optional[float] = None
+        # Street address of the location, sent along with the coordinates
+        self.address: Optional[str] = None
+        # EXIF coordinates of a photo, offered as a one-tap location
+        self.photo_location: Optional[Tuple[float, float]] = None
+        self.anonymous: Optional[bool] = None
+        self.step: int = WAITING_TITLE
+        # Sent with POST /reports so retries and repeated taps map to one report
+        self.idempotency_key: str = uuid.uuid4().hex
+
+    # -------------------------------------------------------------- #
+    # Transitions
+    # -------------------------------------------------------------- #
+    def set_title(self, title: str) -> int:
+        self.title = title
+        self.step = WAITING_DESCRIPTION
+        return self.step
+
+    def set_description(self, description: str) -> int:
+        self.description = description
+        self.step = WAITING_CATEGORY
+        return self.step
+
+    def set_category(self, category: str) -> int:
+        # A new category starts a fresh photo collection
+        self.category = category
+        self.discard_photos()
+        self.step = WAITING_PHOTO
+        return self.step
+
+    def add_photo(self, photo: Any) -> int:
+        """Append a photo reference and return how many photos the draft holds."""
+        self.photos.append(photo)
+        return len(self.photos)
+
+    def finish_photos(self) -> int:
+        self.step = WAITING_LOCATION
+        return self.step
+
+    def set_location(self, latitude: float, longitude: float, address: Optional[str] = None) -> int:
+        self.latitude = latitude
+        self.longitude = longitude
+        self.address = address
+        self.step = WAITING_ANONYMOUS
+        return self.step
+
+    def rewind(self, step: int) -> int:
+        """Go back to ``step``, dropping what was collected from that step on.
+
+        Going back to the photo step keeps the photos already received so
+        the user can add more instead of starting over.
+        """
+        if step <= WAITING_TITLE:
+            self.title = None
+        if step <= WAITING_DESCRIPTION:
+            self.description = None
+        if step <= WAITING_CATEGORY:
+            self.category = None
+            self.discard_photos()
+        if step <= WAITING_LOCATION:
+            self.latitude = None
+            self.longitude = None
+            self.address = None
+        self.anonymous = None
+        self.step = step
+        return self.step
+
+    def discard_photos(self) -> None:
+        """Release the photo buffers held by the draft."""
+        close_all(self.photos)
+        self.photos = []
+        self.photo_location = None
+
+    # -------------------------------------------------------------- #
+    # Submission / persistence
+    # -------------------------------------------------------------- #
+    def to_form(self) -> Dict[str, str]:
+        """Multipart form fields expected by ``POST /reports``."""
+        form = {
+            "title": self.title or "",
+            "description": self.description or "",
+            "category": self.category or "",
+            "latitude": str(self.latitude),
+            "longitude": str(self.longitude),
+            "anonymity": "1" if self.anonymous else "0",
+        }
+        if self.address:
+            form["address"] = self.address
+        return form
+
+    def dumps(self) -> bytes:
+        """Compact positional encoding, no field names are stored."""
+        payload = [
+            _SERIAL_VERSION,
+            self.step,
+            self.title,
+            self.description,
+            self.category,
+            [getattr(photo, "file_id", photo) for photo in self.photos],
+            self.latitude,
+            self.longitude,
+            self.address,
+            list(self.photo_location) if self.photo_location else None,
+            self.anonymous,
+            self.idempotency_key,
+        ]
+        return json.dumps(payload, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+
+    @classmethod
+    def loads(cls, raw: bytes) -> "ReportDraft":
+        payload = json.loads(raw)
+        if not payload or payload[0] != _SERIAL_VERSION:
+            raise ValueError("Unsupported draft serialization version")
+        draft = cls()
+        (
+            _,
+            draft.step,
+            draft.title,
+            draft.description,
+            draft.category,
+            draft.photos,
+            draft.latitude,
+            draft.longitude,
+            draft.address,
+            photo_location,
+            draft.anonymous,
+            draft.idempotency_key,
+        ) = payload
+        draft.photo_location = tuple(photo_location) if photo_location else None
+        return draft
+
+    def __repr__(self) -> str:
+        return f"ReportDraft(step={self.step}, title={self.title!r}, photos={len(self.photos)})"
+
+
+def new_draft(user_data: dict) -> ReportDraft:
+    """Start a fresh draft for the chat, discarding any previous one."""
+    discard_draft(user_data)
+    draft = ReportDraft()
+    user_data["draft"] = draft
+    return draft
+
+
+def discard_draft(user_data: dict) -> None:
+    """Drop the chat's draft and release its photos."""
+    draft = user_data.pop("draft", None)
+    if draft is not None:
+        draft.discard_photos()
+
+
+def get_draft(user_data: dict) -> ReportDraft:
+    """Return the chat's draft, creating one if the conversation lost it."""
+    draft = user_data.get("draft")
+    if draft is None:
+        draft = new_draft(user_data)
+    return draft
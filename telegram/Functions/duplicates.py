@@ -0,0 +1,124 @@
+from __future__ import annotations
+import os
+import re
+import unicodedata
+from array import array
+from typing import Dict, List, Set, Tuple
+
+from . import metrics
+from .nearby import IndexedReport, ReportIndex
+
+# ------------------------------------------------------------------ #
+# Duplicate report detection
+# ------------------------------------------------------------------ #
+# Before the anonymity step the draft is compared with the public reports
+# around its location (the /nearby grid index): reports within
+# DUPLICATE_RADIUS_M whose title or text shares enough character trigrams
+# with the draft are offered to the user to follow instead.
+#
+# Trigrams are numbered in a shared vocabulary and kept per report as a
+# sorted array of 32-bit ids, computed the first time the report is a
+# candidate. A comparison is one membership test per trigram of the report.
+
+DUPLICATE_RADIUS_M = float(os.getenv("DUPLICATE_RADIUS_M", "150"))
+# Dice coefficient of the trigram sets, 0..1
+DUPLICATE_MIN_SIMILARITY = float(os.getenv("DUPLICATE_MIN_SIMILARITY", "0.35"))
+DUPLICATE_MAX_RESULTS = 3
+# Reports looked at around the location, closest first
+DUPLICATE_MAX_CANDIDATES = 100
+# A report in the same category ranks above an equally similar one
+SAME_CATEGORY_BONUS = 0.1
+
+# Reports in these states can no longer be followed
+_CLOSED_STATES = {"RESOLVED", "DECLINED"}
+
+_NON_WORD = re.compile(r"[\W_]+")
+_vocabulary: Dict[str, int] = {}
+
+
+def normalize(text: str) -> str:
+    """Lowercase words without accents or punctuation, single-spaced."""
+    text = unicodedata.normalize("NFKD", text.lower())
+    text = "".join(c for c in text if not unicodedata.combining(c))
+    return " ".join(_NON_WORD.sub(" ", text).split())
+
+
+def _grams(text: str):
+    # Words padded like pg_trgm: "  buca " -> "  b", " bu", "buc", "uca", "ca "
+    for word in normalize(text).split():
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            yield padded[i:i + 3]
+
+
+def trigrams(text: str) -> array:
+    """Sorted vocabulary ids of the trigrams of ``text`` (grows the vocabulary)."""
+    ids = set()
+    for gram in _grams(text):
+        gram_id = _vocabulary.get(gram)
+        if gram_id is None:
+            gram_id = _vocabulary[gram] = len(_vocabulary)
+        ids.add(gram_id)
+    return array("I", sorted(ids))
+
+
+def query_trigrams(text: str) -> Tuple[Set[int], int]:
+    """(known trigram ids, number of distinct trigrams) of a draft's text.
+
+    Trigrams no report has can't match anything, so they are only counted:
+    user input does not grow the vocabulary.
+    """
+    distinct = set(_grams(text))
+    return {_vocabulary[g] for g in distinct if g in _vocabulary}, len(distinct)
+
+
+def similarity(query: Tuple[Set[int], int], grams: array) -> float:
+    known, size = query
+    if not size or not grams:
+        return 0.0
+    shared = sum(1 for gram_id in grams if gram_id in known)
+    return 2 * shared / (size + len(grams))
+
+
+def _report_grams(report: IndexedReport) -> Tuple[array, array]:
+    if report.grams is None:
+        report.grams = (trigrams(report.title), trigrams(f"{report.title} {report.description}"))
+    return report.grams
+
+
+def find_duplicates(index: ReportIndex, lat: float, lon: float, title: str, description: str,
+                    category: str = "", radius_m: float = DUPLICATE_RADIUS_M,
+                    min_similarity: float = DUPLICATE_MIN_SIMILARITY,
+                    limit: int = DUPLICATE_MAX_RESULTS) -> List[Tuple[float, float, IndexedReport]]:
+    """Open reports near (lat, lon) resembling the draft: (similarity, distance, report), best first."""
+    candidates = index.nearest(lat, lon, DUPLICATE_MAX_CANDIDATES, radius_m)
+    if not candidates:
+        return []
+    title_query = query_trigrams(title)
+    text_query = query_trigrams(f"{title} {description}")
+    found = []
+    for distance, report in candidates:
+        if report.state in _CLOSED_STATES:
+            continue
+        title_grams, text_grams = _report_grams(report)
+        score = max(similarity(title_query, title_grams), similarity(text_query, text_grams))
+        if score < min_similarity:
+            continue
+        rank = score + (SAME_CATEGORY_BONUS if category and report.category == category else 0)
+        found.append((rank, -distance, score, distance, report))
+    found.sort(key=lambda item: item[:2], reverse=True)
+    return [(score, distance, report) for _, _, score, distance, report in found[:limit]]
+
+
+def check_draft(index: ReportIndex, draft) -> List[Tuple[float, float, IndexedReport]]:
+    """Duplicates of a draft that has its location set; empty if the index is not loaded."""
+    if not len(index) or draft.latitude is None:
+        return []
+    metrics.inc("duplicates.checks")
+    with metrics.timer("duplicates.lookup_seconds"):
+        found = find_duplicates(index, draft.latitude, draft.longitude, draft.title or "",
+                                draft.description or "", draft.category or "")
+    if found:
+        metrics.inc("duplicates.offered")
+    metrics.set_gauge("duplicates.vocabulary", len(_vocabulary))
+    return found
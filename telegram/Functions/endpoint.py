@@ -1,11 +1,15 @@
 from __future__ import annotations
+import asyncio
+import functools
+import operator
 import os
-from typing import List, Dict
+import time
+from typing import List, Dict, Optional
 from telegram import InputFile
 import aiofiles
 import io
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from .login import build_main_menu
+from .login import build_main_menu, ensure_session
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -16,40 +20,71 @@ from telegram.ext import (
     ContextTypes,
 )
 import httpx
-from .start import BASE_URL, TELEGRAM_REPORT_URL,sessions, _httpx_with_retry
+from .start import sessions
+from .photos import (
+    PhotoBuffer,
+    TELEGRAM_DOWNLOAD_LIMIT,
+    wait_for_photos,
+    select_photo_size,
+    needs_shrink,
+    format_size,
+    can_buffer,
+    DOCUMENT_IMAGE_MIMES,
+)
+from .draft import (
+    ReportDraft,
+    new_draft,
+    get_draft,
+    discard_draft,
+    WAITING_TITLE,
+    WAITING_DESCRIPTION,
+    WAITING_CATEGORY,
+    WAITING_PHOTO,
+    WAITING_LOCATION,
+    WAITING_ANONYMOUS,
+)
+from . import duplicates, geocoder, media_groups, metrics, nearby, reverse_geocoder, submissions, tenants, transfers
+from .notifications import follow_report
+from .report_pages import report_lists
+from .phash_index import PHASH_NEAR_DISTANCE, hamming
+from .multipart import MultipartBody
+from .chatlock import run_for_chat
 from urllib.parse import urlparse
 # ------------------------------------------------------------------ #
 # Configuration / State
 # ------------------------------------------------------------------ #
 
-# Conversation states
-WAITING_TITLE = 1
-WAITING_DESCRIPTION = 2
-WAITING_CATEGORY = 3
-WAITING_PHOTO = 4
-WAITING_LOCATION = 5
-WAITING_ANONYMOUS = 6
-
 # Text strings used in the conversation flow
 str_ch_category = "Please choose a category for your report:"
 str_going_back = "Going back to the previous step."
-str_send_location = "Please send your location (must be within Turin area)."
+str_send_location = "Please send your location (must be within {city} area)."
 
-categories: List[str] = []
+MAX_PHOTOS = 3
+# Minimum time between two "Uploading… N%" edits of the same message
+UPLOAD_PROGRESS_INTERVAL_S = float(os.getenv("UPLOAD_PROGRESS_INTERVAL_S", "2"))
 
-async def load_categories() -> None:
-    """Load categories asynchronously at startup."""
-    global categories
+async def load_categories(tenant: Optional[tenants.Tenant] = None) -> None:
+    """Load the categories of a tenant (the default one if omitted) at startup."""
+    tenant = tenant or tenants.default()
     try:
         # Remove DNS pre-check; just try to fetch
-        response = await _httpx_with_retry("GET", f"{BASE_URL}/info-types")
+        response = await tenant.request("GET", "/info-types")
         response.raise_for_status()
         data = response.json()
-        categories = data.get("officeTypes", []) or []
-        print("Loaded categories:", categories)
+        tenant.set_categories(data.get("officeTypes", []) or [])
+        print(f"Loaded categories of {tenant.name}:", tenant.categories)
     except Exception as e:
-        print("Failed to load categories:", e)
-        categories = []
+        print(f"Failed to load categories of {tenant.name}:", e)
+        # Keep categories restored from the warm-start snapshot, if any
+        if not tenant.categories:
+            tenant.set_categories([])
+
+async def load_all_categories() -> None:
+    await asyncio.gather(*(load_categories(tenant) for tenant in tenants.all_tenants()))
+
+def set_categories(values: List[str], keyboard: Optional[InlineKeyboardMarkup] = None,
+                   tenant: Optional[tenants.Tenant] = None) -> None:
+    (tenant or tenants.default()).set_categories(values, keyboard)
 
         
 # ------------------------------------------------------------------ #
@@ -67,14 +102,18 @@ def build_back_cancel_keyboard(prefix: str) -> InlineKeyboardMarkup:
     # Se vuoi l'intero markup (non usarlo dentro altre tastiere)
     return InlineKeyboardMarkup([build_back_cancel_row(prefix)])
 
-def build_category_keyboard() -> InlineKeyboardMarkup:
+def build_category_keyboard(tenant: Optional[tenants.Tenant] = None) -> InlineKeyboardMarkup:
+    tenant = tenant or tenants.default()
+    if tenant.category_keyboard is not None:
+        return tenant.category_keyboard
     keyboard = [
         [InlineKeyboardButton(label, callback_data=f"category_{i}")]
-        for i, label in enumerate(categories)
+        for i, label in enumerate(tenant.categories)
     ]
     # Append la riga, non un InlineKeyboardMarkup
     keyboard.append(build_back_cancel_row("description"))
-    return InlineKeyboardMarkup(keyboard)
+    tenant.category_keyboard = InlineKeyboardMarkup(keyboard)
+    return tenant.category_keyboard
 
 def build_yes_no_keyboard(prefix: str) -> InlineKeyboardMarkup:
     return InlineKeyboardMarkup(
@@ -86,17 +125,48 @@ def build_yes_no_keyboard(prefix: str) -> InlineKeyboardMarkup:
         ]
     )
 
-def in_turin(latitude: float, longitude: float) -> bool:
-    return 44.9 <= latitude <= 45.2 and 7.5 <= longitude <= 7.8
+class UploadProgress:
+    """Throttled progress edits of the anonymity message during the upload.
+
+    Called synchronously by the body producer; the edit itself runs as a
+    task so Telegram latency never slows down the upload.
+    """
+
+    def __init__(self, query) -> None:
+        self.query = query
+        self.last_edit = time.monotonic()
+        self.task: Optional[asyncio.Task] = None
+
+    def __call__(self, sent: int, total: int) -> None:
+        now = time.monotonic()
+        if sent >= total or now - self.last_edit < UPLOAD_PROGRESS_INTERVAL_S:
+            return
+        if self.task is not None and not self.task.done():
+            return
+        self.last_edit = now
+        self.task = asyncio.create_task(self._edit(f"⏳ Uploading your report… {sent * 100 // total}%"))
+
+    async def _edit(self, text: str) -> None:
+        try:
+            await self.query.edit_message_text(text)
+        except Exception as e:
+            print(f"Failed to show upload progress: {e}")
+
+    async def settle(self) -> None:
+        """Wait for a pending edit so it cannot overwrite the final message."""
+        if self.task is not None:
+            await self.task
+
 # ------------------------------------------------------------------ #
 # Handlers
 # ------------------------------------------------------------------ #
 
 async def send_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     chat_id = update.effective_chat.id
-    if chat_id not in sessions:
+    if not await ensure_session(update):
         await update.message.reply_text("You must first log in with /login.")
         return ConversationHandler.END
+    new_draft(context.user_data)
     # Use only the Cancel button, properly wrapped as a single row
     keyboard = [build_cancel_button()]
     await update.message.reply_text(
@@ -106,13 +176,14 @@ async def send_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     return WAITING_TITLE
 
 async def receive_title(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    context.user_data["title"] = update.message.text.strip()
+    draft = get_draft(context.user_data)
+    next_state = draft.set_title(update.message.text.strip())
     # build_back_cancel_keyboard returns InlineKeyboardMarkup; pass it directly
     await update.message.reply_text(
         "Title received. Now send the description.",
         reply_markup=build_back_cancel_keyboard("title")
     )
-    return WAITING_DESCRIPTION
+    return next_state
 
 async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     description = (update.message.text or "").strip()
@@ -122,95 +193,239 @@ async def receive_description(update: Update, context: ContextTypes.DEFAULT_TYPE
     if len(description) < 30:
         await update.message.reply_text("Description must be at least 30 characters. Send a more detailed description.")
         return WAITING_DESCRIPTION
-    context.user_data["description"] = description
-    await update.message.reply_text(str_ch_category, reply_markup=build_category_keyboard())
-    return WAITING_CATEGORY
+    next_state = get_draft(context.user_data).set_description(description)
+    await update.message.reply_text(str_ch_category, reply_markup=build_category_keyboard(tenants.for_update(update)))
+    return next_state
 
 async def receive_category(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
     index = int(query.data.replace("category_", ""))
-    category = categories[index]
-    context.user_data["category"] = category
-    context.user_data["photos"] = []
+    category = tenants.for_update(update).categories[index]
+    next_state = get_draft(context.user_data).set_category(category)
     await query.edit_message_text(f"Category selected: {category}")
     keyboard= [
         build_back_cancel_row("category")
     ]
     await query.message.reply_text(
-        "Send at least 1 photo (max 3). When done, send /done.",
+        "Send at least 1 photo (max 3). When done, send /done. "
+        "Tip: photos sent as files keep their location.",
         reply_markup=InlineKeyboardMarkup(keyboard)
     )
+    return next_state
+
+def build_location_keyboard(draft: ReportDraft) -> InlineKeyboardMarkup:
+    rows = []
+    if draft.photo_location is not None:
+        rows.append([InlineKeyboardButton("📍 Use photo location", callback_data="use_photo_location")])
+    rows.append(build_back_cancel_row("photos"))
+    return InlineKeyboardMarkup(rows)
+
+async def _ask_location(message, draft: ReportDraft, text: str = str_send_location) -> None:
+    text = text.format(city=tenants.for_chat(message.chat_id).label)
+    if draft.photo_location is not None:
+        metrics.inc("location.prefill_offered")
+    if geocoder.get_geocoder() is not None:
+        text = f"{text}\nYou can also type the address, e.g. Via Garibaldi 10."
+    await message.reply_text(text, reply_markup=build_location_keyboard(draft))
+
+# Image documents accepted in the photo step; others (HEIC, TIFF...) cannot be decoded and cleaned
+IMAGE_DOCUMENTS = functools.reduce(operator.or_, map(filters.Document.MimeType, DOCUMENT_IMAGE_MIMES))
+
+def _photo_source(message):
+    """What to download: the best photo variant, or an image sent as a document."""
+    if message.photo:
+        return select_photo_size(message.photo)
+    return message.document
+
+def _can_accept(chat_id: int, source) -> bool:
+    size = source.file_size or 0
+    return size <= TELEGRAM_DOWNLOAD_LIMIT and can_buffer(chat_id, size)
+
+def _is_resend(draft: ReportDraft, photo_size) -> bool:
+    """Same Telegram file as a photo already in the draft (forwarded or sent twice)."""
+    name = f"{photo_size.file_unique_id}.jpg"
+    return any(getattr(photo, "name", None) == name for photo in draft.photos)
+
+def _photo_ready_callback(message, draft: ReportDraft):
+    async def on_ready(photo: PhotoBuffer) -> None:
+        # Runs in the download task, once the perceptual hash and EXIF are known
+        if photo not in draft.photos:
+            return
+        if photo.closed:
+            # Could not be decoded (or no Pillow), so not stripped of its metadata either
+            draft.photos.remove(photo)
+            await message.reply_text(
+                f"⚠️ Photo ignored: it could not be processed to remove its metadata. "
+                f"The report now has {len(draft.photos)}/3 photo(s)."
+            )
+            return
+        for index, other in enumerate(draft.photos):
+            other_hash = getattr(other, "phash", None)
+            if other is photo or other_hash is None or photo.phash is None:
+                continue
+            if hamming(photo.phash, other_hash) <= PHASH_NEAR_DISTANCE:
+                draft.photos.remove(photo)
+                photo.close()
+                metrics.inc("photos.duplicates_rejected")
+                await message.reply_text(
+                    f"⚠️ Photo ignored: it looks like a duplicate of photo {index + 1}. "
+                    f"The report now has {len(draft.photos)}/3 photo(s)."
+                )
+                return
+        if photo.gps is None or draft.photo_location is not None:
+            return
+        metrics.inc("location.photo_gps_found")
+        if not tenants.for_chat(message.chat_id).contains(*photo.gps):
+            metrics.inc("location.photo_gps_outside")
+            return
+        draft.photo_location = photo.gps
+        if draft.step == WAITING_LOCATION:
+            # The location prompt went out before this photo was processed
+            await _ask_location(message, draft, "📍 Your photo contains its location. Tap below to use it.")
+    return on_ready
+
+def _start_photo_download(draft: ReportDraft, message, source) -> int:
+    # Downloaded in the background straight into memory; awaited only on submit
+    photo = PhotoBuffer(source.file_id, f"{source.file_unique_id}.jpg", chat_id=message.chat_id)
+    photo.prefetch(source, shrink=needs_shrink(source), on_ready=_photo_ready_callback(message, draft))
+    return draft.add_photo(photo)
+
+def _matches_recent_report(tenant: tenants.Tenant, draft: ReportDraft) -> bool:
+    """Whether a photo of the draft resembles one from a report recently sent to the city."""
+    return any(
+        tenant.recent_photos.nearest(photo.phash) is not None
+        for photo in draft.photos
+        if getattr(photo, "phash", None) is not None
+    )
+
+def build_done_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("✅ Done", callback_data="done_photos")],
+        build_back_cancel_row("photos")
+    ])
+
+async def _flush_album(messages, context: ContextTypes.DEFAULT_TYPE, draft: ReportDraft) -> None:
+    """Add a whole album at once: one cap check, concurrent downloads, one reply."""
+    if context.user_data.get("draft") is not draft:
+        # Cancelled or restarted while the album was still arriving
+        return
+    selected = [(m, _photo_source(m)) for m in messages]
+    fresh = [(m, size) for m, size in selected if not _is_resend(draft, size)]
+    resent = len(selected) - len(fresh)
+    if resent:
+        metrics.inc("photos.duplicates_rejected", resent)
+    chat_id = messages[0].chat_id
+    no_room = sum(1 for _, source in fresh if not _can_accept(chat_id, source))
+    fresh = [(m, source) for m, source in fresh if _can_accept(chat_id, source)]
+    free = max(MAX_PHOTOS - len(draft.photos), 0)
+    accepted = fresh[:free]
+    for message, source in accepted:
+        _start_photo_download(draft, message, source)
+    ignored = len(fresh) - len(accepted)
+    if ignored:
+        metrics.inc("photos.over_cap", ignored)
+    num = len(draft.photos)
+    text = f"{len(accepted)} photo(s) received ({num}/3)."
+    if resent:
+        text += f" {resent} photo(s) already in the report ignored."
+    if no_room:
+        text += f" {no_room} photo(s) could not be accepted (over 20 MB or too many photos in progress)."
+    if ignored:
+        text += f" {ignored} extra photo(s) ignored, the maximum is 3."
+    if num >= MAX_PHOTOS:
+        text += " Maximum reached! Tap Done to continue."
+    else:
+        text += " Send another photo or tap Done."
+    await messages[0].reply_text(text, reply_markup=build_done_keyboard())
+
+async def receive_unsupported_document(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    draft = get_draft(context.user_data)
+    metrics.inc("photos.unsupported_documents")
+    await update.message.reply_text(
+        "⚠️ This file type is not supported. Send a JPEG, PNG or WebP image, or send it as a photo.",
+        reply_markup=build_done_keyboard() if draft.photos else None
+    )
     return WAITING_PHOTO
 
 async def receive_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    photos = context.user_data.setdefault("photos", [])
-    if len(photos) >= 3:
+    draft = get_draft(context.user_data)
+    if update.message.media_group_id:
+        # Album: buffered and handled once the whole group has arrived, behind
+        # the chat lock like an update so it cannot race the chat's next one
+        chat_id = update.effective_chat.id
+        media_groups.collect(update.message, lambda messages: run_for_chat(
+            context.application, chat_id, _flush_album(messages, context, draft)))
+        return WAITING_PHOTO
+    if len(draft.photos) >= MAX_PHOTOS:
         await update.message.reply_text("Already 3 photos. Processing...")
         return WAITING_PHOTO
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    photos_dir = os.path.join(script_dir, "photos")
-    os.makedirs(photos_dir, exist_ok=True)
-    photo_file = await update.message.photo[-1].get_file()
-    photo_path = os.path.join(photos_dir, f"{photo_file.file_id}.jpg")
-    await photo_file.download_to_drive(photo_path)
-    photos.append(photo_path)
-    num = len(photos)
-    
-    # If 3 photos, automatically move to next step
-    if num >= 3:
-        await update.message.reply_text(f"Photo {num}/3 received. Maximum reached!")
-        keyboard= [
-            build_back_cancel_row("photos")
-        ]
+    source = _photo_source(update.message)
+    if _is_resend(draft, source):
+        metrics.inc("photos.duplicates_rejected")
         await update.message.reply_text(
-            str_send_location,
-            reply_markup=InlineKeyboardMarkup(keyboard)
+            "⚠️ This photo is already in the report. Send a different photo or tap Done.",
+            reply_markup=build_done_keyboard()
         )
-        return WAITING_LOCATION
+        return WAITING_PHOTO
+    if (source.file_size or 0) > TELEGRAM_DOWNLOAD_LIMIT:
+        await update.message.reply_text(
+            "⚠️ This file is too large (max 20 MB). Please send it as a photo instead.",
+            reply_markup=build_done_keyboard() if draft.photos else None
+        )
+        return WAITING_PHOTO
+    if not can_buffer(update.effective_chat.id, source.file_size):
+        await update.message.reply_text(
+            "⚠️ Too many photos are being processed right now. Please send this photo again in a moment.",
+            reply_markup=build_done_keyboard() if draft.photos else None
+        )
+        return WAITING_PHOTO
+    num = _start_photo_download(draft, update.message, source)
+
+    # If 3 photos, automatically move to next step
+    if num >= MAX_PHOTOS:
+        await update.message.reply_text(f"Photo {num}/3 received. Maximum reached!")
+        next_state = draft.finish_photos()
+        await _ask_location(update.message, draft)
+        return next_state
     
     # Show Done button after first photo
-    keyboard = [
-        [InlineKeyboardButton("✅ Done", callback_data="done_photos")],
-        build_back_cancel_row("photos")
-    ]
     await update.message.reply_text(
         f"Photo {num}/3 received. Send another photo or tap Done.",
-        reply_markup=InlineKeyboardMarkup(keyboard)
+        reply_markup=build_done_keyboard()
     )
     return WAITING_PHOTO
 
 async def done_photos(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    draft = get_draft(context.user_data)
+    if media_groups.is_pending(update.effective_chat.id):
+        text = "Still receiving your photos, please try again in a moment."
+        if update.callback_query:
+            await update.callback_query.answer(text)
+        else:
+            await update.message.reply_text(text)
+        return WAITING_PHOTO
     # Handle both callback query and command
     if update.callback_query:
         query = update.callback_query
         await query.answer()
-        num = len(context.user_data.get("photos", []))
+        num = len(draft.photos)
         if num < 1:
             await query.message.reply_text("At least 1 photo required.")
             return WAITING_PHOTO
+        # Advance first: photos processed from now on offer their location themselves
+        next_state = draft.finish_photos()
         await query.edit_message_text(f"{num} photo(s) received.")
-        keyboard= [
-            build_back_cancel_row("photos")
-        ]
-        await query.message.reply_text(
-            str_send_location,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
+        await _ask_location(query.message, draft)
     else:
         # Handle /done command
-        num = len(context.user_data.get("photos", []))
+        num = len(draft.photos)
         if num < 1:
             await update.message.reply_text("At least 1 photo required.")
             return WAITING_PHOTO
-        keyboard= [
-            build_back_cancel_row("photos")
-        ]
-        await update.message.reply_text(
-            str_send_location,
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-    return WAITING_LOCATION
+        next_state = draft.finish_photos()
+        await _ask_location(update.message, draft)
+    return next_state
 
 async def skip_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     await update.message.reply_text("You must send at least 1 photo or /cancel.")
@@ -219,11 +434,90 @@ async def skip_photo(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
 async def receive_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     lat = update.message.location.latitude
     lng = update.message.location.longitude
-    if not in_turin(lat, lng):
-        await update.message.reply_text("⚠️ Location must be within Turin area. Send a valid location in Turin.")
+    tenant = tenants.for_update(update)
+    if not tenant.contains(lat, lng):
+        await update.message.reply_text(
+            f"⚠️ Location must be within {tenant.label} area. Send a valid location in {tenant.label}."
+        )
+        return WAITING_LOCATION
+    metrics.inc("location.manual")
+    return await _confirm_location(update.message, get_draft(context.user_data), lat, lng)
+
+async def receive_address(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Typed address instead of a shared location, geocoded offline."""
+    metrics.inc("location.address_typed")
+    if geocoder.get_geocoder() is None:
+        await update.message.reply_text("Please share your location using the 📎 button.")
+        return WAITING_LOCATION
+    tenant = tenants.for_update(update)
+    results = [r for r in geocoder.lookup(update.message.text) if tenant.contains(r.lat, r.lon)]
+    if not results:
+        metrics.inc("location.address_not_found")
+        await update.message.reply_text(
+            f"⚠️ Address not found in {tenant.label}. Check the street name and number, or share your location."
+        )
+        return WAITING_LOCATION
+    best = results[0]
+    if best.exact and (len(results) == 1 or not results[1].exact):
+        metrics.inc("location.address_found")
+        return await _confirm_location(update.message, get_draft(context.user_data), best.lat, best.lon, best.label)
+    # Typo, missing number or several streets with that name: let the user pick
+    rows = [
+        [InlineKeyboardButton(f"📍 {r.label}", callback_data=f"address_{r.lat:.6f}_{r.lon:.6f}")]
+        for r in results
+    ]
+    rows.append(build_back_cancel_row("photos"))
+    await update.message.reply_text(
+        "Did you mean one of these? Otherwise type the address again.", reply_markup=InlineKeyboardMarkup(rows)
+    )
+    return WAITING_LOCATION
+
+async def use_address(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """One of the addresses suggested by receive_address."""
+    query = update.callback_query
+    await query.answer()
+    _, lat, lng = query.data.split("_")
+    label = next(
+        (button.text for row in query.message.reply_markup.inline_keyboard for button in row
+         if button.callback_data == query.data),
+        None,
+    )
+    metrics.inc("location.address_found")
+    await query.edit_message_text(label or "📍 Selected address")
+    address = label.replace("📍 ", "", 1) if label else None
+    return await _confirm_location(query.message, get_draft(context.user_data), float(lat), float(lng), address)
+
+async def use_photo_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """One-tap location taken from the EXIF GPS of a photo."""
+    query = update.callback_query
+    draft = get_draft(context.user_data)
+    if draft.photo_location is None:
+        await query.answer("The photo location is no longer available, please send your location.")
         return WAITING_LOCATION
-    context.user_data["latitude"] = lat
-    context.user_data["longitude"] = lng
+    await query.answer()
+    metrics.inc("location.prefill_used")
+    await query.edit_message_text("📍 Using the location of your photo.")
+    lat, lng = draft.photo_location
+    return await _confirm_location(query.message, draft, lat, lng)
+
+async def _confirm_location(message, draft: ReportDraft, lat: float, lng: float,
+                            address: Optional[str] = None) -> int:
+    if address is None:
+        # Show where the pin landed, so a wrong pin is caught before sending;
+        # the address must be in the chat's city, it goes to that city's backend
+        address = reverse_geocoder.lookup(lat, lng, tenants.for_chat(message.chat_id).geofence())
+    next_state = draft.set_location(lat, lng, address)
+    if _matches_recent_report(tenants.for_chat(message.chat_id), draft):
+        # Flag before POST /reports: likely the same problem reported by someone else
+        metrics.inc("reports.flagged_duplicates")
+        await message.reply_text(
+            "⚠️ One of your photos looks very similar to a photo from a recently sent report. "
+            "If you are reporting the same problem, you can tap Cancel."
+        )
+    similar = duplicates.check_draft(nearby.index_for(tenants.for_chat(message.chat_id)), draft)
+    if similar:
+        # Checked before the photos are uploaded: following costs nothing
+        await message.reply_text(build_duplicates_message(similar), reply_markup=build_duplicates_keyboard(similar))
     # Yes/No + Back + Cancel inline keyboard
     anon_keyboard = InlineKeyboardMarkup([
         [
@@ -232,8 +526,36 @@ async def receive_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -
         ],
         build_back_cancel_row("location"),
     ])
-    await update.message.reply_text("Do you want to send the report anonymously?", reply_markup=anon_keyboard)
-    return WAITING_ANONYMOUS
+    question = "Do you want to send the report anonymously?"
+    if address:
+        question = f"📍 {address}\n{question}"
+    await message.reply_text(question, reply_markup=anon_keyboard)
+    return next_state
+
+def build_duplicates_message(similar) -> str:
+    lines = ["🔎 Similar reports were already sent near this location:"]
+    for _, distance, report in similar:
+        lines.append(f"#{report.id} {report.title} — {nearby.format_distance(distance)} · {report.state}")
+    lines.append("If one of them is your problem, you can follow it instead of sending a new report.")
+    return "\n".join(lines)
+
+def build_duplicates_keyboard(similar) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"Follow #{report.id} instead", callback_data=f"follow_instead_{report.id}")]
+        for _, _, report in similar
+    ])
+
+async def follow_instead(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    """Drop the draft and follow the existing report it duplicates."""
+    query = update.callback_query
+    await query.answer()
+    report_id = int(query.data.replace("follow_instead_", ""))
+    metrics.inc("duplicates.followed_instead")
+    discard_draft(context.user_data)
+    context.user_data.clear()
+    await query.edit_message_text(f"Your report was not sent. Following report #{report_id} instead.")
+    await follow_report(update, report_id)
+    return ConversationHandler.END
 
 async def handle_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     """Generic back navigation handler."""
@@ -241,6 +563,7 @@ async def handle_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
     await query.answer()
     data = query.data  # e.g., back_description
     target = data.replace("back_", "")
+    draft = get_draft(context.user_data)
 
     if target == "title":
         # Already at first step; just re-prompt title
@@ -251,9 +574,7 @@ async def handle_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             "Send the report title again:",
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        context.user_data.pop("title", None)
-        context.user_data.pop("description", None)
-        return WAITING_TITLE
+        return draft.rewind(WAITING_TITLE)
     if target == "description":
         await query.edit_message_text(str_going_back)
         keyboard= [
@@ -263,14 +584,12 @@ async def handle_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             "Send the description again:",
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        context.user_data.pop("description", None)
-        return WAITING_DESCRIPTION
+        return draft.rewind(WAITING_DESCRIPTION)
     if target == "category":
         await query.edit_message_text(str_going_back)
-        context.user_data.pop("category", None)
-        context.user_data.pop("photos", None)
-        await query.message.reply_text(str_ch_category, reply_markup=build_category_keyboard())
-        return WAITING_CATEGORY
+        next_state = draft.rewind(WAITING_CATEGORY)
+        await query.message.reply_text(str_ch_category, reply_markup=build_category_keyboard(tenants.for_update(update)))
+        return next_state
     if target == "photos":
         # Go back to photo collection stage
         await query.edit_message_text(str_going_back)
@@ -278,61 +597,93 @@ async def handle_back(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int
             build_back_cancel_row("category")
         ]
         await query.message.reply_text(
-            "Send at least 1 photo (max 3). When done, send /done.",
+            "Send at least 1 photo (max 3). When done, send /done. "
+        "Tip: photos sent as files keep their location.",
             reply_markup=InlineKeyboardMarkup(keyboard)
         )
-        return WAITING_PHOTO
+        return draft.rewind(WAITING_PHOTO)
     if target == "location":
         # Back from anonymous to location
         await query.edit_message_text(str_going_back)
-        keyboard= [
-            build_back_cancel_row("photos")
-        ]
-        await query.message.reply_text(
-            "Send your location again.",
-            reply_markup=InlineKeyboardMarkup(keyboard)
-        )
-        context.user_data.pop("latitude", None)
-        context.user_data.pop("longitude", None)
-        return WAITING_LOCATION
+        next_state = draft.rewind(WAITING_LOCATION)
+        await _ask_location(query.message, draft, "Send your location again.")
+        return next_state
     # Fallback: end conversation if unknown
     await query.edit_message_text("Unknown back target.")
     return ConversationHandler.END
 
 async def receive_anonymous(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
-    await query.answer()
-    anonymous = query.data.endswith("_yes")
-    context.user_data["anonymous"] = anonymous
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
-    report_data = {
-        "title": context.user_data.get("title"),
-        "description": context.user_data.get("description"),
-        "category": context.user_data.get("category"),
-        "latitude": str(context.user_data.get("latitude")),
-        "longitude": str(context.user_data.get("longitude")),
-        "anonymity": "1" if anonymous else "0",
-    }
-    photo_paths = context.user_data.get("photos", [])
-    files = []
-    for p in photo_paths:
-        if os.path.exists(p):
-            async with aiofiles.open(p, "rb") as af:
-                data = await af.read()
-            bio = io.BytesIO(data)
-            bio.name = os.path.basename(p)
-            files.append(("photos", (os.path.basename(p), bio, "image/jpeg")))
+    tenant = tenants.for_chat(chat_id)
+    draft = get_draft(context.user_data)
+    if not submissions.begin(chat_id, draft.idempotency_key):
+        # Repeated tap while the first upload is still running
+        await query.answer("⏳ Already sending your report…")
+        return WAITING_ANONYMOUS
+    sent = False
     try:
-        response = await _httpx_with_retry(
-            "POST",
-            f"{BASE_URL}/reports",
-            data=report_data,
-            files=files,
-            headers={"Authorization": f"Bearer {token}"},
-        )
+        await query.answer()
+        anonymous = query.data.endswith("_yes")
+        draft.anonymous = anonymous
+        token = await ensure_session(update)
+        if not token:
+            discard_draft(context.user_data)
+            await query.edit_message_text("You must first log in with /login.")
+            return ConversationHandler.END
+        report_data = draft.to_form()
+        photos = await wait_for_photos(draft.photos)
+        if draft.photos and not photos:
+            discard_draft(context.user_data)
+            await query.edit_message_text("❌ Could not retrieve your photos from Telegram. Please start the report again.")
+            await query.message.reply_text("What would you like to do next?", reply_markup=build_main_menu())
+            return ConversationHandler.END
+        metrics.observe("reports.photo_bytes_saved", sum(p.original_size - p.size for p in photos))
+        for photo in photos:
+            metrics.observe("photos.upload_bytes", photo.size)
+        # Streamed from the photo buffers one chunk at a time while it is sent
+        progress = UploadProgress(query)
+        body = MultipartBody(report_data, photos, on_progress=progress)
+        try:
+            # Waits for an upload slot and bandwidth budget so bursts don't flood the backend
+            async with transfers.uploads.slot(chat_id, body.length, tenant.name):
+                with metrics.timer("reports.upload_seconds"):
+                    response = await tenant.request(
+                        "POST",
+                        "/reports",
+                        content=body,
+                        headers={
+                            **body.headers,
+                            "Authorization": f"Bearer {token}",
+                            # Identifies the draft for the backend's logs; it does not dedupe on
+                            # it, so the POST is not retried once sent (see start._request_with_retry)
+                            "Idempotency-Key": draft.idempotency_key,
+                        },
+                    )
+        except httpx.HTTPError as e:
+            await progress.settle()
+            print(f"Report upload failed for chat {chat_id}: {e!r}")
+            await query.edit_message_text(
+                "❌ Could not reach the server while sending your report. "
+                "Check /view_reports before sending it again."
+            )
+            await query.message.reply_text("What would you like to do next?", reply_markup=build_main_menu())
+            return ConversationHandler.END
+        await progress.settle()
         if response.status_code in (200, 201):
-            await query.edit_message_text(f"✅ Report sent with {len(files)} photo(s)! {'(Anonymous)' if anonymous else ''}")
+            sent = True
+            metrics.inc(tenant.metric("reports_sent"))
+            report_lists.invalidate(chat_id)
+            for photo in photos:
+                if photo.phash is not None:
+                    tenant.recent_photos.add(photo.phash)
+            sizes = ", ".join(format_size(photo.size) for photo in photos)
+            text = f"✅ Report sent with {len(photos)} photo(s) ({sizes})! {'(Anonymous)' if anonymous else ''}"
+            dropped = len(draft.photos) - len(photos)
+            if dropped:
+                # Some downloads failed or timed out: the report went without them
+                text += f"\n⚠️ {dropped} photo(s) could not be retrieved from Telegram and were not attached."
+            await query.edit_message_text(text)
             await query.message.reply_text("What would you like to do next?", reply_markup=build_main_menu())
         elif response.status_code == 401:
             sessions.pop(chat_id, None)
@@ -340,17 +691,45 @@ async def receive_anonymous(update: Update, context: ContextTypes.DEFAULT_TYPE)
         else:
             await query.edit_message_text(f"❌ Error sending report: {response.text}")
     finally:
-        # Close buffers and remove temp files
-        for _, file_tuple in files:
-            file_obj = file_tuple[1]
-            try:
-                file_obj.close()
-            except Exception:
-                pass
-        for p in photo_paths:
-            if os.path.exists(p):
-                os.remove(p)
-    context.user_data.clear()
+        submissions.finish(chat_id, draft.idempotency_key, sent)
+        draft.discard_photos()
+        context.user_data.clear()
+    return ConversationHandler.END
+
+async def answer_in_flight_tap(update: Update) -> bool:
+    """Answer an anonymity tap repeated while the report uploads.
+
+    Called by the chat lock before the update queues: behind the lock it
+    would only run once the upload it repeats is over.
+    """
+    query = update.callback_query
+    if query is None or query.data not in ("anonymous_yes", "anonymous_no"):
+        return False
+    if not submissions.is_in_flight(update.effective_chat.id):
+        return False
+    metrics.inc("reports.duplicate_submits")
+    await query.answer("⏳ Already sending your report…")
+    return True
+
+async def handle_stale_anonymous(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Anonymity taps arriving after the conversation already ended."""
+    query = update.callback_query
+    chat_id = update.effective_chat.id
+    if submissions.recently_sent(chat_id):
+        metrics.inc("reports.duplicate_submits")
+        await query.answer("✅ This report has already been sent.")
+    else:
+        await query.answer("This report is no longer active.")
+
+async def handle_city_during_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> Optional[int]:
+    """City picked from /city while a report is open: its category and location belong to the old city."""
+    if not await tenants.handle_city(update, context):
+        return None
+    discard_draft(context.user_data)
+    await update.callback_query.message.reply_text(
+        "Your unfinished report was for the previous city and has been discarded. Choose a functionality:",
+        reply_markup=build_main_menu()
+    )
     return ConversationHandler.END
 
 async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
@@ -358,6 +737,7 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     if update.callback_query:
         query = update.callback_query
         await query.answer()
+        discard_draft(context.user_data)
         context.user_data.clear()
         await query.edit_message_text(
             "❌ Operation cancelled. Choose a functionality:",
@@ -365,23 +745,26 @@ async def cancel(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
         )
     else:
         await update.message.reply_text("Operation cancelled.")
+        discard_draft(context.user_data)
         context.user_data.clear()
     return ConversationHandler.END
 
 async def show_categories(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
-    if not categories:
+    tenant = tenants.for_update(update)
+    if not tenant.categories:
         await update.message.reply_text("No categories available.")
         return ConversationHandler.END
-    await update.message.reply_text(str_ch_category, reply_markup=build_category_keyboard())
+    await update.message.reply_text(str_ch_category, reply_markup=build_category_keyboard(tenant))
     return WAITING_CATEGORY
 
 async def handle_start_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    if chat_id not in sessions:
+    if not await ensure_session(update):
         await query.edit_message_text("You must first log in with /login.")
         return ConversationHandler.END
+    new_draft(context.user_data)
     await query.edit_message_text("Starting report submission...")
     # Each row must be a sequence of InlineKeyboardButton
     keyboard = [build_cancel_button()]  # single-row with only Cancel
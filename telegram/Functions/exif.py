@@ -0,0 +1,107 @@
+from __future__ import annotations
+import struct
+from typing import Optional, Tuple
+
+# ------------------------------------------------------------------ #
+# EXIF GPS reader
+# ------------------------------------------------------------------ #
+# Walks the JPEG markers up to the APP1 "Exif" segment and reads the GPS
+# IFD straight from the TIFF structure: no pixel is decoded and only the
+# first segment of the file is looked at. Telegram strips EXIF from
+# compressed photos, so in practice this finds coordinates only in photos
+# sent uncompressed (as documents).
+
+# The APP1 segment is at most 64 KiB and comes right after SOI/APP0
+EXIF_SCAN_BYTES = 128 * 1024
+
+_GPS_IFD_POINTER = 0x8825
+_GPS_LATITUDE_REF, _GPS_LATITUDE, _GPS_LONGITUDE_REF, _GPS_LONGITUDE = 1, 2, 3, 4
+_TYPE_ASCII, _TYPE_RATIONAL, _TYPE_LONG = 2, 5, 4
+
+
+def _find_exif(data: bytes) -> Optional[bytes]:
+    """TIFF payload of the APP1 Exif segment, if any."""
+    if data[:2] != b"\xff\xd8":
+        return None
+    pos = 2
+    while pos + 4 <= len(data):
+        if data[pos] != 0xFF:
+            return None
+        marker = data[pos + 1]
+        if marker == 0xFF:
+            # Fill byte before a marker
+            pos += 1
+            continue
+        if marker in (0xD9, 0xDA):
+            # End of image / start of scan: no metadata past this point
+            return None
+        (length,) = struct.unpack(">H", data[pos + 2:pos + 4])
+        segment = data[pos + 4:pos + 2 + length]
+        if marker == 0xE1 and segment[:6] == b"Exif\x00\x00":
+            return segment[6:]
+        pos += 2 + length
+    return None
+
+
+def _read_ifd(tiff: bytes, offset: int, order: str) -> dict:
+    """Tag -> (type, count, raw 4-byte value field) for one IFD."""
+    (count,) = struct.unpack(order + "H", tiff[offset:offset + 2])
+    entries = {}
+    for i in range(count):
+        start = offset + 2 + i * 12
+        entry = tiff[start:start + 12]
+        if len(entry) < 12:
+            break
+        tag, kind, n = struct.unpack(order + "HHI", entry[:8])
+        entries[tag] = (kind, n, entry[8:12])
+    return entries
+
+
+def _degrees(tiff: bytes, entry, order: str) -> Optional[float]:
+    kind, n, value = entry
+    if kind != _TYPE_RATIONAL or n != 3:
+        return None
+    (offset,) = struct.unpack(order + "I", value)
+    parts = struct.unpack(order + "6I", tiff[offset:offset + 24])
+    d, m, s = (num / den if den else 0.0 for num, den in zip(parts[::2], parts[1::2]))
+    return d + m / 60 + s / 3600
+
+
+def _ref(entry) -> bytes:
+    kind, _, value = entry
+    return value[:1] if kind == _TYPE_ASCII else b""
+
+
+def read_gps(data: bytes) -> Optional[Tuple[float, float]]:
+    """(latitude, longitude) from the photo's EXIF, or None.
+
+    Malformed or truncated metadata is treated as missing.
+    """
+    try:
+        tiff = _find_exif(data)
+        if tiff is None or len(tiff) < 8:
+            return None
+        order = {b"II": "<", b"MM": ">"}.get(tiff[:2])
+        if order is None:
+            return None
+        (ifd0,) = struct.unpack(order + "I", tiff[4:8])
+        gps_pointer = _read_ifd(tiff, ifd0, order).get(_GPS_IFD_POINTER)
+        if gps_pointer is None or gps_pointer[0] != _TYPE_LONG:
+            return None
+        (gps_offset,) = struct.unpack(order + "I", gps_pointer[2])
+        gps = _read_ifd(tiff, gps_offset, order)
+        if _GPS_LATITUDE not in gps or _GPS_LONGITUDE not in gps:
+            return None
+        latitude = _degrees(tiff, gps[_GPS_LATITUDE], order)
+        longitude = _degrees(tiff, gps[_GPS_LONGITUDE], order)
+        if latitude is None or longitude is None or (latitude == 0 and longitude == 0):
+            return None
+        if _ref(gps.get(_GPS_LATITUDE_REF, (0, 0, b""))) == b"S":
+            latitude = -latitude
+        if _ref(gps.get(_GPS_LONGITUDE_REF, (0, 0, b""))) == b"W":
+            longitude = -longitude
+    except (struct.error, IndexError):
+        return None
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        return None
+    return latitude, longitude
@@ -0,0 +1,332 @@
+from __future__ import annotations
+import bisect
+import csv
+import os
+import re
+import time
+from array import array
+from typing import Dict, List, Optional, Tuple
+
+from . import metrics
+from .duplicates import normalize
+
+# ------------------------------------------------------------------ #
+# Offline address geocoder
+# ------------------------------------------------------------------ #
+# Typed addresses ("Via Roma 12", "c.so vittorio emanuele 5") are turned
+# into coordinates from a local gazetteer, without network calls. The
+# gazetteer is a CSV with a header and the columns
+#     street,number,latitude,longitude[,district]
+# one row per house number (e.g. the city's "civici" open data or an
+# OpenStreetMap extract). Without the file, typed addresses are disabled.
+#
+# Street names live in a radix trie (edges labelled with whole substrings).
+# Fuzzy lookup walks the trie carrying one row of the Levenshtein table per
+# character, computing only the band of cells within the allowed edits of
+# the diagonal and pruning branches whose band is already over the limit,
+# so a typo costs a few hundred visited nodes rather than a scan of every
+# street. House numbers of a street are kept sorted in flat arrays.
+
+GAZETTEER_PATH = os.getenv(
+    "GAZETTEER_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "turin_addresses.csv")
+)
+GEOCODER_MAX_RESULTS = 3
+
+# Street types also indexed without, so "roma 12" finds "via roma"
+_STREET_TYPES = {
+    "via", "corso", "piazza", "piazzale", "piazzetta", "largo", "viale", "vicolo", "strada",
+    "lungo", "lungodora", "lungopo", "galleria", "passaggio", "borgata", "rotonda", "giardino",
+}
+_ABBREVIATIONS = [
+    (re.compile(r"\bc\.?\s*so\b"), "corso"),
+    (re.compile(r"\bp\.?\s*(?:za|zza)\b"), "piazza"),
+    (re.compile(r"\bp\.?\s*le\b"), "piazzale"),
+    (re.compile(r"\bv\.?\s*le\b"), "viale"),
+    (re.compile(r"\bl\.?\s*go\b"), "largo"),
+    (re.compile(r"\bv\.\s*"), "via "),
+]
+# Trailing postcode or comma-separated city: "..., 10121 Torino", "..., TO"
+_CITY_SUFFIX = re.compile(r"(?:\s10[01]\d\d\b|,\s*(?:torino|turin|to)\b).*$")
+_HOUSE_NUMBER = re.compile(r"^(?P<street>.*?)[\s,]+(?:n\.?\s*)?(?P<number>\d+)\s*(?:/\s*)?(?P<suffix>[a-z]{1,3})?$")
+
+
+def normalize_street(name: str) -> str:
+    name = name.lower()
+    for pattern, replacement in _ABBREVIATIONS:
+        name = pattern.sub(replacement, name)
+    return normalize(name)
+
+
+def parse_address(text: str) -> Tuple[str, Optional[int], str]:
+    """(normalized street, house number or None, number suffix) of a typed address."""
+    text = normalize_street(_CITY_SUFFIX.sub("", text.lower()))
+    match = _HOUSE_NUMBER.match(text)
+    if match is None:
+        return text, None, ""
+    return match.group("street"), int(match.group("number")), match.group("suffix") or ""
+
+
+def _split_number(raw: str) -> Tuple[Optional[int], str]:
+    match = re.match(r"\s*(\d+)\s*/?\s*([a-z]*)", raw.lower())
+    if match is None:
+        return None, ""
+    return int(match.group(1)), match.group(2)
+
+
+def read_gazetteer(path: str = GAZETTEER_PATH):
+    """(street, number, suffix, latitude, longitude, district) of every usable row.
+
+    ``district`` comes from an optional "district" column, "" without it.
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                lat, lon = float(row["latitude"]), float(row["longitude"])
+            except (KeyError, TypeError, ValueError):
+                continue
+            number, suffix = _split_number(row.get("number") or "")
+            if number is None:
+                continue
+            yield (row.get("street") or "").strip(), number, suffix, lat, lon, (row.get("district") or "").strip()
+
+
+def format_address(street: str, number: Optional[int], suffix: str = "") -> str:
+    if number is None:
+        return street
+    return f"{street} {number}{'/' + suffix.upper() if suffix else ''}"
+
+
+class Street:
+    __slots__ = ("name", "numbers", "suffixes", "lats", "lons")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        # Sorted by number; suffixes[i] is "" for plain numbers
+        self.numbers = array("i")
+        self.suffixes: List[str] = []
+        self.lats = array("d")
+        self.lons = array("d")
+
+    def locate(self, number: Optional[int], suffix: str = "") -> Tuple[int, bool]:
+        """Position of the best entry for a house number, and whether it is exact."""
+        if number is None:
+            # No number typed: the middle house of the street
+            return len(self.numbers) // 2, False
+        start = bisect.bisect_left(self.numbers, number)
+        end = bisect.bisect_right(self.numbers, number)
+        if start < end:
+            for i in range(start, end):
+                if self.suffixes[i] == suffix:
+                    return i, True
+            return start, not suffix
+        # Closest number on the same side of the street
+        best, best_gap = None, None
+        for i in range(max(0, start - 8), min(len(self.numbers), start + 8)):
+            gap = abs(self.numbers[i] - number) + (0 if self.numbers[i] % 2 == number % 2 else 1000)
+            if best_gap is None or gap < best_gap:
+                best, best_gap = i, gap
+        return best, False
+
+
+class GeocodeResult:
+    __slots__ = ("label", "lat", "lon", "exact", "edits")
+
+    def __init__(self, label: str, lat: float, lon: float, exact: bool, edits: int) -> None:
+        self.label = label
+        self.lat = lat
+        self.lon = lon
+        self.exact = exact
+        self.edits = edits
+
+    def __repr__(self) -> str:
+        return f"GeocodeResult({self.label!r}, {self.lat:.6f}, {self.lon:.6f}, exact={self.exact}, edits={self.edits})"
+
+
+class _Node:
+    __slots__ = ("edges", "streets")
+
+    def __init__(self) -> None:
+        # First character -> (edge label, child)
+        self.edges: Dict[str, Tuple[str, "_Node"]] = {}
+        self.streets: Tuple[int, ...] = ()
+
+
+class StreetTrie:
+    def __init__(self) -> None:
+        self.root = _Node()
+        self.nodes = 1
+
+    def insert(self, key: str, street_id: int) -> None:
+        node = self.root
+        while True:
+            if not key:
+                if street_id not in node.streets:
+                    node.streets += (street_id,)
+                return
+            edge = node.edges.get(key[0])
+            if edge is None:
+                leaf = _Node()
+                leaf.streets = (street_id,)
+                node.edges[key[0]] = (key, leaf)
+                self.nodes += 1
+                return
+            label, child = edge
+            common = 0
+            while common < min(len(label), len(key)) and label[common] == key[common]:
+                common += 1
+            if common < len(label):
+                # Split the edge at the first differing character
+                middle = _Node()
+                middle.edges[label[common]] = (label[common:], child)
+                node.edges[key[0]] = (label[:common], middle)
+                self.nodes += 1
+                child = middle
+            node, key = child, key[common:]
+
+    def search(self, query: str, max_edits: int) -> Dict[int, int]:
+        """Street id -> edit distance for every key within ``max_edits`` of ``query``."""
+        found: Dict[int, int] = {}
+        columns = len(query) + 1
+        too_far = max_edits + 1
+        # Only cells within max_edits of the diagonal can stay under the limit
+        first = [i if i <= max_edits else too_far for i in range(columns)]
+        stack = [(self.root, first, 0)]
+        while stack:
+            node, row, depth = stack.pop()
+            if node.streets and row[-1] <= max_edits:
+                for street_id in node.streets:
+                    if row[-1] < found.get(street_id, too_far):
+                        found[street_id] = row[-1]
+            for label, child in node.edges.values():
+                current = row
+                d = depth
+                for ch in label:
+                    previous = current
+                    d += 1
+                    current = [too_far] * columns
+                    if d <= max_edits:
+                        current[0] = d
+                    low, high = max(1, d - max_edits), min(columns - 1, d + max_edits)
+                    best = too_far
+                    for i in range(low, high + 1):
+                        value = min(current[i - 1] + 1, previous[i] + 1, previous[i - 1] + (query[i - 1] != ch))
+                        if value > too_far:
+                            value = too_far
+                        current[i] = value
+                        if value < best:
+                            best = value
+                    if best > max_edits and current[0] > max_edits:
+                        break
+                else:
+                    stack.append((child, current, d))
+        return found
+
+
+def _max_edits(query: str) -> int:
+    if len(query) < 4:
+        return 0
+    return 1 if len(query) < 8 else 2
+
+
+class Geocoder:
+    def __init__(self) -> None:
+        self.streets: List[Street] = []
+        self.trie = StreetTrie()
+        self._by_key: Dict[str, int] = {}
+
+    @classmethod
+    def from_csv(cls, path: str = GAZETTEER_PATH) -> "Geocoder":
+        geocoder = cls()
+        rows: Dict[int, list] = {}
+        for name, number, suffix, lat, lon, _ in read_gazetteer(path):
+            street_id = geocoder._street_id(name)
+            if street_id is not None:
+                rows.setdefault(street_id, []).append((number, suffix, lat, lon))
+        for street_id, entries in rows.items():
+            street = geocoder.streets[street_id]
+            for number, suffix, lat, lon in sorted(entries):
+                street.numbers.append(number)
+                street.suffixes.append(suffix)
+                street.lats.append(lat)
+                street.lons.append(lon)
+        # Streets without any usable house number can't be located
+        return geocoder
+
+    def _street_id(self, name: str) -> Optional[int]:
+        key = normalize_street(name)
+        if not key:
+            return None
+        street_id = self._by_key.get(key)
+        if street_id is None:
+            street_id = self._by_key[key] = len(self.streets)
+            self.streets.append(Street(name))
+            self.trie.insert(key, street_id)
+            words = key.split(" ", 1)
+            if len(words) == 2 and words[0] in _STREET_TYPES:
+                self.trie.insert(words[1], street_id)
+        return street_id
+
+    def _exact(self, key: str) -> Tuple[int, ...]:
+        node = self.trie.root
+        while key:
+            edge = node.edges.get(key[0])
+            if edge is None or not key.startswith(edge[0]):
+                return ()
+            node, key = edge[1], key[len(edge[0]):]
+        return node.streets
+
+    def __len__(self) -> int:
+        return sum(len(street.numbers) for street in self.streets)
+
+    def lookup(self, text: str, limit: int = GEOCODER_MAX_RESULTS) -> List[GeocodeResult]:
+        """Best matches for a typed address, best first."""
+        street_key, number, suffix = parse_address(text)
+        if not street_key:
+            return []
+        # Correctly typed names skip the fuzzy walk
+        matches = {street_id: 0 for street_id in self._exact(street_key)}
+        # Then one edit, then more: the walk grows quickly with the allowed edits
+        for max_edits in range(1, _max_edits(street_key) + 1):
+            if matches:
+                break
+            matches = self.trie.search(street_key, max_edits)
+        results = []
+        for street_id, edits in matches.items():
+            street = self.streets[street_id]
+            if not street.numbers:
+                continue
+            i, exact = street.locate(number, suffix)
+            label = format_address(street.name, street.numbers[i] if number is not None else None, street.suffixes[i])
+            results.append(GeocodeResult(label, street.lats[i], street.lons[i], exact and edits == 0, edits))
+        results.sort(key=lambda r: (r.edits, not r.exact, r.label))
+        return results[:limit]
+
+    def stats(self) -> Dict[str, int]:
+        return {"streets": len(self.streets), "addresses": len(self), "trie_nodes": self.trie.nodes}
+
+
+_geocoder: Optional[Geocoder] = None
+_loaded = False
+
+
+def get_geocoder() -> Optional[Geocoder]:
+    """The gazetteer geocoder, loaded on first use; None without a gazetteer."""
+    global _geocoder, _loaded
+    if not _loaded:
+        _loaded = True
+        if not os.path.exists(GAZETTEER_PATH):
+            print(f"No gazetteer at {GAZETTEER_PATH}: typed addresses are disabled")
+            return None
+        started = time.perf_counter()
+        _geocoder = Geocoder.from_csv(GAZETTEER_PATH)
+        metrics.observe("geocoder.build_seconds", time.perf_counter() - started)
+        print(f"Gazetteer loaded: {_geocoder.stats()}")
+    return _geocoder
+
+
+def lookup(text: str) -> List[GeocodeResult]:
+    geocoder = get_geocoder()
+    if geocoder is None:
+        return []
+    with metrics.timer("geocoder.lookup_seconds"):
+        return geocoder.lookup(text)
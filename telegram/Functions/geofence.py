@@ -0,0 +1,184 @@
+from __future__ import annotations
+import json
+import os
+from array import array
+from typing import Dict, List, Optional, Sequence, Tuple
+
+# ------------------------------------------------------------------ #
+# City boundary geofence
+# ------------------------------------------------------------------ #
+# The boundary polygon is rasterized once into a grid over its bounding
+# box. Cells crossed by no boundary edge are entirely inside or outside,
+# so most checks are a single table lookup. For the remaining "edge"
+# cells the inside/outside state of the cell centre is precomputed
+# together with the edges crossing the cell: a point is inside when the
+# segment from it to the centre crosses those edges an even number of
+# times (the segment never leaves the cell, so no other edge can cross it).
+
+GEOFENCE_PATH = os.getenv(
+    "GEOFENCE_PATH", os.path.join(os.path.dirname(os.path.abspath(__file__)), "turin_boundaries.json")
+)
+GEOFENCE_GRID_SIZE = int(os.getenv("GEOFENCE_GRID_SIZE", "256"))
+
+_OUTSIDE, _INSIDE, _EDGE_OUTSIDE, _EDGE_INSIDE = 0, 1, 2, 3
+
+Ring = Sequence[Tuple[float, float]]  # (lon, lat) pairs, GeoJSON order
+
+
+def load_rings(path: str = GEOFENCE_PATH, addresstype: str = "city") -> List[Ring]:
+    """All rings (outer boundaries and holes) of the Nominatim entry of ``addresstype``."""
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    entry = next((e for e in entries if e.get("addresstype") == addresstype), None)
+    if entry is None:
+        raise ValueError(f"No {addresstype} boundary in {path}")
+    geometry = entry["geojson"]
+    polygons = geometry["coordinates"] if geometry["type"] == "MultiPolygon" else [geometry["coordinates"]]
+    return [[(float(x), float(y)) for x, y in ring] for polygon in polygons for ring in polygon]
+
+
+def _segments_cross(ax, ay, bx, by, cx, cy, dx, dy) -> bool:
+    """Whether segment AB properly crosses segment CD."""
+    d1 = (dx - cx) * (ay - cy) - (dy - cy) * (ax - cx)
+    d2 = (dx - cx) * (by - cy) - (dy - cy) * (bx - cx)
+    d3 = (bx - ax) * (cy - ay) - (by - ay) * (cx - ax)
+    d4 = (bx - ax) * (dy - ay) - (by - ay) * (dx - ax)
+    return ((d1 > 0) != (d2 > 0)) and ((d3 > 0) != (d4 > 0))
+
+
+def point_in_rings(lon: float, lat: float, rings: Sequence[Ring]) -> bool:
+    """Exact even-odd point-in-polygon test (the slow reference)."""
+    inside = False
+    for ring in rings:
+        n = len(ring)
+        x1, y1 = ring[n - 1]
+        for i in range(n):
+            x2, y2 = ring[i]
+            if (y1 > lat) != (y2 > lat) and lon < (x2 - x1) * (lat - y1) / (y2 - y1) + x1:
+                inside = not inside
+            x1, y1 = x2, y2
+    return inside
+
+
+class Geofence:
+    def __init__(self, rings: Sequence[Ring], grid_size: int = GEOFENCE_GRID_SIZE, name: str = "") -> None:
+        self.name = name
+        xs = [x for ring in rings for x, _ in ring]
+        ys = [y for ring in rings for _, y in ring]
+        self.min_lon, self.max_lon = min(xs), max(xs)
+        self.min_lat, self.max_lat = min(ys), max(ys)
+        # Square-ish cells: the longer side of the bounding box gets grid_size cells
+        span = max(self.max_lon - self.min_lon, self.max_lat - self.min_lat)
+        self.cell = span / grid_size
+        # One spare cell per axis: a point on the max edge may round one cell past it
+        self.nx = int((self.max_lon - self.min_lon) / self.cell) + 2
+        self.ny = int((self.max_lat - self.min_lat) / self.cell) + 2
+        # x1, y1, x2, y2 of every boundary edge
+        self.edges = array("d")
+        for ring in rings:
+            for i in range(len(ring)):
+                (x1, y1), (x2, y2) = ring[i - 1], ring[i]
+                if (x1, y1) != (x2, y2):
+                    self.edges.extend((x1, y1, x2, y2))
+        self.cells = bytearray(self.nx * self.ny)
+        self.cell_edges: Dict[int, Tuple[int, ...]] = {}
+        self._build()
+
+    # -------------------------------------------------------------- #
+    # Index construction
+    # -------------------------------------------------------------- #
+    def _cell_x(self, lon: float) -> int:
+        return min(max(int((lon - self.min_lon) / self.cell), 0), self.nx - 1)
+
+    def _cell_y(self, lat: float) -> int:
+        return min(max(int((lat - self.min_lat) / self.cell), 0), self.ny - 1)
+
+    def _build(self) -> None:
+        edges = self.edges
+        n_edges = len(edges) // 4
+        touching: Dict[int, List[int]] = {}
+        # Scanline crossings at each row's centre latitude
+        row_crossings: List[List[float]] = [[] for _ in range(self.ny)]
+        for e in range(n_edges):
+            x1, y1, x2, y2 = edges[4 * e:4 * e + 4]
+            # Conservative: every cell of the edge's bounding box counts as crossed
+            for cy in range(self._cell_y(min(y1, y2)), self._cell_y(max(y1, y2)) + 1):
+                for cx in range(self._cell_x(min(x1, x2)), self._cell_x(max(x1, x2)) + 1):
+                    touching.setdefault(cy * self.nx + cx, []).append(e)
+            if y1 == y2:
+                continue
+            low, high = sorted((y1, y2))
+            first = max(int((low - self.min_lat) / self.cell - 0.5), 0)
+            for cy in range(first, self.ny):
+                centre = self.min_lat + (cy + 0.5) * self.cell
+                if centre >= high:
+                    break
+                if (y1 > centre) != (y2 > centre):
+                    row_crossings[cy].append((x2 - x1) * (centre - y1) / (y2 - y1) + x1)
+        for cy, crossings in enumerate(row_crossings):
+            crossings.sort()
+            k = 0
+            for cx in range(self.nx):
+                centre = self.min_lon + (cx + 0.5) * self.cell
+                while k < len(crossings) and crossings[k] < centre:
+                    k += 1
+                inside = k % 2 == 1
+                index = cy * self.nx + cx
+                if index in touching:
+                    self.cells[index] = _EDGE_INSIDE if inside else _EDGE_OUTSIDE
+                else:
+                    self.cells[index] = _INSIDE if inside else _OUTSIDE
+        self.cell_edges = {index: tuple(found) for index, found in touching.items()}
+        self._lookup = (self.min_lat, self.max_lat, self.min_lon, self.max_lon, 1 / self.cell, self.nx, self.cells)
+
+    # -------------------------------------------------------------- #
+    # Queries
+    # -------------------------------------------------------------- #
+    def contains(self, lat: float, lon: float) -> bool:
+        # Everything the fast path needs comes from one attribute lookup
+        min_lat, max_lat, min_lon, max_lon, scale, nx, cells = self._lookup
+        if not (min_lat <= lat <= max_lat and min_lon <= lon <= max_lon):
+            return False
+        cx = int((lon - min_lon) * scale)
+        cy = int((lat - min_lat) * scale)
+        index = cy * nx + cx
+        state = cells[index]
+        if state < _EDGE_OUTSIDE:
+            return state == _INSIDE
+        return self._contains_in_edge_cell(lat, lon, cx, cy, index, state == _EDGE_INSIDE)
+
+    def _contains_in_edge_cell(self, lat, lon, cx, cy, index, centre_inside) -> bool:
+        centre_x = self.min_lon + (cx + 0.5) * self.cell
+        centre_y = self.min_lat + (cy + 0.5) * self.cell
+        edges = self.edges
+        inside = centre_inside
+        for e in self.cell_edges[index]:
+            o = 4 * e
+            if _segments_cross(lon, lat, centre_x, centre_y, edges[o], edges[o + 1], edges[o + 2], edges[o + 3]):
+                inside = not inside
+        return inside
+
+    def stats(self) -> Dict[str, int]:
+        edge_cells = sum(1 for state in self.cells if state >= _EDGE_OUTSIDE)
+        return {
+            "cells": len(self.cells),
+            "edge_cells": edge_cells,
+            "edges": len(self.edges) // 4,
+            "index_bytes": len(self.cells) + self.edges.itemsize * len(self.edges),
+        }
+
+
+# Built geofences by (path, addresstype): tenants sharing a boundary file share the index
+_fences: Dict[Tuple[str, str], Geofence] = {}
+
+
+def get_geofence(path: str = GEOFENCE_PATH, addresstype: str = "city", name: str = "Torino") -> Geofence:
+    """The geofence of a boundary file, built on first use."""
+    fence = _fences.get((path, addresstype))
+    if fence is None:
+        fence = _fences[(path, addresstype)] = Geofence(load_rings(path, addresstype), name=name)
+    return fence
+
+
+def contains(lat: float, lon: float) -> bool:
+    return get_geofence().contains(lat, lon)
@@ -1,6 +1,6 @@
 from __future__ import annotations
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from telegram import InputFile
 import aiofiles
 import io
@@ -16,8 +16,36 @@ from telegram.ext import (
     ContextTypes,
 )
 import httpx
-from .start import BASE_URL, TELEGRAM_FAQ_URL,sessions, _httpx_with_retry
+from .start import sessions
+from . import metrics, tenants
 from urllib.parse import urlparse
+import time
+
+FAQ_CACHE_TTL = float(os.getenv("FAQ_CACHE_TTL", "600"))
+
+
+async def get_faq_items(tenant: Optional[tenants.Tenant] = None) -> Optional[List[Dict]]:
+    """FAQ items of a tenant from its cache, refreshed from its server once the TTL expires."""
+    tenant = tenant or tenants.default()
+    faq_cache = tenant.faq_cache
+    items = faq_cache["items"]
+    if items is not None and time.time() - faq_cache["fetched_at"] < FAQ_CACHE_TTL:
+        metrics.inc(tenant.metric("faq_cache_hits"))
+        return items
+    metrics.inc(tenant.metric("faq_cache_misses"))
+    try:
+        response = await tenant.request("GET", tenant.faq_url)
+    except Exception as e:
+        if items is not None:
+            print(f"FAQ refresh failed, serving cached copy: {e}")
+            return items
+        raise
+    if response.status_code != 200:
+        # A stale copy is better than an error for mostly static content
+        return items
+    faq_cache["items"] = response.json()
+    faq_cache["fetched_at"] = time.time()
+    return faq_cache["items"]
 
 
 #Keyboard for help menu
@@ -64,6 +92,9 @@ async def handle_basic_commands(update: Update, context: ContextTypes.DEFAULT_TY
         "/start - Start the bot and login\n"
         "/login - Authenticate your Telegram account\n"
         "/help - Show this help message\n"
+        "/nearby - See the reports sent near a location\n"
+        "/map - Map of the reports in your city (or /map followed by an address)\n"
+        "/city - Choose the city your reports go to\n"
     )
     await query.edit_message_text(help_text, parse_mode='Markdown', reply_markup=build_help_menu()) 
 
@@ -71,12 +102,11 @@ async def handle_faq(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None
     query = update.callback_query
     await query.answer()
     try:
-        response = await _httpx_with_retry("GET", TELEGRAM_FAQ_URL)
+        faq_items = await get_faq_items(tenants.for_update(update))
     except Exception as e:
         await query.edit_message_text(f"Error connecting to server: {e}")
         return
-    if response.status_code == 200:
-        faq_items = response.json()
+    if faq_items is not None:
         faq_text = "❓ *Frequently Asked Questions:*\n\n"
         for item in faq_items:
             faq_text += f"*Q: {item['question']}*\nA: {item['answer']}\n\n"
@@ -0,0 +1,155 @@
+from __future__ import annotations
+import asyncio
+import io
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional, Tuple
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # without Pillow photos are uploaded as received
+    Image = None
+
+# ------------------------------------------------------------------ #
+# Configuration
+# ------------------------------------------------------------------ #
+PHOTO_MAX_DIMENSION = int(os.getenv("PHOTO_MAX_DIMENSION", "1600"))
+PHOTO_JPEG_QUALITY = int(os.getenv("PHOTO_JPEG_QUALITY", "80"))
+IMAGE_WORKERS = int(os.getenv("IMAGE_WORKERS", str(min(4, os.cpu_count() or 1))))
+
+_executor: Optional[ProcessPoolExecutor] = None
+
+# APP segments that describe the pixels rather than the photo: JFIF, ICC profile, Adobe
+_PIXEL_SEGMENTS = ("APP0", "APP2", "APP14")
+
+
+class ImageRejected(Exception):
+    """A photo that could not be decoded, and so not stripped of its metadata."""
+
+
+def available() -> bool:
+    return Image is not None
+
+
+# ------------------------------------------------------------------ #
+# Worker functions (run in the process pool, must stay picklable)
+# ------------------------------------------------------------------ #
+def shrink_jpeg(data: bytes, max_dimension: int = PHOTO_MAX_DIMENSION, quality: int = PHOTO_JPEG_QUALITY) -> bytes:
+    """Downscale to ``max_dimension`` and re-encode as JPEG without metadata.
+
+    The original bytes are returned when they are already a small enough
+    JPEG, carry no metadata (EXIF, XMP, IPTC, comments) and re-encoding
+    would not make them smaller.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        is_jpeg = img.format == "JPEG"
+        has_metadata = "comment" in img.info or any(
+            marker not in _PIXEL_SEGMENTS for marker, _ in getattr(img, "applist", [])
+        )
+        needs_resize = max(img.size) > max_dimension
+        # Apply the EXIF rotation before the metadata is dropped
+        out_img = ImageOps.exif_transpose(img)
+        if needs_resize:
+            out_img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        if out_img.mode not in ("RGB", "L"):
+            out_img = out_img.convert("RGB")
+        out = io.BytesIO()
+        out_img.save(out, "JPEG", quality=quality, optimize=True)
+    encoded = out.getvalue()
+    if is_jpeg and not needs_resize and not has_metadata and len(encoded) >= len(data):
+        return data
+    return encoded
+
+
+def photo_hash(data: bytes) -> int:
+    """64-bit difference hash (dHash) of the photo.
+
+    The JPEG is decoded at a reduced scale (``draft``), which is enough for
+    a 9x8 thumbnail and much cheaper than a full decode.
+    """
+    with Image.open(io.BytesIO(data)) as img:
+        img.draft("L", (64, 64))
+        px = img.convert("L").resize((9, 8), Image.BILINEAR).tobytes()
+    bits = 0
+    for row in range(0, 72, 9):
+        for col in range(row, row + 8):
+            bits = (bits << 1) | (px[col] > px[col + 1])
+    return bits
+
+
+def prepare_photo(data: bytes, shrink: bool, max_dimension: int, quality: int) -> Tuple[Optional[bytes], Optional[int]]:
+    """Hash and optionally shrink a photo in a single trip to the pool.
+
+    Returns ``None`` instead of the bytes when the photo is unchanged, so
+    they are not pickled back to the event loop for nothing. A failed
+    shrink raises: the photo could not be stripped of its metadata.
+    """
+    try:
+        phash = photo_hash(data)
+    except Exception:
+        phash = None
+    processed = shrink_jpeg(data, max_dimension, quality) if shrink else None
+    return (None if processed is data else processed), phash
+
+
+# ------------------------------------------------------------------ #
+# Pool
+# ------------------------------------------------------------------ #
+def get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        # fork: bot_config.py starts the bot at import time, so spawn-style
+        # workers that re-import __main__ must be avoided. Forking once other
+        # threads exist can deadlock a worker, hence start_pool() at startup.
+        _executor = ProcessPoolExecutor(
+            max_workers=IMAGE_WORKERS,
+            mp_context=multiprocessing.get_context("fork"),
+        )
+    return _executor
+
+
+def start_pool() -> None:
+    """Fork the workers now, before the process starts any thread.
+
+    With the fork context the executor launches every worker on its first
+    submit, before its own manager thread; later ``asyncio.to_thread``
+    calls then cannot be caught mid-lock by a fork.
+    """
+    if available():
+        get_executor().submit(os.getpid).result()
+
+
+async def run_in_pool(func, *args):
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(), func, *args)
+
+
+async def prepare(data: bytes, shrink: bool) -> Tuple[bytes, Optional[int]]:
+    """Perceptual hash plus optional shrink, off the event loop.
+
+    Raises ImageRejected when a shrink was asked for and failed, since the
+    original may still carry metadata. Without a shrink a failure returns
+    ``data`` untouched and no hash.
+    """
+    if not available():
+        if shrink:
+            # Only the re-encode strips EXIF, GPS and XMP
+            raise ImageRejected("Pillow is not installed")
+        return data, None
+    try:
+        processed, phash = await run_in_pool(prepare_photo, data, shrink, PHOTO_MAX_DIMENSION, PHOTO_JPEG_QUALITY)
+        return (data if processed is None else processed), phash
+    except Exception as e:
+        if shrink:
+            print(f"Image processing failed, rejecting the photo: {e}")
+            raise ImageRejected(str(e)) from e
+        print(f"Image processing failed, uploading original: {e}")
+        return data, None
+
+
+def shutdown() -> None:
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
@@ -11,7 +11,10 @@ from telegram.ext import (
 import httpx
 from urllib.parse import urlparse
 import asyncio
-from .start import BASE_URL, sessions, _httpx_with_retry   
+from typing import Optional
+from .start import sessions
+from . import metrics, tenants
+from .report_pages import report_lists
 
 
 
@@ -30,13 +33,38 @@ def build_main_menu() -> InlineKeyboardMarkup:
 
 
 
+async def ensure_session(update: Update) -> Optional[str]:
+    """Return the chat's token, silently re-authenticating if it was evicted."""
+    chat_id = update.effective_chat.id
+    token = sessions.get(chat_id)
+    if token:
+        return token
+    if sessions.is_logged_out(chat_id):
+        return None
+    username = update.effective_user.username if update.effective_user else None
+    if not username:
+        return None
+    try:
+        response = await tenants.for_chat(chat_id).request("POST", "/auth/telegram", json={"username": username, "chatId": chat_id})
+    except Exception as e:
+        print(f"Re-authentication failed for chat {chat_id}: {e}")
+        return None
+    if response.status_code != 200:
+        metrics.inc("sessions.reauth_failed")
+        return None
+    metrics.inc("sessions.reauth")
+    token = response.json()
+    sessions[chat_id] = token
+    return token
+
+
 async def handle_login(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
     username = update.effective_user.username
     try:
-        response = await _httpx_with_retry("POST", f"{BASE_URL}/auth/telegram", json={"username": username, "chat_id": chat_id})
+        response = await tenants.for_chat(chat_id).request("POST", "/auth/telegram", json={"username": username, "chat_id": chat_id})
     except Exception as e:
         await query.edit_message_text(f"Error connecting to server: {e}")
         return
@@ -55,7 +83,7 @@ async def retrieve_account(update: Update, context: ContextTypes.DEFAULT_TYPE) -
     chat_id = update.effective_chat.id
     username = update.effective_user.username
     try:
-        response = await _httpx_with_retry("POST", f"{BASE_URL}/auth/telegram", json={"username": username, "chatId": chat_id})
+        response = await tenants.for_chat(chat_id).request("POST", "/auth/telegram", json={"username": username, "chatId": chat_id})
     except Exception as e:
         await update.message.reply_text(f"Error connecting to server: {e}")
         return
@@ -73,8 +101,12 @@ async def retrieve_account(update: Update, context: ContextTypes.DEFAULT_TYPE) -
 async def logout(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Logout user and clear session."""
     chat_id = update.effective_chat.id
-    if chat_id in sessions:
-        sessions.pop(chat_id, None)
-        await update.message.reply_text("✅ Logged out successfully. Use /login to authenticate again.")
+    # Recorded even when the token was already evicted from the cache:
+    # ensure_session would otherwise log the chat back in silently
+    already_logged_out = sessions.is_logged_out(chat_id)
+    sessions.logout(chat_id)
+    report_lists.invalidate(chat_id)
+    if already_logged_out:
+        await update.message.reply_text("❌ You are not logged in.")
     else:
-        await update.message.reply_text("❌ You are not logged in.")
\ No newline at end of file
+        await update.message.reply_text("✅ Logged out successfully. Use /login to authenticate again.")
\ No newline at end of file
@@ -0,0 +1,67 @@
+from __future__ import annotations
+import asyncio
+import os
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from telegram import Message
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Media group (album) aggregation
+# ------------------------------------------------------------------ #
+# Telegram delivers an album as one update per item, all sharing a
+# media_group_id. Items are buffered until no new one arrived for the
+# debounce window, then handed to a single flush callback.
+
+MEDIA_GROUP_DEBOUNCE_S = float(os.getenv("MEDIA_GROUP_DEBOUNCE_S", "0.8"))
+
+FlushCallback = Callable[[List[Message]], Awaitable[None]]
+
+
+class _PendingGroup:
+    __slots__ = ("messages", "last_seen", "on_flush", "task")
+
+    def __init__(self, on_flush: FlushCallback) -> None:
+        self.messages: List[Message] = []
+        self.last_seen = 0.0
+        self.on_flush = on_flush
+        self.task: Optional[asyncio.Task] = None
+
+
+_pending: Dict[Tuple[int, str], _PendingGroup] = {}
+
+
+def collect(message: Message, on_flush: FlushCallback) -> None:
+    """Buffer an album item; ``on_flush`` of the first item receives all of them."""
+    key = (message.chat_id, message.media_group_id)
+    loop = asyncio.get_running_loop()
+    group = _pending.get(key)
+    if group is None:
+        group = _PendingGroup(on_flush)
+        _pending[key] = group
+        group.task = asyncio.create_task(_flush_when_quiet(key, group))
+    group.messages.append(message)
+    group.last_seen = loop.time()
+
+
+def is_pending(chat_id: int) -> bool:
+    return any(chat == chat_id for chat, _ in _pending)
+
+
+async def _flush_when_quiet(key: Tuple[int, str], group: _PendingGroup) -> None:
+    loop = asyncio.get_running_loop()
+    while True:
+        delay = group.last_seen + MEDIA_GROUP_DEBOUNCE_S - loop.time()
+        if delay <= 0:
+            break
+        await asyncio.sleep(delay)
+    del _pending[key]
+    metrics.inc("media_groups.flushed")
+    metrics.observe("media_groups.size", len(group.messages))
+    # Telegram does not guarantee delivery order within an album
+    group.messages.sort(key=lambda m: m.message_id)
+    try:
+        await group.on_flush(group.messages)
+    except Exception as e:
+        print(f"Failed to process media group {key[1]}: {e}")
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import time
+from typing import Dict, List
+
+# ------------------------------------------------------------------ #
+# In-process metrics
+# ------------------------------------------------------------------ #
+# Plain dictionaries keyed by dotted names ("chatlock.contended", ...).
+# Everything runs on the bot's event loop, so no locking is needed.
+
+STARTED_AT = time.perf_counter()
+_first_response_seen = False
+
+counters: Dict[str, int] = {}
+gauges: Dict[str, float] = {}
+# name -> [count, total, max]
+timings: Dict[str, List[float]] = {}
+
+
+def inc(name: str, amount: int = 1) -> None:
+    counters[name] = counters.get(name, 0) + amount
+
+
+def set_gauge(name: str, value: float) -> None:
+    gauges[name] = value
+
+
+def observe(name: str, value: float) -> None:
+    """Record one sample (seconds, bytes, ...) for ``name``."""
+    entry = timings.get(name)
+    if entry is None:
+        timings[name] = [1, value, value]
+        return
+    entry[0] += 1
+    entry[1] += value
+    if value > entry[2]:
+        entry[2] = value
+
+
+class timer:
+    """Context manager observing the elapsed wall time in seconds."""
+
+    __slots__ = ("name", "started")
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.started = 0.0
+
+    def __enter__(self) -> "timer":
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        observe(self.name, time.perf_counter() - self.started)
+
+
+def mark_first_response() -> None:
+    """Record how long after process start the first update was answered."""
+    global _first_response_seen
+    if _first_response_seen:
+        return
+    _first_response_seen = True
+    elapsed = time.perf_counter() - STARTED_AT
+    set_gauge("startup.time_to_first_response", elapsed)
+    print(f"Time to first response: {elapsed:.2f}s")
+
+
+def snapshot() -> Dict[str, object]:
+    """Copy of all metrics, with timings summarized as count/avg/max."""
+    summary = {
+        name: {"count": int(count), "avg": total / count if count else 0.0, "max": peak}
+        for name, (count, total, peak) in timings.items()
+    }
+    return {"counters": dict(counters), "gauges": dict(gauges), "timings": summary}
+
+
+def format_snapshot() -> str:
+    data = snapshot()
+    lines = [f"{k} = {v}" for k, v in sorted(data["counters"].items())]
+    lines += [f"{k} = {v:g}" for k, v in sorted(data["gauges"].items())]
+    lines += [
+        f"{k}: n={v['count']} avg={v['avg']:.4f} max={v['max']:.4f}"
+        for k, v in sorted(data["timings"].items())
+    ]
+    return "\n".join(lines)
+
+
+def reset() -> None:
+    counters.clear()
+    gauges.clear()
+    timings.clear()
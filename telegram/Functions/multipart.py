@@ -0,0 +1,118 @@
+from __future__ import annotations
+import os
+import secrets
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from . import metrics
+from .photos import PHOTO_MIME, PhotoBuffer
+
+# ------------------------------------------------------------------ #
+# Streaming multipart/form-data body
+# ------------------------------------------------------------------ #
+# The report body is produced chunk by chunk while httpx sends it: form
+# fields are encoded up front (they are tiny), photos are read from their
+# in-memory buffers or spool files only when the connection is ready for
+# the next chunk. The total length is known in advance from the buffer
+# sizes, so the request still carries a Content-Length.
+
+UPLOAD_CHUNK_SIZE = int(os.getenv("UPLOAD_CHUNK_SIZE", str(64 * 1024)))
+
+ProgressCallback = Callable[[int, int], None]
+
+
+def _quote(value: str) -> str:
+    # Same escaping browsers (and httpx) apply to names in Content-Disposition
+    return value.replace('"', "%22").replace("\r", "%0D").replace("\n", "%0A")
+
+
+class MultipartBody:
+    """Re-iterable async body for ``httpx`` (``content=body``).
+
+    Every iteration starts from the first byte, so ``_httpx_with_retry``
+    can resend the same body after a connection error.
+    """
+
+    def __init__(
+        self,
+        fields: Dict[str, str],
+        photos: Sequence[PhotoBuffer],
+        field: str = "photos",
+        chunk_size: int = UPLOAD_CHUNK_SIZE,
+        on_progress: Optional[ProgressCallback] = None,
+    ) -> None:
+        if chunk_size <= 0:
+            raise ValueError("chunk_size must be positive")
+        self.boundary = secrets.token_hex(16)
+        self.chunk_size = chunk_size
+        self.on_progress = on_progress
+        delimiter = f"--{self.boundary}\r\n"
+        # (encoded headers, or headers + value for plain fields; photo or None)
+        self._parts: List[Tuple[bytes, Optional[PhotoBuffer]]] = []
+        for name, value in fields.items():
+            head = f'{delimiter}Content-Disposition: form-data; name="{_quote(name)}"\r\n\r\n{value}\r\n'
+            self._parts.append((head.encode("utf-8"), None))
+        for photo in photos:
+            head = (
+                f'{delimiter}Content-Disposition: form-data; name="{_quote(field)}"; '
+                f'filename="{_quote(photo.name)}"\r\nContent-Type: {PHOTO_MIME}\r\n\r\n'
+            )
+            self._parts.append((head.encode("utf-8"), photo))
+        self._closing = f"--{self.boundary}--\r\n".encode("ascii")
+        self.length = sum(len(head) + (photo.size + 2 if photo else 0) for head, photo in self._parts) + len(self._closing)
+
+    @property
+    def headers(self) -> Dict[str, str]:
+        return {
+            "Content-Type": f"multipart/form-data; boundary={self.boundary}",
+            "Content-Length": str(self.length),
+        }
+
+    def _pieces(self) -> Iterator[bytes]:
+        """Body pieces, none longer than the chunk size."""
+        for head, photo in self._parts:
+            yield head
+            if photo is None:
+                continue
+            source = photo.open()
+            while True:
+                data = source.read(self.chunk_size)
+                if not data:
+                    break
+                yield data
+            yield b"\r\n"
+        yield self._closing
+
+    def __aiter__(self) -> AsyncIterator[bytes]:
+        return self._chunks()
+
+    async def _chunks(self) -> AsyncIterator[bytes]:
+        # Small pieces (headers, CRLFs, short photos) are coalesced so the
+        # transport sees few writes; full-size photo reads are passed on
+        # without another copy
+        sent = 0
+        pending = bytearray()
+        for piece in self._pieces():
+            if pending and len(pending) + len(piece) > self.chunk_size:
+                sent += len(pending)
+                yield bytes(pending)
+                self._report(sent)
+                pending.clear()
+            if not pending and len(piece) >= self.chunk_size:
+                sent += len(piece)
+                yield piece
+                self._report(sent)
+                continue
+            pending += piece
+        if pending:
+            sent += len(pending)
+            yield bytes(pending)
+            self._report(sent)
+        metrics.inc("uploads.bytes_sent", sent)
+
+    def _report(self, sent: int) -> None:
+        if self.on_progress is None:
+            return
+        try:
+            self.on_progress(sent, self.length)
+        except Exception as e:
+            print(f"Upload progress callback failed: {e}")
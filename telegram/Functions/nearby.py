@@ -0,0 +1,296 @@
+from __future__ import annotations
+import asyncio
+import heapq
+import math
+import os
+import time
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from telegram import (
+    InlineKeyboardButton,
+    InlineKeyboardMarkup,
+    KeyboardButton,
+    ReplyKeyboardMarkup,
+    ReplyKeyboardRemove,
+    Update,
+)
+from telegram.ext import ContextTypes, ConversationHandler
+
+from . import metrics, tenants
+
+# ------------------------------------------------------------------ #
+# Spatial index of public reports
+# ------------------------------------------------------------------ #
+# Approved reports from GET /reports are bucketed into a grid of roughly
+# square cells (NEARBY_CELL_M metres). A k-nearest query visits rings of
+# cells around the query point, nearest first, and stops as soon as the
+# next ring cannot hold anything closer than what was already found.
+
+NEARBY_CELL_M = float(os.getenv("NEARBY_CELL_M", "250"))
+NEARBY_RADIUS_M = float(os.getenv("NEARBY_RADIUS_M", "500"))
+NEARBY_K = int(os.getenv("NEARBY_K", "5"))
+NEARBY_REFRESH_S = float(os.getenv("NEARBY_REFRESH_S", "120"))
+
+WAITING_NEARBY_LOCATION = 20
+
+_METRES_PER_DEGREE = 111_320.0
+
+
+class IndexedReport:
+    __slots__ = ("id", "lat", "lon", "title", "category", "state", "date", "description", "cell", "grams")
+
+    def __init__(self, report_id: int, lat: float, lon: float, title: str, category: str,
+                 state: str, date: str, description: str = "") -> None:
+        self.id = report_id
+        self.lat = lat
+        self.lon = lon
+        self.title = title
+        self.category = category
+        self.state = state
+        self.date = date
+        self.description = description
+        self.cell: Tuple[int, int] = (0, 0)
+        # Trigrams of title and description, computed by the duplicate check on first use
+        self.grams = None
+
+    def key(self) -> tuple:
+        return (self.lat, self.lon, self.title, self.category, self.state, self.date, self.description)
+
+
+def parse_report(raw: Dict) -> Optional[IndexedReport]:
+    """IndexedReport from a report of the backend, None if it has no position."""
+    coordinates = (raw.get("location") or {}).get("coordinates") or {}
+    try:
+        lat = float(coordinates["latitude"])
+        lon = float(coordinates["longitude"])
+        report_id = int(raw["id"])
+    except (KeyError, TypeError, ValueError):
+        return None
+    description = (raw.get("document") or {}).get("description") or ""
+    return IndexedReport(report_id, lat, lon, raw.get("title") or "", raw.get("category") or "",
+                         raw.get("state") or "", raw.get("date") or "", description)
+
+
+class ReportIndex:
+    def __init__(self, cell_m: float = NEARBY_CELL_M, reference_lat: float = 45.07) -> None:
+        self.cell_m = cell_m
+        # Local equirectangular projection: exact enough at city scale
+        self._lon_scale = math.cos(math.radians(reference_lat))
+        self._cell_lat = cell_m / _METRES_PER_DEGREE
+        self._cell_lon = cell_m / (_METRES_PER_DEGREE * self._lon_scale)
+        self.reports: Dict[int, IndexedReport] = {}
+        self.cells: Dict[Tuple[int, int], List[IndexedReport]] = {}
+        # Bumped on every change, so caches derived from the index can tell it moved on
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self.reports)
+
+    def _cell_of(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (math.floor(lat / self._cell_lat), math.floor(lon / self._cell_lon))
+
+    def distance_m(self, lat1: float, lon1: float, lat2: float, lon2: float) -> float:
+        dy = (lat2 - lat1) * _METRES_PER_DEGREE
+        dx = (lon2 - lon1) * _METRES_PER_DEGREE * self._lon_scale
+        return math.hypot(dx, dy)
+
+    # -------------------------------------------------------------- #
+    # Updates
+    # -------------------------------------------------------------- #
+    def upsert(self, report: IndexedReport) -> bool:
+        """Insert or update a report; False when nothing changed."""
+        current = self.reports.get(report.id)
+        if current is not None:
+            if current.key() == report.key():
+                return False
+            self.remove(report.id)
+        report.cell = self._cell_of(report.lat, report.lon)
+        self.reports[report.id] = report
+        self.cells.setdefault(report.cell, []).append(report)
+        return True
+
+    def remove(self, report_id: int) -> bool:
+        report = self.reports.pop(report_id, None)
+        if report is None:
+            return False
+        bucket = self.cells[report.cell]
+        bucket.remove(report)
+        if not bucket:
+            del self.cells[report.cell]
+        return True
+
+    def apply(self, raw_reports: Iterable[Dict]) -> Tuple[int, int]:
+        """Bring the index in line with a full listing; returns (changed, removed)."""
+        seen = set()
+        changed = 0
+        for raw in raw_reports:
+            report = parse_report(raw)
+            if report is None:
+                continue
+            seen.add(report.id)
+            changed += self.upsert(report)
+        gone = [report_id for report_id in self.reports if report_id not in seen]
+        for report_id in gone:
+            self.remove(report_id)
+        if changed or gone:
+            self.version += 1
+        return changed, len(gone)
+
+    # -------------------------------------------------------------- #
+    # Queries
+    # -------------------------------------------------------------- #
+    def nearest(self, lat: float, lon: float, k: int = NEARBY_K,
+                radius_m: float = NEARBY_RADIUS_M) -> List[Tuple[float, IndexedReport]]:
+        """Up to ``k`` (distance in metres, report) pairs within ``radius_m``, closest first."""
+        cy, cx = self._cell_of(lat, lon)
+        max_ring = int(radius_m // self.cell_m) + 1
+        best: List[Tuple[float, int, IndexedReport]] = []  # max-heap on distance (negated)
+        for ring in range(max_ring + 1):
+            # Nothing in this ring is closer than (ring - 1) whole cells
+            if len(best) == k and (ring - 1) * self.cell_m > -best[0][0]:
+                break
+            for y, x in _ring_cells(cy, cx, ring):
+                for report in self.cells.get((y, x), ()):
+                    distance = self.distance_m(lat, lon, report.lat, report.lon)
+                    if distance > radius_m:
+                        continue
+                    item = (-distance, report.id, report)
+                    if len(best) < k:
+                        heapq.heappush(best, item)
+                    elif item > best[0]:
+                        heapq.heapreplace(best, item)
+        return [(-d, report) for d, _, report in sorted(best, reverse=True)]
+
+
+def _ring_cells(cy: int, cx: int, ring: int):
+    if ring == 0:
+        yield cy, cx
+        return
+    for x in range(cx - ring, cx + ring + 1):
+        yield cy - ring, x
+        yield cy + ring, x
+    for y in range(cy - ring + 1, cy + ring):
+        yield y, cx - ring
+        yield y, cx + ring
+
+
+# ------------------------------------------------------------------ #
+# Refresh from the backend
+# ------------------------------------------------------------------ #
+# GET /reports has no "changed since" filter, but Express answers a
+# matching If-None-Match with 304, so unchanged listings cost neither a
+# download nor a parse; changed listings are merged report by report.
+# Each tenant has its own index, refreshed from its own backend.
+
+# Tenant name -> index of its reports, and the ETag of the listing it reflects
+indexes: Dict[str, ReportIndex] = {}
+_etags: Dict[str, str] = {}
+
+
+def index_for(tenant: tenants.Tenant) -> ReportIndex:
+    index = indexes.get(tenant.name)
+    if index is None:
+        fence = tenant.geofence()
+        index = indexes[tenant.name] = ReportIndex(reference_lat=(fence.min_lat + fence.max_lat) / 2)
+    return index
+
+
+async def refresh(tenant: Optional[tenants.Tenant] = None) -> bool:
+    """Update the tenant's index from its GET /reports; True if the listing changed."""
+    tenant = tenant or tenants.default()
+    index = index_for(tenant)
+    etag = _etags.get(tenant.name)
+    headers = {"If-None-Match": etag} if etag and len(index) else {}
+    started = time.perf_counter()
+    response = await tenant.request("GET", "/reports", headers=headers)
+    if response.status_code == 304:
+        metrics.inc("nearby.refresh_not_modified")
+        return False
+    response.raise_for_status()
+    reports = response.json()
+    if isinstance(reports, dict):
+        reports = reports.get("reports", [])
+    changed, removed = index.apply(reports)
+    _etags[tenant.name] = response.headers.get("etag")
+    metrics.observe("nearby.refresh_seconds", time.perf_counter() - started)
+    metrics.inc("nearby.reports_changed", changed)
+    metrics.inc("nearby.reports_removed", removed)
+    metrics.set_gauge(tenant.metric("nearby.reports"), len(index))
+    metrics.set_gauge("nearby.reports", sum(len(i) for i in indexes.values()))
+    return bool(changed or removed)
+
+
+async def _refresh_logged(tenant: tenants.Tenant) -> None:
+    try:
+        await refresh(tenant)
+    except Exception as e:
+        print(f"Failed to refresh the nearby report index of {tenant.name}: {e}")
+
+
+async def run_periodic_refresh(interval: float = NEARBY_REFRESH_S) -> None:
+    while True:
+        await asyncio.gather(*(_refresh_logged(tenant) for tenant in tenants.all_tenants()))
+        await asyncio.sleep(interval)
+
+
+# ------------------------------------------------------------------ #
+# /nearby
+# ------------------------------------------------------------------ #
+def format_distance(metres: float) -> str:
+    if metres >= 1000:
+        return f"{metres / 1000:.1f} km"
+    return f"{max(10, round(metres, -1)):.0f} m"
+
+
+def build_nearby_message(results: List[Tuple[float, IndexedReport]], radius_m: float = NEARBY_RADIUS_M) -> str:
+    if not results:
+        return f"No public reports within {format_distance(radius_m)} of this location."
+    lines = [f"📍 {len(results)} report(s) within {format_distance(radius_m)}:"]
+    for distance, report in results:
+        lines.append(f"#{report.id} {report.title} — {format_distance(distance)} · {report.category} · {report.state}")
+    return "\n".join(lines)
+
+
+def build_nearby_keyboard(results: List[Tuple[float, IndexedReport]]) -> Optional[InlineKeyboardMarkup]:
+    if not results:
+        return None
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"Follow #{report.id}", callback_data=f"start_follow_{report.id}")]
+        for _, report in results
+    ])
+
+
+async def nearby_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    keyboard = ReplyKeyboardMarkup(
+        [[KeyboardButton("📍 Send my location", request_location=True)]],
+        one_time_keyboard=True,
+        resize_keyboard=True,
+    )
+    await update.message.reply_text(
+        "Share a location to see the reports already sent around it. Send /cancel to stop.",
+        reply_markup=keyboard,
+    )
+    return WAITING_NEARBY_LOCATION
+
+
+async def receive_nearby_location(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    location = update.message.location
+    tenant = tenants.for_update(update)
+    index = index_for(tenant)
+    if not len(index):
+        try:
+            await refresh(tenant)
+        except Exception as e:
+            print(f"Failed to load reports for /nearby: {e}")
+    with metrics.timer("nearby.query_seconds"):
+        results = index.nearest(location.latitude, location.longitude)
+    await update.message.reply_text(build_nearby_message(results), reply_markup=ReplyKeyboardRemove())
+    keyboard = build_nearby_keyboard(results)
+    if keyboard is not None:
+        await update.message.reply_text("Tap to get updates about a report:", reply_markup=keyboard)
+    return ConversationHandler.END
+
+
+async def cancel_nearby(update: Update, context: ContextTypes.DEFAULT_TYPE) -> int:
+    await update.message.reply_text("Operation cancelled.", reply_markup=ReplyKeyboardRemove())
+    return ConversationHandler.END
@@ -1,11 +1,11 @@
 from __future__ import annotations
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from telegram import InputFile
 import aiofiles
 import io
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
-from .login import build_main_menu
+from .login import build_main_menu, ensure_session
 from telegram.ext import (
     ApplicationBuilder,
     CommandHandler,
@@ -16,7 +16,10 @@ from telegram.ext import (
     ContextTypes,
 )
 import httpx
-from .start import BASE_URL, TELEGRAM_REPORT_URL,sessions, _httpx_with_retry
+from .start import sessions
+from . import tenants
+from .report_cards import render_card
+from .report_pages import PageFetchError, ReportPager, build_page_keyboard, build_page_text, report_lists
 from urllib.parse import urlparse
 # Conversation states for this file
 WAITING_ID_TO_FOLLOW = 10
@@ -47,108 +50,122 @@ async def handle_back_to_main_menu(update: Update, context: ContextTypes.DEFAULT
         reply_markup=build_main_menu()
     )
 def build_rep_msg(rpt: Dict) -> str:
-    
-    report_id = rpt.get('id')
-    title = rpt.get('title')
-    state = rpt.get('state')
-
-    # Start building the message text
-    text_parts = []
-    if report_id:
-        text_parts.append(f"📝 *Report ID:* {report_id}")
-    if title:
-        text_parts.append(f"📄 *Title:* {title}")
-
-    # Safely get description
-    description = rpt.get("document", {}).get("description")
-    if description:
-        if len(description) > 100:
-            description = description[:100] + "..."
-        text_parts.append(f"ℹ️ *Description:* {description}")
-
-    if state:
-        text_parts.append(f"📢 *State:* `{state}`")
-    
-    rpt_text = "\n".join(text_parts)
-    return rpt_text
+    return render_card(rpt)
 
-async def handle_view_reports(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
-    query = update.callback_query
-    await query.answer()
-    chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
-    if not token:
-        await query.edit_message_text(STR_LOGIN_ALERT)
-        return
-    try:
-        response = await _httpx_with_retry(
+def _report_page_fetch(chat_id: int, token: str):
+    async def fetch(page: int, limit: int):
+        response = await tenants.for_chat(chat_id).request(
             "GET",
-            f"{BASE_URL}/telegram/reports",
+            "/telegram/reports",
+            params={"page": page, "limit": limit},
             headers={"Authorization": f"Bearer {token}"},
         )
-        if response.status_code == 200:
-            reports = response.json()
-            if isinstance(reports, dict):
-                reports = reports.get("reports", [])
-
-            if not reports:
-                await query.message.reply_text(
-                    "No reports found. Choose an option:",
-                    reply_markup=build_main_menu()
-                )
-                return
-
-            # Edit the original message to indicate reports are being sent
-            await query.message.reply_text("Here are the reports found:")
-
-            # Send each report as a new message
-            for rpt in reports:
-                rpt_text = build_rep_msg(rpt)
-                
-                # Build keyboard for each report
-                keyboard = build_receive_notification_keyboard(rpt.get('id'))
-                
-                # Use reply_text to send a new message for each report
-                await query.message.reply_text(
-                    text=rpt_text,
-                    reply_markup=keyboard,
-                    parse_mode='Markdown'
-                )
-            
-            # After sending all reports, send the main menu
-            await query.message.reply_text(
-                STR_NEXT,
-                reply_markup=build_main_menu()
-            )
+        if response.status_code != 200:
+            raise PageFetchError(response.status_code, response.text)
+        return response.json()
+    return fetch
 
-        elif response.status_code == 401:
-            sessions.pop(chat_id, None)
-            await query.edit_message_text(STR_EXPIRED_SESSION)
+
+async def _show_report_page(update: Update, pager: ReportPager, number: int, edit: bool) -> None:
+    query = update.callback_query
+    message = query.message if query else update.message
+
+    async def show(text: str, reply_markup: InlineKeyboardMarkup, parse_mode: Optional[str] = None) -> None:
+        if edit:
+            await query.edit_message_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
         else:
-            await query.edit_message_text(f"❌ Error retrieving reports: {response.text}")
+            await message.reply_text(text, reply_markup=reply_markup, parse_mode=parse_mode)
+
+    try:
+        number, reports = await pager.page(number)
+    except PageFetchError as e:
+        # The cached pager holds the failed request's token: start over next time
+        report_lists.invalidate(update.effective_chat.id)
+        if e.status_code == 401:
+            sessions.pop(update.effective_chat.id, None)
+            await show(STR_EXPIRED_SESSION, build_main_menu())
+        else:
+            await show(f"❌ Error retrieving reports: {e.text}", build_main_menu())
+        return
     except Exception as e:
-        await query.edit_message_text(f"Error connecting to server: {e}")
+        report_lists.invalidate(update.effective_chat.id)
+        await show(f"Error connecting to server: {e}", build_main_menu())
+        return
+    if not reports:
+        await show("No reports found. Choose an option:", build_main_menu())
+        return
+    await show(
+        build_page_text(pager, number, reports, build_rep_msg),
+        build_page_keyboard(pager, number, reports),
+        parse_mode="Markdown",
+    )
+    pager.prefetch(number)
+
+
+async def handle_view_reports(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    query = update.callback_query
+    if query:
+        await query.answer()
+    chat_id = update.effective_chat.id
+    token = await ensure_session(update)
+    if not token:
+        if query:
+            await query.edit_message_text(STR_LOGIN_ALERT)
+        else:
+            await update.message.reply_text(STR_LOGIN_ALERT)
+        return
+    pager = report_lists.get(chat_id)
+    if pager is None:
+        # Pages are loaded as the user browses, then kept until the list changes
+        pager = ReportPager(_report_page_fetch(chat_id, token))
+        report_lists.put(chat_id, pager)
+    await _show_report_page(update, pager, 0, edit=False)
+
+
+async def handle_reports_page(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """◀ ▶ buttons of the report browser: edit the same message in place."""
+    query = update.callback_query
+    await query.answer()
+    if query.data == "reports_page_current":
+        return
+    chat_id = update.effective_chat.id
+    pager = report_lists.get(chat_id)
+    if pager is None:
+        # Expired, invalidated, or a browser message from before a restart
+        token = await ensure_session(update)
+        if not token:
+            await query.edit_message_text(STR_LOGIN_ALERT)
+            return
+        pager = ReportPager(_report_page_fetch(chat_id, token))
+        report_lists.put(chat_id, pager)
+    await _show_report_page(update, pager, int(query.data.replace("reports_page_", "")), edit=True)
 
 
 async def handle_follow_report(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     """Handles the 'Follow' button callback."""
     query = update.callback_query
     await query.answer()
+    await follow_report(update, int(query.data.replace("start_follow_", "")))
+
+
+async def follow_report(update: Update, report_id: int) -> None:
+    """Follow ``report_id`` for the user of a callback query update."""
+    query = update.callback_query
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
+    token = await ensure_session(update)
     if not token:
         await query.message.reply_text(STR_LOGIN_ALERT)
         return
 
     try:
-        report_id = int(query.data.replace("start_follow_", ""))
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "POST",
-            f"{TELEGRAM_REPORT_URL}{report_id}",
+            f"/telegram/reports/{report_id}",
             headers={"Authorization": f"Bearer {token}"},
         )
 
         if response.status_code in (200, 201):
+            report_lists.invalidate(chat_id)
             await query.message.reply_text("✅ You are now following this report. You will receive status updates.")
             await query.message.reply_text(STR_NEXT, reply_markup=build_main_menu())
         elif response.status_code == 409:  # Conflict
@@ -168,7 +185,7 @@ async def handle_unfollow_report(update: Update, context: ContextTypes.DEFAULT_T
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
+    token = await ensure_session(update)
 
     if not token:
         await query.message.reply_text(STR_LOGIN_ALERT)
@@ -176,13 +193,14 @@ async def handle_unfollow_report(update: Update, context: ContextTypes.DEFAULT_T
 
     try:
         report_id = int(query.data.replace("stop_follow_", ""))
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "DELETE",
-            f"{TELEGRAM_REPORT_URL}{report_id}",
+            f"/telegram/reports/{report_id}",
             headers={"Authorization": f"Bearer {token}"},
         )
 
         if response.status_code in (200, 204):
+            report_lists.invalidate(chat_id)
             await query.message.reply_text("✅ You have stopped following this report.")
             await query.message.reply_text(STR_NEXT, reply_markup=build_main_menu())
         elif response.status_code == 404: 
@@ -204,20 +222,21 @@ async def handle_follow_all_personal_reports(update: Update, context: ContextTyp
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
+    token = await ensure_session(update)
 
     if not token:
         await query.message.reply_text(STR_LOGIN_ALERT)
         return
 
     try:
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "POST",
-            f"{TELEGRAM_REPORT_URL}",
+            "/telegram/reports/",
             headers={"Authorization": f"Bearer {token}"},
         )
 
         if response.status_code in (200, 201):
+            report_lists.invalidate(chat_id)
             await query.message.reply_text("✅ You are now following all your personal reports.")
             await query.message.reply_text(STR_NEXT, reply_markup=build_main_menu())
         elif response.status_code == 409:  # Conflict
@@ -236,21 +255,22 @@ async def handle_unfollow_all_personal_reports(update: Update, context: ContextT
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
+    token = await ensure_session(update)
 
     if not token:
         await query.message.reply_text(STR_LOGIN_ALERT)
         return
     print("Unfollow all personal reports callback triggered.")
-    print("URL: {}".format(f"{TELEGRAM_REPORT_URL}"))
+    print("URL: {}".format(tenants.for_chat(chat_id).report_url))
     try:
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "DELETE",
-            f"{TELEGRAM_REPORT_URL}",
+            "/telegram/reports/",
             headers={"Authorization": f"Bearer {token}"},
         )
 
         if response.status_code in (200, 204):
+            report_lists.invalidate(chat_id)
             await query.message.reply_text("✅ You have stopped following all your personal reports.")
             await query.message.reply_text(STR_NEXT, reply_markup=build_main_menu())
         elif response.status_code == 404: 
@@ -270,7 +290,7 @@ async def handle_manage_notifications(update: Update, context: ContextTypes.DEFA
     query = update.callback_query
     await query.answer()
     chat_id = update.effective_chat.id
-    token = sessions.get(chat_id)
+    token = await ensure_session(update)
     if not token:
         await query.edit_message_text(STR_LOGIN_ALERT)
         return
@@ -313,17 +333,18 @@ async def receive_id_to_follow(update: Update, context: ContextTypes.DEFAULT_TYP
     if message and message.text and message.text.isdigit():
         report_id = int(message.text)
         chat_id = update.effective_chat.id
-        token = sessions.get(chat_id)
+        token = await ensure_session(update)
         if not token:
             await message.reply_text(STR_LOGIN_ALERT)
             return ConversationHandler.END
 
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "POST",
-            f"{TELEGRAM_REPORT_URL}{report_id}",
+            f"/telegram/reports/{report_id}",
             headers={"Authorization": f"Bearer {token}"},
         )
         if response.status_code in (200, 201):
+            report_lists.invalidate(chat_id)
             await message.reply_text(f"✅ You are now following report {report_id}.")
         elif response.status_code == 409:
             await message.reply_text(f"ℹ️ You are already following report {report_id}.")
@@ -358,17 +379,18 @@ async def receive_id_to_unfollow(update: Update, context: ContextTypes.DEFAULT_T
     if message and message.text and message.text.isdigit():
         report_id = int(message.text)
         chat_id = update.effective_chat.id
-        token = sessions.get(chat_id)
+        token = await ensure_session(update)
         if not token:
             await message.reply_text(STR_LOGIN_ALERT)
             return ConversationHandler.END
 
-        response = await _httpx_with_retry(
+        response = await tenants.for_chat(chat_id).request(
             "DELETE",
-            f"{TELEGRAM_REPORT_URL}{report_id}",
+            f"/telegram/reports/{report_id}",
             headers={"Authorization": f"Bearer {token}"},
         )
         if response.status_code in (200, 204):
+            report_lists.invalidate(chat_id)
             await message.reply_text(f"✅ You have stopped following report {report_id}.")
         elif response.status_code == 404:
             await message.reply_text(f"ℹ️ You were not following report {report_id}.")
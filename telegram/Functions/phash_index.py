@@ -0,0 +1,87 @@
+from __future__ import annotations
+import os
+import time
+from array import array
+from typing import List, Optional, Tuple
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Recent photo hashes
+# ------------------------------------------------------------------ #
+# Fixed-capacity ring of 64-bit perceptual hashes. Lookups use
+# multi-index hashing: the hash is split into 8 bytes and every entry is
+# filed under each (byte position, byte value) bucket. Two hashes within
+# Hamming distance < 8 share at least one byte, so only the entries of 8
+# buckets have to be compared instead of the whole ring.
+
+PHASH_INDEX_SIZE = int(os.getenv("PHASH_INDEX_SIZE", "5000"))
+PHASH_NEAR_DISTANCE = int(os.getenv("PHASH_NEAR_DISTANCE", "6"))
+
+_BANDS = 8
+_MAX_DISTANCE = _BANDS - 1
+
+if not 0 <= PHASH_NEAR_DISTANCE <= _MAX_DISTANCE:
+    # Fail at startup rather than on every photo lookup
+    raise ValueError(f"PHASH_NEAR_DISTANCE must be between 0 and {_MAX_DISTANCE}, got {PHASH_NEAR_DISTANCE}")
+
+
+def hamming(a: int, b: int) -> int:
+    return (a ^ b).bit_count()
+
+
+class HashIndex:
+    def __init__(self, capacity: int = PHASH_INDEX_SIZE) -> None:
+        if not 0 < capacity <= 0xFFFF:
+            raise ValueError("capacity must be between 1 and 65535")
+        self.capacity = capacity
+        self._hashes = array("Q")
+        self._added_at = array("d")
+        self._next = 0
+        # bucket (band * 256 + byte value) -> slots, as compact unsigned shorts
+        self._buckets: List[array] = [array("H") for _ in range(_BANDS * 256)]
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    @staticmethod
+    def _bucket_ids(value: int):
+        for band in range(_BANDS):
+            yield band * 256 + ((value >> (band * 8)) & 0xFF)
+
+    def add(self, value: int) -> None:
+        slot = self._next
+        if slot < len(self._hashes):
+            # Ring is full: forget the oldest entry
+            for bucket in self._bucket_ids(self._hashes[slot]):
+                self._buckets[bucket].remove(slot)
+            self._hashes[slot] = value
+            self._added_at[slot] = time.time()
+        else:
+            self._hashes.append(value)
+            self._added_at.append(time.time())
+        for bucket in self._bucket_ids(value):
+            self._buckets[bucket].append(slot)
+        self._next = (slot + 1) % self.capacity
+        metrics.set_gauge("phash.index_size", len(self._hashes))
+
+    def nearest(self, value: int, max_distance: int = PHASH_NEAR_DISTANCE) -> Optional[Tuple[int, float]]:
+        """Closest stored hash within ``max_distance`` as (distance, added_at)."""
+        if max_distance > _MAX_DISTANCE:
+            raise ValueError(f"max_distance must be <= {_MAX_DISTANCE}")
+        hashes = self._hashes
+        best_slot = -1
+        best = max_distance + 1
+        seen = set()
+        for bucket in self._bucket_ids(value):
+            for slot in self._buckets[bucket]:
+                if slot in seen:
+                    continue
+                seen.add(slot)
+                distance = hamming(hashes[slot], value)
+                if distance < best:
+                    best, best_slot = distance, slot
+        if best_slot < 0:
+            return None
+        return best, self._added_at[best_slot]
+
@@ -0,0 +1,244 @@
+from __future__ import annotations
+import asyncio
+import io
+import os
+import time
+from typing import Awaitable, BinaryIO, Callable, List, Optional, Sequence, Tuple
+
+from . import exif, imaging, metrics, spool, tenants, transfers
+
+# ------------------------------------------------------------------ #
+# In-memory photo buffers
+# ------------------------------------------------------------------ #
+# Photos are downloaded from Telegram straight into memory and handed to
+# the multipart upload as-is. Only photos above the threshold spill to a
+# file of the photo spool (see spool.py), within its quotas.
+
+PHOTO_SPOOL_THRESHOLD = int(os.getenv("PHOTO_SPOOL_THRESHOLD", str(2 * 1024 * 1024)))
+PHOTO_MIME = "image/jpeg"
+# Image documents Pillow can decode; processing re-encodes them as JPEG, matching PHOTO_MIME
+DOCUMENT_IMAGE_MIMES = ("image/jpeg", "image/png", "image/webp")
+# Smallest Telegram variant whose longest side reaches this is uploaded
+PHOTO_MIN_DIMENSION = int(os.getenv("PHOTO_MIN_DIMENSION", "1024"))
+# Optional cap on the variant's file size (0 = no cap)
+PHOTO_MAX_BYTES = int(os.getenv("PHOTO_MAX_BYTES", "0"))
+# Bots cannot download files larger than this from Telegram
+TELEGRAM_DOWNLOAD_LIMIT = 20 * 1024 * 1024
+# How long the submit step waits for downloads still running in the background
+PHOTO_DOWNLOAD_TIMEOUT = float(os.getenv("PHOTO_DOWNLOAD_TIMEOUT", "30"))
+
+
+class PhotoBuffer:
+    """One report photo, kept in memory until it grows past the spool threshold.
+
+    Implements ``write`` so it can be passed directly to
+    ``telegram.File.download_to_memory``. The download can run in the
+    background (``prefetch``) while the conversation moves on.
+    """
+
+    __slots__ = ("file_id", "name", "chat_id", "size", "original_size", "phash", "gps", "_file", "_spool", "_task", "__weakref__")
+
+    def __init__(self, file_id: str, name: str, chat_id: Optional[int] = None) -> None:
+        self.file_id = file_id
+        self.name = name
+        # Spilled bytes count against this chat's spool quota
+        self.chat_id = chat_id
+        self.size = 0
+        # Size as received from Telegram, before downscaling
+        self.original_size = 0
+        # 64-bit perceptual hash, set once the photo has been processed
+        self.phash: Optional[int] = None
+        # (latitude, longitude) from EXIF, read before processing strips it
+        self.gps: Optional[Tuple[float, float]] = None
+        self._file: BinaryIO = io.BytesIO()
+        self._spool: Optional[spool.SpoolEntry] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def spilled(self) -> bool:
+        return self._spool is not None
+
+    @property
+    def closed(self) -> bool:
+        return self._file.closed
+
+    def write(self, data: bytes) -> int:
+        if not self.spilled and self.size + len(data) > PHOTO_SPOOL_THRESHOLD:
+            self._rollover()
+        if self._spool is not None:
+            # Raises SpoolQuotaExceeded, failing the download
+            spool.photo_spool.reserve(self._spool, len(data))
+        written = self._file.write(data)
+        self.size += written
+        return written
+
+    def _rollover(self) -> None:
+        entry, spool_file = spool.photo_spool.create(self.chat_id, self, initial=self.size)
+        spool_file.write(self._file.getbuffer())
+        self._file.close()
+        self._file = spool_file
+        self._spool = entry
+        metrics.inc("photos.spilled")
+
+    def _release_spool(self) -> None:
+        if self._spool is not None:
+            spool.photo_spool.release(self._spool)
+            self._spool = None
+
+    async def download(self, tg_file) -> "PhotoBuffer":
+        await tg_file.download_to_memory(self)
+        self.original_size = self.size
+        metrics.inc("photos.downloaded_bytes", self.size)
+        return self
+
+    def read_all(self) -> bytes:
+        return self.open().read()
+
+    def replace(self, data: bytes) -> None:
+        self._file.close()
+        self._release_spool()
+        self._file = io.BytesIO()
+        self.size = 0
+        self.write(data)
+
+    async def process(self, shrink: bool = True) -> None:
+        """Hash and, if asked, downscale the photo in the image process pool."""
+        started = time.perf_counter()
+        data = self.read_all()
+        processed, self.phash = await imaging.prepare(data, shrink)
+        if processed is not data:
+            self.replace(processed)
+            metrics.inc("photos.bytes_saved", self.original_size - self.size)
+        metrics.observe("photos.process_seconds", time.perf_counter() - started)
+
+    def prefetch(self, source, shrink: bool = True, on_ready: Optional[ReadyCallback] = None) -> None:
+        """Start downloading ``source`` (a PhotoSize or File) without waiting for it.
+
+        ``on_ready`` is awaited once the photo has been downloaded and hashed,
+        or rejected as unreadable (the photo is then closed).
+        """
+        self._task = asyncio.create_task(self._fetch(source, shrink, on_ready))
+
+    async def _fetch(self, source, shrink: bool, on_ready: Optional[ReadyCallback]) -> None:
+        tenant = tenants.for_chat(self.chat_id).name
+        async with transfers.downloads.slot(self.chat_id, getattr(source, "file_size", None) or 0, tenant) as transfer:
+            started = time.perf_counter()
+            tg_file = await source.get_file()
+            await self.download(tg_file)
+            transfer.done(self.size)
+            metrics.observe("photos.download_seconds", time.perf_counter() - started)
+        self.gps = exif.read_gps(self.open().read(exif.EXIF_SCAN_BYTES))
+        try:
+            await self.process(shrink)
+        except imaging.ImageRejected:
+            # Never uploaded as received: it could still carry EXIF or XMP
+            metrics.inc("photos.rejected")
+            self.close()
+        if on_ready is not None:
+            try:
+                await on_ready(self)
+            except Exception as e:
+                # The photo itself is fine: a failed reply must not drop it from the report
+                metrics.inc("photos.ready_callback_failed")
+                print(f"Photo ready callback failed for {self.name}: {e}")
+
+    @property
+    def ready(self) -> bool:
+        task = self._task
+        if self._file.closed:
+            return False
+        return task is None or (task.done() and not task.cancelled() and task.exception() is None)
+
+    def open(self) -> BinaryIO:
+        """The underlying buffer, rewound; no copy of the photo is made."""
+        self._file.seek(0)
+        return self._file
+
+    def as_multipart(self, field: str = "photos") -> Tuple[str, Tuple[str, BinaryIO, str]]:
+        return (field, (self.name, self.open(), PHOTO_MIME))
+
+    def close(self) -> None:
+        task = self._task
+        # on_ready may close the photo from inside its own download task
+        if task is not None and not task.done() and task is not asyncio.current_task():
+            task.cancel()
+            metrics.inc("photos.downloads_cancelled")
+        self._file.close()
+        self._release_spool()
+
+    def __repr__(self) -> str:
+        where = "disk" if self.spilled else "memory"
+        return f"PhotoBuffer({self.name!r}, {self.size} B, {where})"
+
+
+ReadyCallback = Callable[[PhotoBuffer], Awaitable[None]]
+
+
+def select_photo_size(sizes: Sequence, min_dimension: int = PHOTO_MIN_DIMENSION,
+                      max_bytes: int = PHOTO_MAX_BYTES):
+    """Pick the smallest PhotoSize that is still good enough for a report.
+
+    That is the smallest variant whose longest side reaches
+    ``min_dimension`` (or the largest one if none does), stepped down to the
+    largest variant within ``max_bytes`` when a byte budget is configured.
+    """
+    ordered = sorted(sizes, key=lambda s: s.width * s.height)
+    chosen = next((s for s in ordered if max(s.width, s.height) >= min_dimension), ordered[-1])
+    if max_bytes and (chosen.file_size or 0) > max_bytes:
+        within_budget = [s for s in ordered if s.file_size and s.file_size <= max_bytes]
+        if within_budget:
+            chosen = within_budget[-1]
+    metrics.inc(f"photos.variant.{ordered.index(chosen)}_of_{len(ordered)}")
+    return chosen
+
+
+def can_buffer(chat_id: int, expected_size: Optional[int]) -> bool:
+    """Whether a photo of ``expected_size`` bytes fits in memory or in the spool quotas."""
+    if not expected_size or expected_size <= PHOTO_SPOOL_THRESHOLD:
+        return True
+    return spool.photo_spool.has_room(chat_id, expected_size)
+
+
+def needs_shrink(source) -> bool:
+    """Telegram variants already within the size limit are uploaded as-is.
+
+    Images sent as documents have unknown dimensions and any format, so
+    they are always processed.
+    """
+    width, height = getattr(source, "width", None), getattr(source, "height", None)
+    if not isinstance(width, int) or not isinstance(height, int):
+        return True
+    return max(width, height) > imaging.PHOTO_MAX_DIMENSION
+
+
+def format_size(size: int) -> str:
+    if size >= 1024 * 1024:
+        return f"{size / (1024 * 1024):.1f} MB"
+    return f"{max(1, round(size / 1024))} KB"
+
+
+async def wait_for_photos(photos: List[PhotoBuffer], timeout: float = PHOTO_DOWNLOAD_TIMEOUT) -> List[PhotoBuffer]:
+    """Wait for background downloads and return the photos that completed."""
+    pending = [photo._task for photo in photos if photo._task is not None and not photo._task.done()]
+    if pending:
+        started = time.perf_counter()
+        _, not_done = await asyncio.wait(pending, timeout=timeout)
+        metrics.observe("photos.submit_wait_seconds", time.perf_counter() - started)
+        for task in not_done:
+            task.cancel()
+            metrics.inc("photos.download_timeouts")
+    ready = [photo for photo in photos if photo.ready]
+    if len(ready) < len(photos):
+        metrics.inc("photos.download_failures", len(photos) - len(ready))
+    return ready
+
+
+def close_all(photos) -> None:
+    for photo in photos:
+        close = getattr(photo, "close", None)
+        if close is None:
+            continue
+        try:
+            close()
+        except Exception:
+            pass
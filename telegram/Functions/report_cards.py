@@ -0,0 +1,111 @@
+from __future__ import annotations
+import os
+import re
+from collections import OrderedDict
+from typing import Dict, Optional
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Report cards
+# ------------------------------------------------------------------ #
+# Text of one report as shown in the report browser, in Telegram's legacy
+# Markdown. User text (title, description) is escaped so that a stray "*"
+# or "_" cannot make Telegram reject the whole message.
+#
+# Cards are memoized per (template, report id, state, updatedAt): the
+# backend sends the same reports again on every page view, and a card only
+# changes when its report does. Reports without updatedAt fall back to
+# their creation date, so an edited title may show the old text until the
+# state changes or the card is evicted.
+
+REPORT_CARD_CACHE_SIZE = int(os.getenv("REPORT_CARD_CACHE_SIZE", "5000"))
+# Template used by the report browser: "expanded" or "compact"
+REPORT_CARD_TEMPLATE = os.getenv("REPORT_CARD_TEMPLATE", "expanded")
+CARD_DESCRIPTION_CHARS = 100
+CARD_COMPACT_TITLE_CHARS = 40
+
+# Characters with a meaning in legacy Markdown outside of an entity
+_MARKDOWN_SPECIAL = re.compile(r"([_*`\[])")
+
+
+def escape_markdown(text: str) -> str:
+    return _MARKDOWN_SPECIAL.sub(r"\\\1", text)
+
+
+def _truncate(text: str, limit: int) -> str:
+    # Cut before escaping, so an escape sequence is never split
+    return text[:limit] + "..." if len(text) > limit else text
+
+
+def _code(text: str) -> str:
+    # Nothing can be escaped inside `...`: drop the backticks instead
+    return f"`{text.replace('`', '')}`"
+
+
+def _expanded(rpt: Dict) -> str:
+    report_id = rpt.get("id")
+    title = rpt.get("title")
+    state = rpt.get("state")
+    parts = []
+    if report_id:
+        parts.append(f"📝 *Report ID:* {report_id}")
+    if title:
+        parts.append(f"📄 *Title:* {escape_markdown(str(title))}")
+    description = (rpt.get("document") or {}).get("description")
+    if description:
+        parts.append(f"ℹ️ *Description:* {escape_markdown(_truncate(str(description), CARD_DESCRIPTION_CHARS))}")
+    if state:
+        parts.append(f"📢 *State:* {_code(str(state))}")
+    return "\n".join(parts)
+
+
+def _compact(rpt: Dict) -> str:
+    parts = [f"📝 *#{rpt.get('id')}*"] if rpt.get("id") else []
+    if rpt.get("title"):
+        parts.append(escape_markdown(_truncate(str(rpt["title"]), CARD_COMPACT_TITLE_CHARS)))
+    if rpt.get("state"):
+        parts.append(_code(str(rpt["state"])))
+    return " · ".join(parts)
+
+
+TEMPLATES = {"expanded": _expanded, "compact": _compact}
+
+
+class CardCache:
+    """LRU map of rendered cards."""
+
+    def __init__(self, capacity: int = REPORT_CARD_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        self._cards: "OrderedDict[tuple, str]" = OrderedDict()
+
+    def render(self, rpt: Dict, template: str = REPORT_CARD_TEMPLATE) -> str:
+        build = TEMPLATES[template]
+        if rpt.get("id") is None:
+            return build(rpt)
+        key = (template, rpt.get("id"), rpt.get("state"), rpt.get("updatedAt") or rpt.get("date"))
+        card = self._cards.get(key)
+        if card is not None:
+            self._cards.move_to_end(key)
+            metrics.inc("report_cards.hits")
+            return card
+        metrics.inc("report_cards.misses")
+        card = self._cards[key] = build(rpt)
+        while len(self._cards) > self.capacity:
+            self._cards.popitem(last=False)
+            metrics.inc("report_cards.evicted")
+        metrics.set_gauge("report_cards.size", len(self._cards))
+        return card
+
+    def __len__(self) -> int:
+        return len(self._cards)
+
+    def clear(self) -> None:
+        self._cards.clear()
+
+
+card_cache = CardCache()
+
+
+def render_card(rpt: Dict, template: Optional[str] = None) -> str:
+    return card_cache.render(rpt, template or REPORT_CARD_TEMPLATE)
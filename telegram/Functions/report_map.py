@@ -0,0 +1,266 @@
+from __future__ import annotations
+import asyncio
+import io
+import math
+import os
+import time
+from array import array
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from telegram import Update
+from telegram.ext import ContextTypes
+
+from . import geocoder, geofence, imaging, metrics, nearby, tenants
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # /map needs Pillow, like photo processing
+    Image = None
+
+# ------------------------------------------------------------------ #
+# /map: cluster map of the public reports
+# ------------------------------------------------------------------ #
+# Reports inside the city boundary are grouped in a grid of
+# MAP_CLUSTER_PX pixel cells; each non-empty cell is drawn as one circle
+# at the centroid of its reports, sized by how many it holds. Rendering
+# runs in the imaging process pool. PNGs are cached per (tenant, area,
+# zoom, index version) with LRU eviction, and once a PNG has been sent its
+# Telegram file_id is kept so later requests resend it without uploading.
+
+MAP_SIZE_PX = int(os.getenv("MAP_SIZE_PX", "800"))
+MAP_CLUSTER_PX = int(os.getenv("MAP_CLUSTER_PX", "48"))
+MAP_CACHE_SIZE = int(os.getenv("MAP_CACHE_SIZE", "32"))
+# Zoom used around a typed address; zoom 0 is the whole city, each level halves the span
+MAP_ADDRESS_ZOOM = 3
+MAP_MAX_ZOOM = 6
+
+BBox = Tuple[float, float, float, float]  # min_lat, min_lon, max_lat, max_lon
+
+_BACKGROUND = (248, 248, 245)
+_CITY_FILL = (233, 238, 228)
+_CITY_OUTLINE = (120, 140, 110)
+_CLUSTER_FILL = (214, 69, 65)
+_CLUSTER_OUTLINE = (255, 255, 255)
+
+
+# ------------------------------------------------------------------ #
+# Worker side (runs in the process pool, must stay picklable)
+# ------------------------------------------------------------------ #
+# (boundary file, addresstype) -> rings, loaded once per worker process
+_rings: Dict[Tuple[str, str], list] = {}
+
+
+def _city_rings(boundary: Tuple[str, str]):
+    rings = _rings.get(boundary)
+    if rings is None:
+        rings = _rings[boundary] = geofence.load_rings(*boundary)
+    return rings
+
+
+class _Projection:
+    """Equirectangular lat/lon -> pixel mapping of a bbox, aspect preserved."""
+
+    def __init__(self, bbox: BBox, size: int) -> None:
+        min_lat, min_lon, max_lat, max_lon = bbox
+        self.min_lat, self.max_lat, self.min_lon = min_lat, max_lat, min_lon
+        self.x_scale = math.cos(math.radians((min_lat + max_lat) / 2))
+        width = (max_lon - min_lon) * self.x_scale
+        height = max_lat - min_lat
+        self.scale = size / max(width, height)
+        self.width = max(1, round(width * self.scale))
+        self.height = max(1, round(height * self.scale))
+
+    def __call__(self, lat: float, lon: float) -> Tuple[float, float]:
+        return (lon - self.min_lon) * self.x_scale * self.scale, (self.max_lat - lat) * self.scale
+
+
+def cluster_points(points: array, projection: _Projection, cell_px: int) -> List[Tuple[float, float, int]]:
+    """Grid clusters of (lat, lon) pairs: (x, y, count) at each cell's centroid."""
+    cells: Dict[Tuple[int, int], List[float]] = {}
+    for i in range(0, len(points), 2):
+        x, y = projection(points[i], points[i + 1])
+        if not (0 <= x < projection.width and 0 <= y < projection.height):
+            continue
+        cell = cells.get((int(x // cell_px), int(y // cell_px)))
+        if cell is None:
+            cells[(int(x // cell_px), int(y // cell_px))] = [x, y, 1]
+        else:
+            cell[0] += x
+            cell[1] += y
+            cell[2] += 1
+    return [(sx / n, sy / n, n) for sx, sy, n in cells.values()]
+
+
+def render_map(points: array, bbox: BBox, size: int = MAP_SIZE_PX, cell_px: int = MAP_CLUSTER_PX,
+               boundary: Tuple[str, str] = (geofence.GEOFENCE_PATH, "city")) -> bytes:
+    """PNG of the city boundary (file, addresstype) and the clusters of ``points`` within ``bbox``."""
+    projection = _Projection(bbox, size)
+    img = Image.new("RGB", (projection.width, projection.height), _BACKGROUND)
+    draw = ImageDraw.Draw(img)
+    for ring in _city_rings(boundary):
+        draw.polygon([projection(lat, lon) for lon, lat in ring], fill=_CITY_FILL, outline=_CITY_OUTLINE)
+    font = ImageFont.load_default()
+    clusters = cluster_points(points, projection, cell_px)
+    largest = max((n for _, _, n in clusters), default=1)
+    # Small clusters last, so they are never hidden under a large one
+    for x, y, n in sorted(clusters, key=lambda c: -c[2]):
+        radius = 5 + (cell_px / 2 - 5) * math.sqrt(n / largest)
+        draw.ellipse((x - radius, y - radius, x + radius, y + radius), fill=_CLUSTER_FILL, outline=_CLUSTER_OUTLINE, width=2)
+        if n > 1:
+            draw.text((x, y), str(n), fill=(255, 255, 255), font=font, anchor="mm")
+    out = io.BytesIO()
+    img.save(out, "PNG", optimize=True)
+    return out.getvalue()
+
+
+# ------------------------------------------------------------------ #
+# Areas and cache
+# ------------------------------------------------------------------ #
+def city_bbox(tenant: Optional[tenants.Tenant] = None) -> BBox:
+    fence = (tenant or tenants.default()).geofence()
+    return fence.min_lat, fence.min_lon, fence.max_lat, fence.max_lon
+
+
+def area(center: Optional[Tuple[float, float]] = None, zoom: int = 0,
+         tenant: Optional[tenants.Tenant] = None) -> BBox:
+    """Bbox of the city at ``zoom``, centred on ``center`` (the city centre by default)."""
+    min_lat, min_lon, max_lat, max_lon = city_bbox(tenant)
+    zoom = max(0, min(zoom, MAP_MAX_ZOOM))
+    half_lat = (max_lat - min_lat) / 2 ** (zoom + 1)
+    half_lon = (max_lon - min_lon) / 2 ** (zoom + 1)
+    lat, lon = center if center else ((min_lat + max_lat) / 2, (min_lon + max_lon) / 2)
+    # Snapped to a grid of half a view from the city's corner, so nearby
+    # requests at the same zoom share a cache entry (zoom 0 is the whole city)
+    lat = min_lat + round((lat - min_lat) / (half_lat / 2)) * (half_lat / 2)
+    lon = min_lon + round((lon - min_lon) / (half_lon / 2)) * (half_lon / 2)
+    return (round(lat - half_lat, 6), round(lon - half_lon, 6), round(lat + half_lat, 6), round(lon + half_lon, 6))
+
+
+def points_in(reports, bbox: BBox, fence: Optional[geofence.Geofence] = None) -> array:
+    """Flat (lat, lon) pairs of the reports inside ``bbox`` and the city."""
+    fence = fence or tenants.default().geofence()
+    min_lat, min_lon, max_lat, max_lon = bbox
+    points = array("d")
+    for report in reports:
+        if min_lat <= report.lat <= max_lat and min_lon <= report.lon <= max_lon \
+                and fence.contains(report.lat, report.lon):
+            points.append(report.lat)
+            points.append(report.lon)
+    return points
+
+
+class MapEntry:
+    __slots__ = ("png", "file_id", "reports")
+
+    def __init__(self, png: bytes, reports: int) -> None:
+        self.png = png
+        self.reports = reports
+        # Set after the first upload; Telegram then serves the photo by id
+        self.file_id: Optional[str] = None
+
+
+class MapCache:
+    def __init__(self, capacity: int = MAP_CACHE_SIZE) -> None:
+        self.capacity = capacity
+        self._entries: "OrderedDict[tuple, MapEntry]" = OrderedDict()
+        # Renders in progress, shared by identical concurrent requests
+        self._pending: Dict[tuple, asyncio.Future] = {}
+
+    def get(self, key: tuple) -> Optional[MapEntry]:
+        entry = self._entries.get(key)
+        if entry is not None:
+            self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: tuple, entry: MapEntry) -> None:
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            metrics.inc("map.cache_evictions")
+        metrics.set_gauge("map.cache_bytes", sum(len(e.png) for e in self._entries.values()))
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    async def get_or_render(self, index: nearby.ReportIndex, bbox: BBox, zoom: int,
+                            tenant: Optional[tenants.Tenant] = None) -> MapEntry:
+        tenant = tenant or tenants.default()
+        key = (tenant.name, bbox, zoom, index.version)
+        entry = self.get(key)
+        if entry is not None:
+            metrics.inc("map.cache_hits")
+            return entry
+        pending = self._pending.get(key)
+        if pending is not None:
+            metrics.inc("map.cache_hits")
+            return await asyncio.shield(pending)
+        metrics.inc("map.cache_misses")
+        future = self._pending[key] = asyncio.get_running_loop().create_future()
+        try:
+            # Filtered in a thread over a snapshot: refreshes may change the index meanwhile
+            points = await asyncio.to_thread(points_in, list(index.reports.values()), bbox, tenant.geofence())
+            started = time.perf_counter()
+            png = await imaging.run_in_pool(render_map, points, bbox, MAP_SIZE_PX, MAP_CLUSTER_PX,
+                                            (tenant.geofence_path, tenant.addresstype))
+            metrics.observe("map.render_seconds", time.perf_counter() - started)
+            entry = MapEntry(png, len(points) // 2)
+            self.put(key, entry)
+            future.set_result(entry)
+            return entry
+        except asyncio.CancelledError:
+            # Waiters see a cancellation too, not an exception holding one
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Retrieved here so an unawaited failure is not logged by asyncio
+            future.exception()
+            raise
+        finally:
+            del self._pending[key]
+
+
+map_cache = MapCache()
+
+
+# ------------------------------------------------------------------ #
+# Handler
+# ------------------------------------------------------------------ #
+async def map_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """/map for the whole city, /map <address> for the area around it."""
+    if Image is None:
+        await update.message.reply_text("The map is not available right now.")
+        return
+    query = " ".join(context.args or []).strip()
+    tenant = tenants.for_update(update)
+    center, zoom, title = None, 0, f"Reports in {tenant.label}"
+    if query:
+        results = [r for r in geocoder.lookup(query) if tenant.contains(r.lat, r.lon)]
+        if not results:
+            await update.message.reply_text(
+                f"⚠️ Address not found in {tenant.label}. Try /map alone for the whole city."
+            )
+            return
+        center, zoom, title = (results[0].lat, results[0].lon), MAP_ADDRESS_ZOOM, f"Reports around {results[0].label}"
+    index = nearby.index_for(tenant)
+    if not len(index):
+        try:
+            await nearby.refresh(tenant)
+        except Exception as e:
+            print(f"Failed to load reports for /map: {e}")
+    try:
+        entry = await map_cache.get_or_render(index, area(center, zoom, tenant), zoom, tenant)
+    except Exception as e:
+        print(f"Map rendering failed: {e}")
+        await update.message.reply_text("❌ Could not draw the map, please try again later.")
+        return
+    caption = f"🗺 {title}: {entry.reports} report(s)"
+    if entry.file_id is not None:
+        metrics.inc("map.file_id_reused")
+        await update.message.reply_photo(entry.file_id, caption=caption)
+        return
+    message = await update.message.reply_photo(entry.png, caption=caption)
+    if message.photo:
+        entry.file_id = message.photo[-1].file_id
@@ -0,0 +1,191 @@
+from __future__ import annotations
+import asyncio
+import math
+import os
+import time
+from collections import OrderedDict
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, Union
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Paginated report browser
+# ------------------------------------------------------------------ #
+# "View My Active Reports" shows one message holding a page of report
+# cards, with ◀ ▶ buttons that edit it in place. Pages are fetched when
+# first shown with GET /telegram/reports?page=&limit=, and the pages next
+# to the one on screen are fetched in the background so that navigating
+# rarely waits. A backend that ignores the parameters answers with the
+# whole list, which is then sliced locally.
+#
+# The pager of each chat, with the pages it already holds, is cached for
+# REPORT_LIST_TTL seconds. The list only changes on follow/unfollow, on a
+# submission or on a state change: the handlers doing the first two drop
+# the chat's entry, and the TTL bounds how long a state change goes unseen.
+
+REPORT_PAGE_SIZE = int(os.getenv("REPORT_PAGE_SIZE", "5"))
+REPORT_LIST_TTL = float(os.getenv("REPORT_LIST_TTL", "60"))
+REPORT_LIST_CACHE_SIZE = int(os.getenv("REPORT_LIST_CACHE_SIZE", "10000"))
+
+# (page number, page size) -> a page {"reports": [...], "total": n} or the full list
+PageFetch = Callable[[int, int], Awaitable[Union[List[Dict], Dict]]]
+
+
+class PageFetchError(Exception):
+    def __init__(self, status_code: int, text: str = "") -> None:
+        super().__init__(f"HTTP {status_code}: {text}")
+        self.status_code = status_code
+        self.text = text
+
+
+def _log_failure(task: asyncio.Task) -> None:
+    # Retrieved here so a failed prefetch nobody awaits is not logged by asyncio
+    if not task.cancelled() and task.exception() is not None:
+        metrics.inc("report_pages.fetch_failed")
+
+
+class ReportPager:
+    """Pages of one chat's report list, loaded on demand."""
+
+    def __init__(self, fetch: PageFetch, page_size: int = REPORT_PAGE_SIZE) -> None:
+        self.fetch = fetch
+        self.page_size = page_size
+        self.pages: Dict[int, List[Dict]] = {}
+        # Unknown until the first page arrives
+        self.total: Optional[int] = None
+        # Loads in progress, shared by the page on screen and the prefetch
+        self._pending: Dict[int, asyncio.Task] = {}
+
+    @property
+    def page_count(self) -> int:
+        if not self.total:
+            return 1
+        return math.ceil(self.total / self.page_size)
+
+    def clamp(self, number: int) -> int:
+        if self.total is None:
+            return max(number, 0)
+        return min(max(number, 0), self.page_count - 1)
+
+    async def page(self, number: int) -> Tuple[int, List[Dict]]:
+        """(page number, reports) of page ``number``, or of the last page if the list got shorter."""
+        number = self.clamp(number)
+        cached = self.pages.get(number)
+        if cached is not None:
+            metrics.inc("report_pages.hits")
+            return number, cached
+        metrics.inc("report_pages.misses")
+        await asyncio.shield(self._start(number))
+        number = self.clamp(number)
+        return number, self.pages.get(number, [])
+
+    def prefetch(self, number: int) -> None:
+        """Start loading the pages around ``number`` in the background."""
+        for neighbour in (number + 1, number - 1):
+            if 0 <= neighbour < self.page_count and neighbour not in self.pages and neighbour not in self._pending:
+                metrics.inc("report_pages.prefetched")
+                self._start(neighbour)
+
+    def _start(self, number: int) -> asyncio.Task:
+        task = self._pending.get(number)
+        if task is None:
+            task = self._pending[number] = asyncio.create_task(self._load(number))
+            task.add_done_callback(_log_failure)
+        return task
+
+    async def _load(self, number: int) -> None:
+        try:
+            data = await self.fetch(number, self.page_size)
+        finally:
+            self._pending.pop(number, None)
+        if isinstance(data, dict) and "total" in data:
+            self.total = int(data["total"])
+            self.pages[number] = list(data.get("reports") or [])
+            if number >= self.page_count and self.total:
+                # Past the end (the list got shorter): load the last page instead
+                await self._start(self.page_count - 1)
+            return
+        # The backend ignored the pagination parameters: slice the full list here
+        metrics.inc("report_pages.local_fallback")
+        reports = data.get("reports", []) if isinstance(data, dict) else list(data or [])
+        self.total = len(reports)
+        for start in range(0, len(reports), self.page_size):
+            self.pages[start // self.page_size] = reports[start:start + self.page_size]
+
+    def first_shown(self, number: int) -> int:
+        """1-based position of the first report of page ``number``."""
+        return number * self.page_size + 1
+
+
+class ReportListCache:
+    """Bounded chat_id -> ReportPager map with a TTL and LRU eviction."""
+
+    def __init__(self, ttl: float = REPORT_LIST_TTL, max_entries: int = REPORT_LIST_CACHE_SIZE) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        # chat_id -> (pager, stored_at); most recently used at the end
+        self._data: "OrderedDict[int, Tuple[ReportPager, float]]" = OrderedDict()
+
+    def get(self, chat_id: int) -> Optional[ReportPager]:
+        entry = self._data.get(chat_id)
+        if entry is not None and time.monotonic() - entry[1] > self.ttl:
+            del self._data[chat_id]
+            metrics.inc("report_lists.expired")
+            entry = None
+        if entry is None:
+            metrics.inc("report_lists.misses")
+            return None
+        self._data.move_to_end(chat_id)
+        metrics.inc("report_lists.hits")
+        return entry[0]
+
+    def put(self, chat_id: int, pager: ReportPager) -> None:
+        self._data[chat_id] = (pager, time.monotonic())
+        self._data.move_to_end(chat_id)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            metrics.inc("report_lists.evicted")
+        metrics.set_gauge("report_lists.size", len(self._data))
+
+    def invalidate(self, chat_id: int) -> None:
+        """Drop the chat's list after something that changes it."""
+        if self._data.pop(chat_id, None) is not None:
+            metrics.inc("report_lists.invalidations")
+            metrics.set_gauge("report_lists.size", len(self._data))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+report_lists = ReportListCache()
+
+
+def build_page_text(pager: ReportPager, number: int, reports: List[Dict], render: Callable[[Dict], str]) -> str:
+    first = pager.first_shown(number)
+    header = f"📊 Your reports {first}-{first + len(reports) - 1} of {pager.total}:"
+    return "\n\n".join([header] + [render(report) for report in reports])
+
+
+def build_page_keyboard(pager: ReportPager, number: int, reports: List[Dict]) -> InlineKeyboardMarkup:
+    rows = [
+        [
+            InlineKeyboardButton(f"Follow #{report.get('id')}", callback_data=f"start_follow_{report.get('id')}"),
+            InlineKeyboardButton(f"Stop #{report.get('id')}", callback_data=f"stop_follow_{report.get('id')}"),
+        ]
+        for report in reports
+    ]
+    if pager.page_count > 1:
+        navigation = []
+        if number > 0:
+            navigation.append(InlineKeyboardButton("◀", callback_data=f"reports_page_{number - 1}"))
+        navigation.append(InlineKeyboardButton(f"{number + 1}/{pager.page_count}", callback_data="reports_page_current"))
+        if number + 1 < pager.page_count:
+            navigation.append(InlineKeyboardButton("▶", callback_data=f"reports_page_{number + 1}"))
+        rows.append(navigation)
+    rows.append([InlineKeyboardButton("⬅️ Back to Main Menu", callback_data="back_main_menu")])
+    return InlineKeyboardMarkup(rows)
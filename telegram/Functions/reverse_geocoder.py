@@ -0,0 +1,251 @@
+from __future__ import annotations
+import math
+import mmap
+import os
+import struct
+import tempfile
+import time
+from array import array
+from typing import Callable, Optional, Tuple
+
+from . import metrics
+from .geocoder import GAZETTEER_PATH, format_address, read_gazetteer
+
+# ------------------------------------------------------------------ #
+# Reverse geocoding
+# ------------------------------------------------------------------ #
+# The house numbers of the gazetteer (see geocoder.py) are bucketed in a
+# grid of REVERSE_CELL_M cells and written once to a flat binary file,
+# which is then memory-mapped: the points stay in the page cache, shared
+# between bot processes, instead of in the Python heap. Layout, all
+# little-endian:
+#
+#     header      magic, version, min_lat, min_lon, cell_lat, cell_lon,
+#                 nx, ny, points, labels
+#     source      cell_m, gazetteer size, mtime (ns), path length
+#     path        UTF-8 absolute gazetteer path, padded to 4 bytes
+#     cells       uint32[nx * ny + 1]   first point of each cell
+#     points      int32[3 * points]     lat, lon (micro-degrees), label
+#     offsets     uint32[labels + 1]    label i is blob[offsets[i]:offsets[i + 1]]
+#     blob        UTF-8 "Via Roma 12, Centro" labels
+#
+# The file is rebuilt when its source differs from the gazetteer and cell
+# size in use: another path, size or mtime (a copy may well be older than
+# the index) or another REVERSE_CELL_M.
+
+REVERSE_INDEX_PATH = os.getenv("REVERSE_INDEX_PATH") or os.path.join(
+    tempfile.gettempdir(), "participium-reverse.idx"
+)
+REVERSE_CELL_M = float(os.getenv("REVERSE_CELL_M", "50"))
+# A pin farther than this from any house number gets no address
+REVERSE_MAX_DISTANCE_M = float(os.getenv("REVERSE_MAX_DISTANCE_M", "100"))
+
+_MAGIC = b"PRGI"
+_VERSION = 2
+_HEADER = struct.Struct("<4sI4d4I")
+_SOURCE = struct.Struct("<dQqI")
+_METRES_PER_DEGREE = 111_320.0
+_SCALE = 1_000_000
+
+
+def _source(gazetteer_path: str, cell_m: float) -> Tuple[str, int, int, float]:
+    """(path, size, mtime) of the gazetteer and the cell size it is indexed with."""
+    stat = os.stat(gazetteer_path)
+    return os.path.abspath(gazetteer_path), stat.st_size, stat.st_mtime_ns, float(cell_m)
+
+
+def _read_header(f) -> Tuple[tuple, Tuple[str, int, int, float], int]:
+    """Grid header, source and size in bytes of an index file; ValueError if it is not one."""
+    data = f.read(_HEADER.size + _SOURCE.size)
+    if len(data) < _HEADER.size + _SOURCE.size:
+        raise ValueError("Truncated reverse geocoding index")
+    header = _HEADER.unpack_from(data)
+    if header[0] != _MAGIC or header[1] != _VERSION:
+        raise ValueError("Not a reverse geocoding index")
+    cell_m, size, mtime_ns, path_length = _SOURCE.unpack_from(data, _HEADER.size)
+    path = f.read(path_length).decode("utf-8")
+    padded = (path_length + 3) // 4 * 4
+    return header, (path, size, mtime_ns, cell_m), _HEADER.size + _SOURCE.size + padded
+
+
+def build_index(gazetteer_path: str = GAZETTEER_PATH, index_path: str = REVERSE_INDEX_PATH,
+                cell_m: float = REVERSE_CELL_M) -> int:
+    """Write the reverse index of a gazetteer; returns the number of points."""
+    # Before reading: a gazetteer replaced meanwhile gets rebuilt next time
+    source_path, size, mtime_ns, cell_m = _source(gazetteer_path, cell_m)
+    labels = {}
+    points = []
+    for street, number, suffix, lat, lon, district in read_gazetteer(gazetteer_path):
+        label = format_address(street, number, suffix)
+        if district:
+            label = f"{label}, {district}"
+        points.append((lat, lon, labels.setdefault(label, len(labels))))
+    if not points:
+        raise ValueError(f"No addresses in {gazetteer_path}")
+    min_lat = min(p[0] for p in points)
+    min_lon = min(p[1] for p in points)
+    cell_lat = cell_m / _METRES_PER_DEGREE
+    cell_lon = cell_m / (_METRES_PER_DEGREE * math.cos(math.radians(min_lat)))
+    nx = int((max(p[1] for p in points) - min_lon) / cell_lon) + 1
+    ny = int((max(p[0] for p in points) - min_lat) / cell_lat) + 1
+
+    def cell(point) -> int:
+        return int((point[0] - min_lat) / cell_lat) * nx + int((point[1] - min_lon) / cell_lon)
+
+    points.sort(key=cell)
+    cells = array("I", [0]) * (nx * ny + 1)
+    for point in points:
+        cells[cell(point) + 1] += 1
+    for i in range(1, len(cells)):
+        cells[i] += cells[i - 1]
+    flat = array("i")
+    for lat, lon, label in points:
+        flat.extend((round(lat * _SCALE), round(lon * _SCALE), label))
+    blob = bytearray()
+    offsets = array("I", [0])
+    for label in labels:
+        blob += label.encode("utf-8")
+        offsets.append(len(blob))
+
+    tmp = f"{index_path}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_HEADER.pack(_MAGIC, _VERSION, min_lat, min_lon, cell_lat, cell_lon, nx, ny, len(points), len(labels)))
+        encoded = source_path.encode("utf-8")
+        f.write(_SOURCE.pack(cell_m, size, mtime_ns, len(encoded)))
+        f.write(encoded.ljust((len(encoded) + 3) // 4 * 4, b"\0"))
+        for section in (cells, flat, offsets):
+            if section.itemsize != 4:
+                raise ValueError("Unexpected array item size")
+            section.tofile(f)
+        f.write(blob)
+    os.replace(tmp, index_path)
+    return len(points)
+
+
+class ReverseGeocoder:
+    """Nearest house number of a point, read from a memory-mapped index."""
+
+    def __init__(self, path: str = REVERSE_INDEX_PATH) -> None:
+        with open(path, "rb") as f:
+            try:
+                header, self.source, start = _read_header(f)
+            except ValueError as e:
+                raise ValueError(f"{path}: {e}") from None
+            self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        (_, _, self.min_lat, self.min_lon, self.cell_lat, self.cell_lon,
+         self.nx, self.ny, n_points, n_labels) = header
+        view = self._view = memoryview(self._map)
+        sizes = (self.nx * self.ny + 1, 3 * n_points, n_labels + 1)
+        sections = []
+        for fmt, count in zip("IiI", sizes):
+            sections.append(view[start:start + 4 * count].cast(fmt))
+            start += 4 * count
+        self.cells, self.points, self.offsets = sections
+        self.blob = view[start:]
+        self.cell_m = self.cell_lat * _METRES_PER_DEGREE
+        self._lon_scale = self.cell_m / self.cell_lon
+        self.size = n_points
+
+    def label(self, index: int) -> str:
+        return bytes(self.blob[self.offsets[index]:self.offsets[index + 1]]).decode("utf-8")
+
+    def nearest(self, lat: float, lon: float, max_distance_m: float = REVERSE_MAX_DISTANCE_M,
+                accept: Optional[Callable[[float, float], bool]] = None) -> Optional[Tuple[str, float]]:
+        """(label, distance in metres) of the closest house number, or None.
+
+        ``accept(lat, lon)`` restricts the search to the house numbers it
+        returns True for, e.g. those inside a tenant's boundary.
+        """
+        cx = math.floor((lon - self.min_lon) / self.cell_lon)
+        cy = math.floor((lat - self.min_lat) / self.cell_lat)
+        nx, ny, cells, points = self.nx, self.ny, self.cells, self.points
+        lat_e6, lon_e6 = lat * _SCALE, lon * _SCALE
+        # Micro-degrees to metres
+        k_lat = _METRES_PER_DEGREE / _SCALE
+        k_lon = self._lon_scale / _SCALE
+        best, best_distance = -1, max_distance_m
+        max_ring = int(max_distance_m / self.cell_m) + 1
+        for ring in range(max_ring + 1):
+            # Every point of this ring is at least (ring - 1) cells away
+            if best >= 0 and (ring - 1) * self.cell_m > best_distance:
+                break
+            for y in range(cy - ring, cy + ring + 1):
+                if not 0 <= y < ny:
+                    continue
+                edge_row = y in (cy - ring, cy + ring)
+                for x in (range(cx - ring, cx + ring + 1) if edge_row else (cx - ring, cx + ring)):
+                    if not 0 <= x < nx:
+                        continue
+                    c = y * nx + x
+                    for i in range(cells[c], cells[c + 1]):
+                        o = 3 * i
+                        distance = math.hypot((points[o] - lat_e6) * k_lat, (points[o + 1] - lon_e6) * k_lon)
+                        if distance <= best_distance and (
+                                accept is None or accept(points[o] / _SCALE, points[o + 1] / _SCALE)):
+                            best, best_distance = points[o + 2], distance
+        if best < 0:
+            return None
+        return self.label(best), best_distance
+
+    def close(self) -> None:
+        for section in (self.cells, self.points, self.offsets, self.blob, self._view):
+            section.release()
+        self._map.close()
+
+
+_reverse: Optional[ReverseGeocoder] = None
+_unavailable = False
+
+
+def index_is_current(gazetteer_path: str, index_path: str, cell_m: float = REVERSE_CELL_M) -> bool:
+    """True if the index file was built from this gazetteer, as it is now, and cell size."""
+    try:
+        with open(index_path, "rb") as f:
+            _, source, _ = _read_header(f)
+    except (OSError, ValueError):
+        return False
+    return source == _source(gazetteer_path, cell_m)
+
+
+def ensure_index(gazetteer_path: str = GAZETTEER_PATH, index_path: str = REVERSE_INDEX_PATH,
+                 cell_m: float = REVERSE_CELL_M) -> bool:
+    """(Re)build the index file unless it is current; False without a gazetteer."""
+    if not os.path.exists(gazetteer_path):
+        return False
+    if index_is_current(gazetteer_path, index_path, cell_m):
+        return True
+    started = time.perf_counter()
+    count = build_index(gazetteer_path, index_path, cell_m)
+    metrics.observe("reverse_geocoder.build_seconds", time.perf_counter() - started)
+    print(f"Reverse geocoding index written to {index_path} ({count} addresses)")
+    return True
+
+
+def get_reverse_geocoder() -> Optional[ReverseGeocoder]:
+    """The memory-mapped index, opened on first use; None without a gazetteer."""
+    global _reverse, _unavailable
+    if _reverse is None and not _unavailable:
+        try:
+            if ensure_index():
+                _reverse = ReverseGeocoder()
+            else:
+                _unavailable = True
+        except (OSError, ValueError) as e:
+            print(f"Reverse geocoding disabled: {e}")
+            _unavailable = True
+    return _reverse
+
+
+def lookup(lat: float, lon: float, fence=None) -> Optional[str]:
+    """Address of the closest house number within REVERSE_MAX_DISTANCE_M.
+
+    With a ``fence`` (geofence.Geofence) only house numbers inside it count:
+    the gazetteer may cover a neighbouring city.
+    """
+    reverse = get_reverse_geocoder()
+    if reverse is None:
+        return None
+    with metrics.timer("reverse_geocoder.lookup_seconds"):
+        found = reverse.nearest(lat, lon, accept=fence.contains if fence is not None else None)
+    metrics.inc("reverse_geocoder.found" if found else "reverse_geocoder.not_found")
+    return found[0] if found else None
@@ -0,0 +1,131 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Iterator, List, Optional, Tuple
+
+from . import metrics
+
+
+class SessionCache:
+    """Bounded chat_id -> token map with LRU and idle eviction.
+
+    Drop-in replacement for the plain ``sessions`` dict: supports ``in``,
+    ``get``, item assignment and ``pop``. An evicted chat is not logged out
+    on the backend, the next request simply re-authenticates it (see
+    ``login.ensure_session``).
+    """
+
+    def __init__(self, max_entries: int = 100_000, idle_ttl: float = 7 * 24 * 3600,
+                 max_logged_out: int = 10_000) -> None:
+        self.max_entries = max_entries
+        self.idle_ttl = idle_ttl
+        self.max_logged_out = max_logged_out
+        # chat_id -> (token, last_seen); most recently used at the end
+        self._data: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+        # Chats that ran /logout must not be re-authenticated silently; oldest
+        # logouts are forgotten past max_logged_out, and a login clears the entry
+        self._logged_out: "OrderedDict[int, None]" = OrderedDict()
+
+    def _publish(self) -> None:
+        metrics.set_gauge("sessions.size", len(self._data))
+        metrics.set_gauge("sessions.occupancy", len(self._data) / self.max_entries)
+
+    def get(self, chat_id: int, default: Optional[str] = None) -> Optional[str]:
+        entry = self._data.get(chat_id)
+        if entry is None:
+            metrics.inc("sessions.misses")
+            return default
+        now = time.monotonic()
+        if now - entry[1] > self.idle_ttl:
+            del self._data[chat_id]
+            metrics.inc("sessions.evicted_idle")
+            metrics.inc("sessions.misses")
+            self._publish()
+            return default
+        self._data[chat_id] = (entry[0], now)
+        self._data.move_to_end(chat_id)
+        metrics.inc("sessions.hits")
+        return entry[0]
+
+    def __contains__(self, chat_id: object) -> bool:
+        return self.get(chat_id) is not None  # type: ignore[arg-type]
+
+    def __getitem__(self, chat_id: int) -> str:
+        token = self.get(chat_id)
+        if token is None:
+            raise KeyError(chat_id)
+        return token
+
+    def __setitem__(self, chat_id: int, token: str) -> None:
+        now = time.monotonic()
+        self._logged_out.pop(chat_id, None)
+        self._data[chat_id] = (token, now)
+        self._data.move_to_end(chat_id)
+        self._evict(now)
+        self._publish()
+
+    def restore(self, chat_id: int, token: str, idle_s: float) -> None:
+        """Add a session last used ``idle_s`` seconds ago, e.g. from a snapshot.
+
+        Restored sessions go to the most recently used end: add them least
+        recently used first.
+        """
+        now = time.monotonic()
+        if idle_s > self.idle_ttl:
+            metrics.inc("sessions.evicted_idle")
+            return
+        self._logged_out.pop(chat_id, None)
+        self._data[chat_id] = (token, now - idle_s)
+        self._data.move_to_end(chat_id)
+        self._evict(now)
+        self._publish()
+
+    def pop(self, chat_id: int, default: Optional[str] = None) -> Optional[str]:
+        entry = self._data.pop(chat_id, None)
+        self._publish()
+        return default if entry is None else entry[0]
+
+    def logout(self, chat_id: int) -> Optional[str]:
+        self._logged_out[chat_id] = None
+        self._logged_out.move_to_end(chat_id)
+        while len(self._logged_out) > self.max_logged_out:
+            self._logged_out.popitem(last=False)
+            metrics.inc("sessions.logged_out_evicted")
+        return self.pop(chat_id)
+
+    def is_logged_out(self, chat_id: int) -> bool:
+        return chat_id in self._logged_out
+
+    def logged_out_ids(self) -> List[int]:
+        return list(self._logged_out)
+
+    def _evict(self, now: float) -> None:
+        data = self._data
+        # Oldest entries first: stop at the first one that is neither idle nor over capacity
+        while data:
+            chat_id, (_, last_seen) = next(iter(data.items()))
+            if len(data) > self.max_entries:
+                metrics.inc("sessions.evicted_lru")
+            elif now - last_seen > self.idle_ttl:
+                metrics.inc("sessions.evicted_idle")
+            else:
+                break
+            data.popitem(last=False)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(list(self._data))
+
+    def items(self):
+        return [(chat_id, token) for chat_id, (token, _) in self._data.items()]
+
+    def entries(self) -> List[Tuple[int, str, float]]:
+        """(chat_id, token, seconds since last use), least recently used first."""
+        now = time.monotonic()
+        return [(chat_id, token, now - last_seen) for chat_id, (token, last_seen) in self._data.items()]
+
+    def clear(self) -> None:
+        self._data.clear()
+        self._publish()
@@ -0,0 +1,153 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import struct
+import tempfile
+import time
+import zlib
+from typing import Any, Dict
+
+from telegram import InlineKeyboardMarkup
+
+from . import endpoint, metrics, start, tenants
+
+# ------------------------------------------------------------------ #
+# Warm-start snapshot
+# ------------------------------------------------------------------ #
+# File layout: fixed header followed by a zlib-compressed JSON document.
+#   magic (4s) | version (H) | crc32 of payload (I) | payload length (I)
+# The default path does not survive a container restart: docker-compose
+# points SNAPSHOT_PATH at a volume.
+SNAPSHOT_PATH = os.getenv("SNAPSHOT_PATH", os.path.join(tempfile.gettempdir(), "participium_bot.snapshot"))
+SNAPSHOT_INTERVAL_S = float(os.getenv("SNAPSHOT_INTERVAL_S", "300"))
+SNAPSHOT_MAX_AGE_S = float(os.getenv("SNAPSHOT_MAX_AGE_S", str(24 * 3600)))
+
+_MAGIC = b"PTSN"
+_VERSION = 3
+# Version 2 saved sessions without their idle time
+_READABLE_VERSIONS = (2, 3)
+_HEADER = struct.Struct("<4sHII")
+
+
+def _tenant_state(tenant: tenants.Tenant) -> Dict[str, Any]:
+    keyboard = endpoint.build_category_keyboard(tenant) if tenant.categories else None
+    return {
+        "categories": tenant.categories,
+        "category_keyboard": keyboard.to_dict() if keyboard is not None else None,
+        "faq": tenant.faq_cache,
+    }
+
+
+def collect_state() -> Dict[str, Any]:
+    return {
+        "saved_at": time.time(),
+        "tenants": {tenant.name: _tenant_state(tenant) for tenant in tenants.all_tenants()},
+        "chat_tenants": tenants.chats,
+        # Least recently used first, so restoring keeps the LRU order; with
+        # the seconds since each was last used, as monotonic time does not
+        # survive a restart
+        "sessions": start.sessions.entries(),
+        "logged_out": start.sessions.logged_out_ids(),
+        "file_ids": start.file_ids,
+    }
+
+
+def encode(state: Dict[str, Any]) -> bytes:
+    payload = zlib.compress(json.dumps(state, separators=(",", ":")).encode("utf-8"), 6)
+    return _HEADER.pack(_MAGIC, _VERSION, zlib.crc32(payload), len(payload)) + payload
+
+
+def decode(raw: bytes) -> Dict[str, Any]:
+    if len(raw) < _HEADER.size:
+        raise ValueError("snapshot truncated")
+    magic, version, crc, length = _HEADER.unpack_from(raw)
+    if magic != _MAGIC or version not in _READABLE_VERSIONS:
+        raise ValueError(f"unsupported snapshot ({magic!r} v{version})")
+    payload = raw[_HEADER.size:]
+    if len(payload) != length or zlib.crc32(payload) != crc:
+        raise ValueError("snapshot checksum mismatch")
+    return json.loads(zlib.decompress(payload))
+
+
+def apply_state(state: Dict[str, Any]) -> None:
+    for name, saved in (state.get("tenants") or {}).items():
+        # Tenants removed from the configuration since the snapshot are skipped
+        tenant = tenants.get(name)
+        if tenant is None:
+            continue
+        keyboard = saved.get("category_keyboard")
+        tenant.set_categories(
+            saved.get("categories") or [],
+            InlineKeyboardMarkup.de_json(keyboard, None) if keyboard else None,
+        )
+        faq = saved.get("faq") or {}
+        tenant.faq_cache.update(items=faq.get("items"), fetched_at=faq.get("fetched_at", 0.0))
+    for chat_id, name in (state.get("chat_tenants") or {}).items():
+        if tenants.get(name) is not None:
+            tenants.assign(int(chat_id), name)
+    # The bot was down since the snapshot: that counts as idle time too
+    downtime = max(0.0, time.time() - state.get("saved_at", time.time()))
+    for chat_id, token, *idle in state.get("sessions") or []:
+        start.sessions.restore(int(chat_id), token, (idle[0] if idle else 0.0) + downtime)
+    for chat_id in state.get("logged_out") or []:
+        start.sessions.logout(int(chat_id))
+    start.file_ids.update(state.get("file_ids") or {})
+
+
+def save(path: str = SNAPSHOT_PATH) -> int:
+    """Write the snapshot atomically and return its size in bytes."""
+    return _write(encode(collect_state()), path)
+
+
+def _write(data: bytes, path: str) -> int:
+    directory = os.path.dirname(path) or "."
+    os.makedirs(directory, exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".snapshot-")
+    try:
+        # Holds session tokens: readable by the bot user only
+        os.fchmod(fd, 0o600)
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    metrics.set_gauge("snapshot.bytes", len(data))
+    return len(data)
+
+
+def load(path: str = SNAPSHOT_PATH) -> bool:
+    """Restore the warm state; a missing, stale or corrupt file is ignored."""
+    started = time.perf_counter()
+    try:
+        with open(path, "rb") as f:
+            state = decode(f.read())
+    except FileNotFoundError:
+        return False
+    except (OSError, ValueError, zlib.error) as e:
+        print(f"Ignoring invalid snapshot {path}: {e}")
+        metrics.inc("snapshot.invalid")
+        return False
+    age = time.time() - state.get("saved_at", 0)
+    if age > SNAPSHOT_MAX_AGE_S:
+        print(f"Ignoring snapshot older than {SNAPSHOT_MAX_AGE_S:.0f}s")
+        return False
+    apply_state(state)
+    elapsed = time.perf_counter() - started
+    metrics.set_gauge("snapshot.load_seconds", elapsed)
+    categories = sum(len(tenant.categories) for tenant in tenants.all_tenants())
+    print(f"Warm start: restored {categories} categories, "
+          f"{len(start.sessions)} sessions, {len(start.file_ids)} file ids in {elapsed * 1000:.1f} ms")
+    return True
+
+
+async def run_periodic_saves(interval: float = SNAPSHOT_INTERVAL_S) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            # Collect on the loop (handlers mutate the state), write in a thread
+            await asyncio.to_thread(_write, encode(collect_state()), SNAPSHOT_PATH)
+        except Exception as e:
+            print(f"Failed to write snapshot: {e}")
@@ -0,0 +1,199 @@
+from __future__ import annotations
+import asyncio
+import os
+import secrets
+import tempfile
+import time
+import weakref
+from typing import BinaryIO, Dict, Optional, Tuple
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Photo spool
+# ------------------------------------------------------------------ #
+# Photos too large to keep in memory are spilled to files in a directory
+# owned by the bot. Point PHOTO_SPOOL_DIR at a tmpfs (e.g. /dev/shm/...)
+# to keep spilled photos off the disk. Files are named
+# "<pid>-<chat>-<random>.part": a file not registered by this process and
+# whose pid is ours or no longer running is an orphan left by a crash.
+
+SPOOL_DIR = os.getenv("PHOTO_SPOOL_DIR") or os.path.join(tempfile.gettempdir(), "participium-spool")
+SPOOL_MAX_BYTES = int(os.getenv("SPOOL_MAX_BYTES", str(1024 * 1024 * 1024)))
+SPOOL_CHAT_MAX_BYTES = int(os.getenv("SPOOL_CHAT_MAX_BYTES", str(64 * 1024 * 1024)))
+# Spilled photos of drafts abandoned for this long are released
+SPOOL_MAX_AGE_S = float(os.getenv("SPOOL_MAX_AGE_S", "3600"))
+SPOOL_SWEEP_INTERVAL_S = float(os.getenv("SPOOL_SWEEP_INTERVAL_S", "300"))
+
+_SUFFIX = ".part"
+
+
+class SpoolQuotaExceeded(Exception):
+    """Writing would exceed the global or the per-chat spool quota."""
+
+
+class SpoolEntry:
+    __slots__ = ("path", "chat_id", "size", "created_at", "owner")
+
+    def __init__(self, path: str, chat_id: int, owner) -> None:
+        self.path = path
+        self.chat_id = chat_id
+        self.size = 0
+        self.created_at = time.monotonic()
+        # The PhotoBuffer using the file; closed by the sweeper when expired
+        self.owner = weakref.ref(owner) if owner is not None else None
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class SpoolManager:
+    def __init__(self, directory: str = SPOOL_DIR, max_bytes: int = SPOOL_MAX_BYTES,
+                 chat_max_bytes: int = SPOOL_CHAT_MAX_BYTES, max_age: float = SPOOL_MAX_AGE_S) -> None:
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.chat_max_bytes = chat_max_bytes
+        self.max_age = max_age
+        self.total_bytes = 0
+        self._entries: Dict[str, SpoolEntry] = {}
+        self._chat_bytes: Dict[int, int] = {}
+
+    # -------------------------------------------------------------- #
+    # Quotas
+    # -------------------------------------------------------------- #
+    def has_room(self, chat_id: int, amount: int) -> bool:
+        return (
+            self.total_bytes + amount <= self.max_bytes
+            and self._chat_bytes.get(chat_id, 0) + amount <= self.chat_max_bytes
+        )
+
+    def reserve(self, entry: SpoolEntry, amount: int) -> None:
+        """Account ``amount`` more bytes to ``entry`` or raise SpoolQuotaExceeded."""
+        if not self.has_room(entry.chat_id, amount):
+            metrics.inc("spool.quota_rejections")
+            raise SpoolQuotaExceeded(f"spool quota exceeded for chat {entry.chat_id}")
+        entry.size += amount
+        self.total_bytes += amount
+        self._chat_bytes[entry.chat_id] = self._chat_bytes.get(entry.chat_id, 0) + amount
+        self._publish()
+
+    # -------------------------------------------------------------- #
+    # Files
+    # -------------------------------------------------------------- #
+    def create(self, chat_id: Optional[int], owner=None, initial: int = 0) -> Tuple[SpoolEntry, BinaryIO]:
+        """Open a new spool file with ``initial`` bytes already reserved."""
+        chat_id = chat_id or 0
+        if not self.has_room(chat_id, initial):
+            metrics.inc("spool.quota_rejections")
+            raise SpoolQuotaExceeded(f"spool quota exceeded for chat {chat_id}")
+        os.makedirs(self.directory, mode=0o700, exist_ok=True)
+        path = os.path.join(self.directory, f"{os.getpid()}-{chat_id}-{secrets.token_hex(6)}{_SUFFIX}")
+        fd = os.open(path, os.O_RDWR | os.O_CREAT | os.O_EXCL, 0o600)
+        entry = SpoolEntry(path, chat_id, owner)
+        self._entries[path] = entry
+        self.reserve(entry, initial)
+        return entry, os.fdopen(fd, "w+b")
+
+    def release(self, entry: SpoolEntry) -> None:
+        """Remove the file and return its bytes to the quotas (idempotent)."""
+        if self._entries.pop(entry.path, None) is None:
+            return
+        self.total_bytes -= entry.size
+        remaining = self._chat_bytes.get(entry.chat_id, 0) - entry.size
+        if remaining > 0:
+            self._chat_bytes[entry.chat_id] = remaining
+        else:
+            self._chat_bytes.pop(entry.chat_id, None)
+        metrics.observe("spool.file_bytes", entry.size)
+        try:
+            os.remove(entry.path)
+        except FileNotFoundError:
+            pass
+        self._publish()
+
+    def release_all(self) -> None:
+        for entry in list(self._entries.values()):
+            self._expire(entry)
+
+    # -------------------------------------------------------------- #
+    # Cleanup
+    # -------------------------------------------------------------- #
+    def scan_orphans(self) -> int:
+        """Remove spool files not owned by a live process; returns how many."""
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            return 0
+        removed = 0
+        own_pid = os.getpid()
+        for name in names:
+            if not name.endswith(_SUFFIX):
+                continue
+            path = os.path.join(self.directory, name)
+            if path in self._entries:
+                continue
+            try:
+                pid = int(name.split("-", 1)[0])
+            except ValueError:
+                continue
+            if pid != own_pid and _pid_alive(pid):
+                # Another bot process sharing the directory
+                continue
+            try:
+                os.remove(path)
+                removed += 1
+            except FileNotFoundError:
+                pass
+        if removed:
+            metrics.inc("spool.orphans_removed", removed)
+            print(f"Removed {removed} orphaned spool file(s) from {self.directory}")
+        return removed
+
+    def sweep(self) -> int:
+        """Release expired or ownerless entries and remove orphans."""
+        now = time.monotonic()
+        expired = 0
+        for entry in list(self._entries.values()):
+            owner = entry.owner() if entry.owner is not None else None
+            if owner is None or now - entry.created_at > self.max_age:
+                self._expire(entry)
+                expired += 1
+        if expired:
+            metrics.inc("spool.expired", expired)
+        return expired + self.scan_orphans()
+
+    def _expire(self, entry: SpoolEntry) -> None:
+        owner = entry.owner() if entry.owner is not None else None
+        if owner is not None:
+            # Closing the buffer releases the entry and its file handle
+            owner.close()
+        self.release(entry)
+
+    def _publish(self) -> None:
+        metrics.set_gauge("spool.bytes", self.total_bytes)
+        metrics.set_gauge("spool.files", len(self._entries))
+        metrics.set_gauge("spool.chats", len(self._chat_bytes))
+        if self.max_bytes:
+            metrics.set_gauge("spool.utilization", self.total_bytes / self.max_bytes)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+
+photo_spool = SpoolManager()
+
+
+async def run_periodic_sweeps(interval: float = SPOOL_SWEEP_INTERVAL_S) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            photo_spool.sweep()
+        except Exception as e:
+            print(f"Spool sweep failed: {e}")
@@ -1,7 +1,7 @@
 
 from __future__ import annotations
 import os
-from typing import List, Dict
+from typing import List, Dict, Optional
 from telegram import InputFile
 import aiofiles
 import io
@@ -18,27 +18,64 @@ from telegram.ext import (
 import httpx
 import asyncio
 from urllib.parse import urlparse
+from .session_cache import SessionCache
 
 
-async def _httpx_with_retry(method: str, url: str, **kwargs):
+# Connection pool shared by every tenant, opened in post_init and closed in post_shutdown
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+_client: Optional[httpx.AsyncClient] = None
+
+
+async def open_http_client(**kwargs) -> httpx.AsyncClient:
+    global _client
+    if _client is None:
+        _client = httpx.AsyncClient(
+            timeout=5,
+            limits=httpx.Limits(max_connections=HTTP_MAX_CONNECTIONS, max_keepalive_connections=20),
+            **kwargs,
+        )
+    return _client
+
+
+async def close_http_client() -> None:
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+# Methods that can be replayed without side effects
+_IDEMPOTENT_METHODS = {"GET", "HEAD", "OPTIONS", "PUT", "DELETE"}
+# Failures before the request reached the server
+_NOT_SENT_ERRORS = (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)
+
+
+async def _request_with_retry(client: httpx.AsyncClient, method: str, url: str, **kwargs):
     # Piccolo retry esponenziale per DNS/timeout
     attempts = 3
     delay = 0.5
     last_exc = None
-    async with httpx.AsyncClient(timeout=5) as client:
-        for i in range(attempts):
-            try:
-                return await client.request(method, url, **kwargs)
-            except httpx.ConnectError as e:
-                last_exc = e
-            except httpx.ReadTimeout as e:
-                last_exc = e
-            except httpx.TransportError as e:
-                last_exc = e
-            await asyncio.sleep(delay * (2 ** i))
+    for i in range(attempts):
+        try:
+            return await client.request(method, url, **kwargs)
+        except httpx.TransportError as e:
+            # A POST that may have reached the server is not replayed: the
+            # backend does not dedupe, a retry could create a second report
+            if method.upper() not in _IDEMPOTENT_METHODS and not isinstance(e, _NOT_SENT_ERRORS):
+                raise
+            last_exc = e
+        await asyncio.sleep(delay * (2 ** i))
     raise last_exc
 
 
+async def _httpx_with_retry(method: str, url: str, **kwargs):
+    if _client is not None:
+        return await _request_with_retry(_client, method, url, **kwargs)
+    # Before post_init (and in scripts): a client for this request only
+    async with httpx.AsyncClient(timeout=5) as client:
+        return await _request_with_retry(client, method, url, **kwargs)
+
+
 def _normalize_server_url(raw: str) -> str:
     raw = (raw or "").strip()
     if not raw:
@@ -58,6 +95,11 @@ def _normalize_server_url(raw: str) -> str:
 
 async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
     await update.message.reply_text("Welcome to the Participium Bot! Use /login to authenticate. \n For help, use /help.")
+    # Once uploaded, Telegram lets us resend the sticker by file_id
+    sticker_id = file_ids.get("start_sticker")
+    if sticker_id:
+        await update.message.reply_sticker(sticker=sticker_id)
+        return
     script_dir = os.path.dirname(os.path.abspath(__file__))
     image_path = os.path.join(script_dir, "ParticipiumLogo.webp")
     if os.path.exists(image_path):
@@ -66,7 +108,9 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
             content = await f.read()
         bio = io.BytesIO(content)
         bio.name = os.path.basename(image_path)
-        await update.message.reply_sticker(sticker=bio)
+        sent = await update.message.reply_sticker(sticker=bio)
+        if sent is not None and sent.sticker is not None:
+            file_ids["start_sticker"] = sent.sticker.file_id
     else:
         print(f"Warning: Image not found at {image_path}")
 
@@ -77,4 +121,10 @@ SERVER_URL = _normalize_server_url(os.getenv("SERVER_URL", server_base_url))
 BASE_URL = SERVER_URL.rstrip("/") + "/api/v1"
 TELEGRAM_REPORT_URL = BASE_URL + "/telegram/reports/"
 TELEGRAM_FAQ_URL = BASE_URL + "/faqs/"
-sessions: Dict[int, str] = {}
\ No newline at end of file
+# Bounded: chats evicted here re-authenticate transparently on their next request
+sessions: SessionCache = SessionCache(
+    max_entries=int(os.getenv("SESSION_CACHE_SIZE", "100000")),
+    idle_ttl=float(os.getenv("SESSION_IDLE_TTL", str(7 * 24 * 3600))),
+)
+# Telegram file_ids of media already uploaded once, keyed by a local name
+file_ids: Dict[str, str] = {}
\ No newline at end of file
@@ -0,0 +1,58 @@
+from __future__ import annotations
+import time
+from collections import OrderedDict
+from typing import Optional, Set, Tuple
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Report submission registry
+# ------------------------------------------------------------------ #
+# Guards against repeated taps on the anonymity buttons: a draft can be in
+# flight only once, and chats remember their last sent draft for a while
+# so late taps get a meaningful answer instead of a new upload.
+
+RECENT_TTL_S = 600
+RECENT_MAX = 10_000
+
+_in_flight: Set[Tuple[int, str]] = set()
+# chat_id -> (idempotency key, finished_at), oldest first
+_recent: "OrderedDict[int, Tuple[str, float]]" = OrderedDict()
+
+
+def begin(chat_id: int, key: str) -> bool:
+    """Register a submission; False if the same draft is already being sent."""
+    entry = (chat_id, key)
+    if entry in _in_flight:
+        metrics.inc("reports.duplicate_submits")
+        return False
+    _in_flight.add(entry)
+    metrics.set_gauge("reports.in_flight", len(_in_flight))
+    return True
+
+
+def finish(chat_id: int, key: str, sent: bool) -> None:
+    _in_flight.discard((chat_id, key))
+    metrics.set_gauge("reports.in_flight", len(_in_flight))
+    if not sent:
+        return
+    now = time.monotonic()
+    _recent[chat_id] = (key, now)
+    _recent.move_to_end(chat_id)
+    while _recent:
+        oldest_chat, (_, finished_at) = next(iter(_recent.items()))
+        if len(_recent) <= RECENT_MAX and now - finished_at <= RECENT_TTL_S:
+            break
+        del _recent[oldest_chat]
+
+
+def recently_sent(chat_id: int) -> Optional[str]:
+    """Idempotency key of the chat's last report if it was sent recently."""
+    entry = _recent.get(chat_id)
+    if entry is None or time.monotonic() - entry[1] > RECENT_TTL_S:
+        return None
+    return entry[0]
+
+
+def is_in_flight(chat_id: int) -> bool:
+    return any(chat == chat_id for chat, _ in _in_flight)
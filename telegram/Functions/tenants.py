@@ -0,0 +1,215 @@
+from __future__ import annotations
+import asyncio
+import json
+import os
+import time
+from typing import Dict, List, Optional
+
+from telegram import InlineKeyboardButton, InlineKeyboardMarkup, Update
+from telegram.ext import ContextTypes
+
+from . import geofence, metrics, start, transfers
+from .phash_index import HashIndex
+from .report_pages import report_lists
+
+# ------------------------------------------------------------------ #
+# Tenants: one municipality each, served by the same process
+# ------------------------------------------------------------------ #
+# A tenant has its own backend, city boundary, category list and FAQ;
+# everything expensive (HTTP connection pool, process pool, transfer
+# schedulers, spool, caches keyed by tenant) is shared. Per-tenant limits cap what one city can take
+# from the shared pools, and per-tenant metrics live under "tenants.<name>.".
+#
+# TENANTS_PATH points to a JSON list such as
+#     [{"name": "torino", "label": "Turin", "server_url": "http://server:5000",
+#       "geofence_path": "turin_boundaries.json", "addresstype": "city",
+#       "max_requests": 16, "max_uploads": 2, "max_downloads": 4}]
+# Relative geofence paths are resolved next to that file. Without it the
+# bot serves a single tenant from SERVER_URL and GEOFENCE_PATH. The first
+# tenant is the default; a chat picks another one with /city.
+
+TENANTS_PATH = os.getenv("TENANTS_PATH", "")
+# Concurrent backend requests of one tenant
+TENANT_MAX_REQUESTS = int(os.getenv("TENANT_MAX_REQUESTS", "16"))
+
+
+class Tenant:
+    def __init__(self, name: str, server_url: str, label: str = "",
+                 geofence_path: str = geofence.GEOFENCE_PATH, addresstype: str = "city",
+                 max_requests: int = TENANT_MAX_REQUESTS, max_uploads: Optional[int] = None,
+                 max_downloads: Optional[int] = None) -> None:
+        self.name = name
+        self.label = label or name.title()
+        self.base_url = start._normalize_server_url(server_url).rstrip("/") + "/api/v1"
+        self.report_url = self.base_url + "/telegram/reports/"
+        self.faq_url = self.base_url + "/faqs/"
+        self.geofence_path = geofence_path
+        self.addresstype = addresstype
+        self.max_requests = max_requests
+        self.max_uploads = max_uploads
+        self.max_downloads = max_downloads
+        self.categories: List[str] = []
+        # Category keyboard is rebuilt only when the categories change
+        self.category_keyboard: Optional[InlineKeyboardMarkup] = None
+        # FAQ items and the wall-clock time they were fetched (kept in the warm-start snapshot)
+        self.faq_cache: Dict[str, object] = {"items": None, "fetched_at": 0.0}
+        # Hashes of photos from reports recently sent to this city (all its chats)
+        self.recent_photos = HashIndex()
+        self._requests = asyncio.Semaphore(max_requests)
+
+    def __repr__(self) -> str:
+        return f"Tenant({self.name!r}, {self.base_url!r})"
+
+    @classmethod
+    def from_config(cls, entry: Dict, base_dir: str = ".") -> "Tenant":
+        path = entry.get("geofence_path") or geofence.GEOFENCE_PATH
+        return cls(
+            entry["name"],
+            entry.get("server_url") or start.SERVER_URL,
+            label=entry.get("label", ""),
+            geofence_path=os.path.join(base_dir, path),
+            addresstype=entry.get("addresstype", "city"),
+            max_requests=int(entry.get("max_requests", TENANT_MAX_REQUESTS)),
+            max_uploads=entry.get("max_uploads"),
+            max_downloads=entry.get("max_downloads"),
+        )
+
+    def metric(self, name: str) -> str:
+        return f"tenants.{self.name}.{name}"
+
+    def geofence(self) -> geofence.Geofence:
+        return geofence.get_geofence(self.geofence_path, self.addresstype, self.label)
+
+    def contains(self, lat: float, lon: float) -> bool:
+        # Same city boundary the web client draws, so the backend won't reject it after the upload
+        return self.geofence().contains(lat, lon)
+
+    def set_categories(self, values: List[str], keyboard: Optional[InlineKeyboardMarkup] = None) -> None:
+        self.categories = list(values)
+        self.category_keyboard = keyboard
+
+    async def request(self, method: str, path: str, **kwargs):
+        """Backend request of this tenant; ``path`` is relative to its API base URL."""
+        url = path if path.startswith(("http://", "https://")) else self.base_url + path
+        if self._requests.locked():
+            metrics.inc(self.metric("requests_queued"))
+        async with self._requests:
+            started = time.perf_counter()
+            try:
+                return await start._httpx_with_retry(method, url, **kwargs)
+            except Exception:
+                metrics.inc(self.metric("requests_failed"))
+                raise
+            finally:
+                metrics.inc(self.metric("requests"))
+                metrics.observe(self.metric("request_seconds"), time.perf_counter() - started)
+
+
+# ------------------------------------------------------------------ #
+# Registry
+# ------------------------------------------------------------------ #
+_tenants: Dict[str, Tenant] = {}
+# Chat id -> tenant name, for chats that picked a city other than the default
+chats: Dict[int, str] = {}
+
+
+def configure(tenants: List[Tenant]) -> None:
+    """Replace the tenants; the first one becomes the default."""
+    if not tenants:
+        raise ValueError("At least one tenant is required")
+    for tenant in _tenants.values():
+        transfers.uploads.set_tenant_limit(tenant.name, None)
+        transfers.downloads.set_tenant_limit(tenant.name, None)
+    _tenants.clear()
+    for tenant in tenants:
+        _tenants[tenant.name] = tenant
+        transfers.uploads.set_tenant_limit(tenant.name, tenant.max_uploads)
+        transfers.downloads.set_tenant_limit(tenant.name, tenant.max_downloads)
+    for chat_id in [c for c, name in chats.items() if name not in _tenants]:
+        del chats[chat_id]
+
+
+def load(path: str = TENANTS_PATH) -> List[Tenant]:
+    """Tenants of a TENANTS_PATH file, or the single SERVER_URL tenant without one."""
+    if not path:
+        return [Tenant("torino", start.SERVER_URL, label="Turin")]
+    with open(path, encoding="utf-8") as f:
+        entries = json.load(f)
+    base_dir = os.path.dirname(os.path.abspath(path))
+    return [Tenant.from_config(entry, base_dir) for entry in entries]
+
+
+def all_tenants() -> List[Tenant]:
+    return list(_tenants.values())
+
+
+def get(name: str) -> Optional[Tenant]:
+    return _tenants.get(name)
+
+
+def default() -> Tenant:
+    return next(iter(_tenants.values()))
+
+
+def for_chat(chat_id: Optional[int]) -> Tenant:
+    name = chats.get(chat_id) if chat_id is not None else None
+    return _tenants[name] if name is not None else default()
+
+
+def for_update(update: Update) -> Tenant:
+    chat = update.effective_chat
+    return for_chat(chat.id if chat is not None else None)
+
+
+def assign(chat_id: int, name: str) -> Tenant:
+    """Route ``chat_id`` to tenant ``name`` from now on."""
+    tenant = _tenants[name]
+    if tenant is default():
+        chats.pop(chat_id, None)
+    else:
+        chats[chat_id] = name
+    metrics.set_gauge("tenants.assigned_chats", len(chats))
+    return tenant
+
+
+configure(load())
+
+
+# ------------------------------------------------------------------ #
+# /city
+# ------------------------------------------------------------------ #
+def build_city_keyboard(current: Tenant) -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton(f"{'✅ ' if tenant is current else ''}{tenant.label}", callback_data=f"city_{tenant.name}")]
+        for tenant in all_tenants()
+    ])
+
+
+async def city_command(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    current = for_update(update)
+    if len(_tenants) == 1:
+        await update.message.reply_text(f"This bot serves {current.label} only.")
+        return
+    await update.message.reply_text(
+        f"Your reports go to {current.label}. Choose your city:", reply_markup=build_city_keyboard(current)
+    )
+
+
+async def handle_city(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """Switch the chat to the picked city; True if it changed."""
+    query = update.callback_query
+    await query.answer()
+    chat_id = update.effective_chat.id
+    tenant = get(query.data.replace("city_", "", 1))
+    if tenant is None:
+        await query.edit_message_text("This city is no longer available.")
+        return False
+    switched = tenant is not for_chat(chat_id)
+    if switched:
+        assign(chat_id, tenant.name)
+        # The token was issued by the previous city's backend: authenticate again on the next request
+        start.sessions.pop(chat_id, None)
+        report_lists.invalidate(chat_id)
+        metrics.inc(tenant.metric("chats_switched_in"))
+    await query.edit_message_text(f"✅ Your reports now go to {tenant.label}.")
+    return switched
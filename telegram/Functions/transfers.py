@@ -0,0 +1,195 @@
+from __future__ import annotations
+import asyncio
+import os
+import time
+from typing import Dict, List, Optional
+
+from . import metrics
+
+# ------------------------------------------------------------------ #
+# Photo transfer scheduling
+# ------------------------------------------------------------------ #
+# Every photo download from Telegram and every report upload to the
+# backend takes a slot first:
+#   1. a per-chat slot, so one user's burst cannot take every slot;
+#   2. a per-tenant slot when the tenant has a limit (see tenants.py), so
+#      one city's rush hour cannot starve the others;
+#   3. a global slot, bounding concurrent transfers of that direction;
+#   4. bandwidth admission: the expected bytes are charged to a token
+#      bucket, and a transfer starts only once the bucket is out of debt.
+# Downloads and uploads are scheduled independently.
+
+TRANSFER_DOWNLOADS_MAX = int(os.getenv("TRANSFER_DOWNLOADS_MAX", "8"))
+TRANSFER_DOWNLOADS_PER_CHAT = int(os.getenv("TRANSFER_DOWNLOADS_PER_CHAT", "2"))
+TRANSFER_DOWNLOAD_BYTES_PER_S = float(os.getenv("TRANSFER_DOWNLOAD_BYTES_PER_S", str(32 * 1024 * 1024)))
+TRANSFER_UPLOADS_MAX = int(os.getenv("TRANSFER_UPLOADS_MAX", "4"))
+TRANSFER_UPLOADS_PER_CHAT = int(os.getenv("TRANSFER_UPLOADS_PER_CHAT", "1"))
+TRANSFER_UPLOAD_BYTES_PER_S = float(os.getenv("TRANSFER_UPLOAD_BYTES_PER_S", str(16 * 1024 * 1024)))
+# Window of the bytes/s gauges
+THROUGHPUT_WINDOW_S = 10.0
+
+
+class TokenBucket:
+    """Byte budget refilled at ``rate`` per second, allowed to go into debt.
+
+    A transfer larger than the bucket is admitted once earlier debt is paid,
+    then the ones after it wait for its bytes to be paid off.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None) -> None:
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else rate
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    async def consume(self, amount: int) -> None:
+        if self.rate <= 0:
+            return
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        # Wait only for the debt accumulated before this transfer
+        debt = -self.tokens
+        self.tokens -= amount
+        if debt > 0:
+            await asyncio.sleep(debt / self.rate)
+
+
+class _ChatSlots:
+    __slots__ = ("semaphore", "users")
+
+    def __init__(self, limit: int) -> None:
+        self.semaphore = asyncio.Semaphore(limit)
+        self.users = 0
+
+
+class TransferScheduler:
+    def __init__(self, name: str, max_concurrent: int, per_chat: int, bytes_per_s: float) -> None:
+        self.name = name
+        self.per_chat = per_chat
+        self._global = asyncio.Semaphore(max_concurrent)
+        self._chats: Dict[int, _ChatSlots] = {}
+        # Tenant name -> semaphore; tenants without a limit only share the global slots
+        self._tenants: Dict[str, asyncio.Semaphore] = {}
+        self._bucket = TokenBucket(bytes_per_s)
+        self.active = 0
+        self.queued = 0
+        # (finished_at, bytes) of recent transfers, for the bytes/s gauge
+        self._recent: List[tuple] = []
+
+    def slot(self, chat_id: Optional[int], expected_bytes: int = 0, tenant: str = "") -> "Transfer":
+        """``async with scheduler.slot(chat, size, tenant) as transfer: ...``"""
+        return Transfer(self, chat_id or 0, expected_bytes, tenant)
+
+    def set_tenant_limit(self, tenant: str, limit: Optional[int]) -> None:
+        """Cap the concurrent transfers of ``tenant``; None removes the cap."""
+        if limit is None:
+            self._tenants.pop(tenant, None)
+        else:
+            self._tenants[tenant] = asyncio.Semaphore(limit)
+
+    def _chat_slots(self, chat_id: int) -> _ChatSlots:
+        slots = self._chats.get(chat_id)
+        if slots is None:
+            slots = self._chats[chat_id] = _ChatSlots(self.per_chat)
+        slots.users += 1
+        return slots
+
+    def _drop_chat_slots(self, chat_id: int, slots: _ChatSlots) -> None:
+        slots.users -= 1
+        if slots.users == 0:
+            del self._chats[chat_id]
+
+    def _record(self, size: int, elapsed: float, tenant: str = "") -> None:
+        now = time.monotonic()
+        prefix = f"transfers.{self.name}"
+        metrics.inc(f"{prefix}.bytes", size)
+        if tenant:
+            metrics.inc(f"tenants.{tenant}.{prefix}.bytes", size)
+        if elapsed > 0 and size:
+            metrics.observe(f"{prefix}.bytes_per_s", size / elapsed)
+        self._recent.append((now, size))
+        while self._recent and now - self._recent[0][0] > THROUGHPUT_WINDOW_S:
+            self._recent.pop(0)
+        metrics.set_gauge(f"{prefix}.throughput_bytes_per_s", sum(s for _, s in self._recent) / THROUGHPUT_WINDOW_S)
+
+    def _publish(self) -> None:
+        metrics.set_gauge(f"transfers.{self.name}.active", self.active)
+        metrics.set_gauge(f"transfers.{self.name}.queued", self.queued)
+
+
+class Transfer:
+    """One scheduled transfer; report the real size with ``done(bytes)``."""
+
+    __slots__ = ("scheduler", "chat_id", "expected", "tenant", "size", "_chat", "_tenant", "_started")
+
+    def __init__(self, scheduler: TransferScheduler, chat_id: int, expected: int, tenant: str = "") -> None:
+        self.scheduler = scheduler
+        self.chat_id = chat_id
+        self.expected = expected
+        self.tenant = tenant
+        self.size: Optional[int] = None
+        self._chat: Optional[_ChatSlots] = None
+        self._tenant: Optional[asyncio.Semaphore] = None
+        self._started = 0.0
+
+    def done(self, size: int) -> None:
+        self.size = size
+
+    async def __aenter__(self) -> "Transfer":
+        scheduler = self.scheduler
+        requested = time.perf_counter()
+        scheduler.queued += 1
+        scheduler._publish()
+        self._chat = scheduler._chat_slots(self.chat_id)
+        self._tenant = scheduler._tenants.get(self.tenant)
+        acquired_chat = acquired_tenant = acquired_global = False
+        try:
+            await self._chat.semaphore.acquire()
+            acquired_chat = True
+            if self._tenant is not None:
+                await self._tenant.acquire()
+                acquired_tenant = True
+            await scheduler._global.acquire()
+            acquired_global = True
+            await scheduler._bucket.consume(self.expected)
+        except BaseException:
+            if acquired_global:
+                scheduler._global.release()
+            if acquired_tenant:
+                self._tenant.release()
+            if acquired_chat:
+                self._chat.semaphore.release()
+            scheduler._drop_chat_slots(self.chat_id, self._chat)
+            scheduler.queued -= 1
+            scheduler._publish()
+            raise
+        scheduler.queued -= 1
+        scheduler.active += 1
+        scheduler._publish()
+        self._started = time.perf_counter()
+        metrics.observe(f"transfers.{scheduler.name}.queue_wait_seconds", self._started - requested)
+        if self.tenant:
+            metrics.observe(f"tenants.{self.tenant}.transfers.{scheduler.name}.queue_wait_seconds", self._started - requested)
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        scheduler = self.scheduler
+        scheduler._global.release()
+        if self._tenant is not None:
+            self._tenant.release()
+        self._chat.semaphore.release()
+        scheduler._drop_chat_slots(self.chat_id, self._chat)
+        scheduler.active -= 1
+        scheduler._publish()
+        if exc_type is None:
+            scheduler._record(self.size if self.size is not None else self.expected,
+                              time.perf_counter() - self._started, self.tenant)
+        else:
+            metrics.inc(f"transfers.{scheduler.name}.failed")
+            if self.tenant:
+                metrics.inc(f"tenants.{self.tenant}.transfers.{scheduler.name}.failed")
+
+
+downloads = TransferScheduler("download", TRANSFER_DOWNLOADS_MAX, TRANSFER_DOWNLOADS_PER_CHAT, TRANSFER_DOWNLOAD_BYTES_PER_S)
+uploads = TransferScheduler("upload", TRANSFER_UPLOADS_MAX, TRANSFER_UPLOADS_PER_CHAT, TRANSFER_UPLOAD_BYTES_PER_S)
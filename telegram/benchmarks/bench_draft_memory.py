@@ -0,0 +1,60 @@
+"""Memory footprint of report drafts: free-form user_data dict vs ReportDraft.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_draft_memory.py [n_drafts]
+"""
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.draft import ReportDraft
+
+
+def make_dict(i: int) -> dict:
+    return {
+        "title": f"Buca in via Roma {i}",
+        "description": "Large pothole in the middle of the road, dangerous for bikes",
+        "category": "ROAD_MAINTENANCE",
+        "photos": [f"photo_{i}_a.jpg", f"photo_{i}_b.jpg"],
+        "latitude": 45.07 + i * 1e-7,
+        "longitude": 7.68 + i * 1e-7,
+        "anonymous": False,
+    }
+
+
+def make_draft(i: int) -> ReportDraft:
+    draft = ReportDraft()
+    draft.set_title(f"Buca in via Roma {i}")
+    draft.set_description("Large pothole in the middle of the road, dangerous for bikes")
+    draft.set_category("ROAD_MAINTENANCE")
+    draft.add_photo(f"photo_{i}_a.jpg")
+    draft.add_photo(f"photo_{i}_b.jpg")
+    draft.set_location(45.07 + i * 1e-7, 7.68 + i * 1e-7)
+    draft.anonymous = False
+    return draft
+
+
+def measure(factory, n: int) -> int:
+    tracemalloc.start()
+    items = [factory(i) for i in range(n)]
+    current, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del items
+    return current
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50_000
+    dict_bytes = measure(make_dict, n)
+    draft_bytes = measure(make_draft, n)
+    print(f"drafts: {n}")
+    print(f"dict layout:  {dict_bytes / n:8.1f} B/draft  ({dict_bytes / 1e6:.1f} MB)")
+    print(f"ReportDraft:  {draft_bytes / n:8.1f} B/draft  ({draft_bytes / 1e6:.1f} MB)")
+    print(f"saved:        {100 * (1 - draft_bytes / dict_bytes):8.1f} %")
+    print(f"serialized draft: {len(make_draft(0).dumps())} B")
+
+
+if __name__ == "__main__":
+    main()
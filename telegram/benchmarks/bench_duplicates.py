@@ -0,0 +1,101 @@
+"""Memory and latency of the pre-submission duplicate check.
+
+N synthetic reports with titles and descriptions drawn from a small
+Italian vocabulary are spread over Turin's bounding box. Measures the
+memory of the /nearby index with and without the trigram arrays of
+every report, and the latency of a duplicate check with the trigrams of
+the candidates still to compute (cold) and already computed (warm). The vocabulary is small on purpose, so most candidates
+look alike: every report in the radius passes the similarity threshold,
+the worst case for the ranking.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_duplicates.py [reports]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import duplicates
+from Functions.nearby import ReportIndex
+
+SUBJECTS = ["buca", "lampione", "rifiuti", "marciapiede", "semaforo", "panchina", "tombino", "albero", "graffiti", "cartello"]
+STATES = ["rotto", "spento", "abbandonati", "dissestato", "guasto", "divelta", "intasato", "caduto", "sporco", "piegato"]
+STREETS = ["via Roma", "corso Francia", "via Po", "corso Vittorio", "via Nizza", "piazza Castello", "via Garibaldi", "corso Regina"]
+FILLER = ["davanti", "al", "civico", "da", "giorni", "pericoloso", "per", "i", "pedoni", "bambini", "sera", "molto", "vicino", "scuola"]
+
+
+def text(rng):
+    title = f"{rng.choice(SUBJECTS).capitalize()} {rng.choice(STATES)} in {rng.choice(STREETS)}"
+    description = " ".join(rng.choice(FILLER) for _ in range(rng.randint(8, 30)))
+    return title, description
+
+
+def raw_report(report_id, rng):
+    title, description = text(rng)
+    return {
+        "id": report_id,
+        "title": title,
+        "location": {"name": "", "coordinates": {"latitude": rng.uniform(45.00, 45.14),
+                                                 "longitude": rng.uniform(7.58, 7.77)}},
+        "date": "2025-01-01",
+        "category": "Roads",
+        "document": {"description": description, "photos": []},
+        "state": "ASSIGNED",
+    }
+
+
+def percentile(samples, fraction) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_checks(index, queries):
+    samples = []
+    found = 0
+    for lat, lon, title, description in queries:
+        started = time.perf_counter()
+        found += bool(duplicates.find_duplicates(index, lat, lon, title, description))
+        samples.append(time.perf_counter() - started)
+    return samples, found
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    rng = random.Random(0)
+    reports = [raw_report(i, rng) for i in range(n)]
+
+    tracemalloc.start()
+    base = tracemalloc.get_traced_memory()[0]
+    index = ReportIndex()
+    index.apply(reports)
+    plain = tracemalloc.get_traced_memory()[0] - base
+    started = time.perf_counter()
+    for report in index.reports.values():
+        duplicates._report_grams(report)
+    all_grams = time.perf_counter() - started
+    with_grams = tracemalloc.get_traced_memory()[0] - base
+    tracemalloc.stop()
+    print(f"{n} reports: index {plain / 2**20:.1f} MiB, with every report's trigrams "
+          f"{with_grams / 2**20:.1f} MiB ({(with_grams - plain) / n:.0f} B/report, "
+          f"vocabulary {len(duplicates._vocabulary)}, computed in {all_grams:.1f} s)")
+
+    queries = []
+    for _ in range(1_000):
+        title, description = text(rng)
+        queries.append((rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77), title, description))
+
+    # Fresh index: trigrams are computed on the first check touching each report
+    index = ReportIndex()
+    index.apply(reports)
+    for name in ("cold", "warm"):
+        samples, found = time_checks(index, queries)
+        print(f"{name:>5}: p50 {percentile(samples, 0.5) * 1e6:8.1f} µs  "
+              f"p99 {percentile(samples, 0.99) * 1e6:8.1f} µs  ({found}/{len(queries)} drafts flagged)")
+
+
+if __name__ == "__main__":
+    main()
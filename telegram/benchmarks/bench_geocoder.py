@@ -0,0 +1,101 @@
+"""Build time, memory and lookup latency of the offline geocoder.
+
+Without a path, a synthetic gazetteer the size of Turin's (about 3,000
+streets and 120,000 house numbers) is generated in a temporary file;
+pass a real gazetteer CSV to measure that instead. Lookups are exact
+addresses, addresses with one or two typos, and street names only.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_geocoder.py [gazetteer.csv]
+"""
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.geocoder import Geocoder
+
+TYPES = ["Via", "Corso", "Piazza", "Largo", "Viale", "Strada"]
+SYLLABLES = ["ro", "ma", "ga", "ri", "bal", "di", "ni", "za", "fran", "cia", "vit", "to", "rio", "san", "ta", "re",
+             "gi", "na", "mon", "te", "ber", "to", "la", "go", "po", "lo", "car", "lo", "al", "ber", "ti"]
+
+
+def synthetic_gazetteer(path, streets=3_000, seed=0):
+    rng = random.Random(seed)
+    names = set()
+    while len(names) < streets:
+        words = ["".join(rng.choice(SYLLABLES) for _ in range(rng.randint(2, 4))).capitalize()
+                 for _ in range(rng.randint(1, 3))]
+        names.add(f"{rng.choice(TYPES)} {' '.join(words)}")
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["street", "number", "latitude", "longitude"])
+        for name in sorted(names):
+            lat, lon = rng.uniform(45.01, 45.13), rng.uniform(7.60, 7.75)
+            for number in range(1, rng.randint(2, 80)):
+                suffix = rng.choice(["", "", "", "", "", "/A", "/B"])
+                writer.writerow([name, f"{number}{suffix}", f"{lat + number * 1e-5:.6f}", f"{lon:.6f}"])
+    return sorted(names)
+
+
+def typo(rng, text, edits):
+    chars = list(text)
+    for _ in range(edits):
+        i = rng.randrange(1, len(chars))
+        operation = rng.choice(("swap", "drop", "change"))
+        if operation == "swap" and i < len(chars) - 1:
+            chars[i], chars[i + 1] = chars[i + 1], chars[i]
+        elif operation == "drop":
+            del chars[i]
+        else:
+            chars[i] = rng.choice("aeiourst")
+    return "".join(chars)
+
+
+def percentile(samples, fraction) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def main() -> None:
+    if len(sys.argv) > 1:
+        path = sys.argv[1]
+        with open(path, newline="", encoding="utf-8") as f:
+            names = sorted({row["street"] for row in csv.DictReader(f)})
+    else:
+        path = os.path.join(tempfile.mkdtemp(), "addresses.csv")
+        names = synthetic_gazetteer(path)
+
+    started = time.perf_counter()
+    geocoder = Geocoder.from_csv(path)
+    build = time.perf_counter() - started
+    tracemalloc.start()
+    measured = Geocoder.from_csv(path)
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del measured
+    print(f"built in {build:.2f} s, {memory / 2**20:.1f} MiB: {geocoder.stats()}")
+
+    rng = random.Random(1)
+    for label, edits, with_number in (("exact", 0, True), ("1 typo", 1, True), ("2 typos", 2, True),
+                                      ("street only", 0, False)):
+        samples = []
+        hits = 0
+        for _ in range(500):
+            name = rng.choice(names)
+            text = f"{typo(rng, name, edits)} {rng.randint(1, 40)}" if with_number else name
+            started = time.perf_counter()
+            results = geocoder.lookup(text)
+            samples.append(time.perf_counter() - started)
+            hits += bool(results) and results[0].label.startswith(name)
+        print(f"{label:>12}: p50 {percentile(samples, 0.5) * 1e6:8.1f} µs  p99 {percentile(samples, 0.99) * 1e6:8.1f} µs  "
+              f"(right street first {hits}/500)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+"""Cost of a geofence check: grid index versus exact point-in-polygon.
+
+Points are drawn from the boundary dataset itself: uniformly over the
+city's bounding box, and jittered by up to ~30 m around every boundary
+vertex (the worst case, all in edge cells).
+
+Run from the telegram/ directory:
+    python benchmarks/bench_geofence.py [grid_size]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.geofence import Geofence, GEOFENCE_GRID_SIZE, load_rings, point_in_rings
+
+
+def per_check_ns(check, points) -> float:
+    started = time.perf_counter()
+    for lat, lon in points:
+        check(lat, lon)
+    return (time.perf_counter() - started) / len(points) * 1e9
+
+
+def main() -> None:
+    grid_size = int(sys.argv[1]) if len(sys.argv) > 1 else GEOFENCE_GRID_SIZE
+    rings = load_rings()
+    started = time.perf_counter()
+    fence = Geofence(rings, grid_size=grid_size)
+    print(f"index built in {(time.perf_counter() - started) * 1e3:.1f} ms: {fence.stats()}")
+
+    rng = random.Random(0)
+    uniform = [(rng.uniform(fence.min_lat, fence.max_lat), rng.uniform(fence.min_lon, fence.max_lon))
+               for _ in range(200_000)]
+    near_edge = [(lat + rng.uniform(-0.0003, 0.0003), lon + rng.uniform(-0.0003, 0.0003))
+                 for ring in rings for lon, lat in ring]
+    # Realistic traffic: reports come from inside the city
+    inside = [p for p in uniform if fence.contains(*p)]
+
+    exact = lambda lat, lon: point_in_rings(lon, lat, rings)
+    noop = lambda lat, lon: False
+    print(f"python call overhead: {per_check_ns(noop, uniform):.0f} ns per check")
+    print(f"{'points':<22} {'grid ns':>10} {'exact ns':>10}")
+    for label, points in (("inside the city", inside), ("bounding box", uniform), ("within 30 m of edge", near_edge)):
+        sample = points[:2000]
+        print(f"{label:<22} {per_check_ns(fence.contains, points):>10.0f} {per_check_ns(exact, sample):>10.0f}")
+
+
+if __name__ == "__main__":
+    main()
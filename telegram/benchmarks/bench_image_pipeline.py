@@ -0,0 +1,59 @@
+"""Throughput and bytes saved by the image downscaling stage.
+
+Generates camera-sized JPEGs (with EXIF) and runs them through
+imaging.process_photo on the process pool, three photos per report.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_image_pipeline.py [n_reports] [width] [height]
+"""
+import asyncio
+import io
+import os
+import sys
+import time
+
+from PIL import Image
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import imaging
+
+
+def make_photo(width: int, height: int, seed: int) -> bytes:
+    # Noise on top of a gradient compresses roughly like a real photo
+    noise = Image.effect_noise((width, height), 40 + seed % 10).convert("RGB")
+    gradient = Image.linear_gradient("L").resize((width, height)).convert("RGB")
+    img = Image.blend(noise, gradient, 0.5)
+    exif = Image.Exif()
+    exif[0x010F] = "BenchCam"  # Make
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=92, exif=exif)
+    return out.getvalue()
+
+
+async def main() -> None:
+    n_reports = int(sys.argv[1]) if len(sys.argv) > 1 else 10
+    width = int(sys.argv[2]) if len(sys.argv) > 2 else 4000
+    height = int(sys.argv[3]) if len(sys.argv) > 3 else 3000
+    photos = [make_photo(width, height, i) for i in range(3)]
+    batch = photos * n_reports
+    print(f"{len(batch)} photos {width}x{height}, {sum(map(len, photos)) / 3 / 1e6:.2f} MB avg, "
+          f"{imaging.IMAGE_WORKERS} workers, max {imaging.PHOTO_MAX_DIMENSION}px q{imaging.PHOTO_JPEG_QUALITY}")
+
+    await imaging.process_photo(photos[0])  # warm up the pool
+    started = time.perf_counter()
+    results = await asyncio.gather(*(imaging.process_photo(p) for p in batch))
+    elapsed = time.perf_counter() - started
+    imaging.shutdown()
+
+    before = sum(map(len, batch))
+    after = sum(map(len, results))
+    print(f"throughput:       {len(batch) / elapsed:8.1f} images/s")
+    print(f"bytes per report: {before / n_reports / 1e6:8.2f} MB -> {after / n_reports / 1e6:.2f} MB "
+          f"({100 * (1 - after / before):.1f}% saved)")
+    with Image.open(io.BytesIO(results[0])) as img:
+        print(f"output:           {img.size[0]}x{img.size[1]}, exif={'exif' in img.info}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
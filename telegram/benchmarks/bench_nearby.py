@@ -0,0 +1,86 @@
+"""Latency of /nearby queries on the report grid index.
+
+Builds the index from N synthetic reports spread over Turin's bounding
+box, then times k-nearest queries against a linear scan of all reports,
+and an incremental refresh where 1% of the reports changed.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_nearby.py [reports] [cell_m]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.nearby import NEARBY_CELL_M, NEARBY_K, NEARBY_RADIUS_M, ReportIndex
+
+
+def raw_report(report_id, lat, lon, state="Assigned"):
+    return {
+        "id": report_id,
+        "title": f"Report {report_id}",
+        "location": {"name": "", "coordinates": {"latitude": lat, "longitude": lon}},
+        "date": "2025-01-01",
+        "category": "Roads",
+        "state": state,
+    }
+
+
+def percentile(samples, fraction) -> float:
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+def time_queries(query, points):
+    samples = []
+    for lat, lon in points:
+        started = time.perf_counter()
+        query(lat, lon)
+        samples.append(time.perf_counter() - started)
+    return samples
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100_000
+    cell_m = float(sys.argv[2]) if len(sys.argv) > 2 else NEARBY_CELL_M
+    rng = random.Random(0)
+    reports = [raw_report(i, rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77)) for i in range(n)]
+
+    index = ReportIndex(cell_m=cell_m)
+    started = time.perf_counter()
+    index.apply(reports)
+    print(f"{n} reports indexed in {(time.perf_counter() - started) * 1e3:.0f} ms "
+          f"({len(index.cells)} cells of {cell_m:.0f} m)")
+
+    points = [(rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77)) for _ in range(2_000)]
+    grid = time_queries(lambda lat, lon: index.nearest(lat, lon, NEARBY_K, NEARBY_RADIUS_M), points)
+
+    everything = list(index.reports.values())
+
+    def linear(lat, lon):
+        found = []
+        for report in everything:
+            distance = index.distance_m(lat, lon, report.lat, report.lon)
+            if distance <= NEARBY_RADIUS_M:
+                found.append((distance, report.id))
+        return sorted(found)[:NEARBY_K]
+
+    scan = time_queries(linear, points[:50])
+    for name, samples in (("grid", grid), ("linear scan", scan)):
+        print(f"{name:>12}: p50 {percentile(samples, 0.5) * 1e6:9.1f} µs  "
+              f"p99 {percentile(samples, 0.99) * 1e6:9.1f} µs")
+
+    changed = rng.sample(range(n), n // 100)
+    for i in changed:
+        reports[i] = raw_report(i, reports[i]["location"]["coordinates"]["latitude"],
+                                reports[i]["location"]["coordinates"]["longitude"], state="Resolved")
+    started = time.perf_counter()
+    result = index.apply(reports)
+    print(f"refresh with {len(changed)} changed reports: {(time.perf_counter() - started) * 1e3:.0f} ms "
+          f"(changed, removed) = {result}")
+
+
+if __name__ == "__main__":
+    main()
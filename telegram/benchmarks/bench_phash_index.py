@@ -0,0 +1,53 @@
+"""Lookup speed and memory of the recent photo hash index versus a linear scan.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_phash_index.py [entries] [queries]
+"""
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.phash_index import HashIndex, PHASH_NEAR_DISTANCE, hamming
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    n_queries = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    rng = random.Random(0)
+    stored = [rng.getrandbits(64) for _ in range(n)]
+
+    tracemalloc.start()
+    index = HashIndex(capacity=n)
+    for value in stored:
+        index.add(value)
+    size, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{n} hashes, index uses {size / 1024:.0f} KiB ({size / n:.1f} B/entry)")
+
+    # Half near duplicates of stored hashes, half unrelated photos
+    queries = []
+    for i in range(n_queries):
+        value = rng.choice(stored) if i % 2 else rng.getrandbits(64)
+        for bit in rng.sample(range(64), rng.randint(0, PHASH_NEAR_DISTANCE)):
+            value ^= 1 << bit
+        queries.append(value)
+
+    started = time.perf_counter()
+    hits = sum(index.nearest(q) is not None for q in queries)
+    indexed = time.perf_counter() - started
+
+    sample = queries[:max(n_queries // 20, 1)]
+    started = time.perf_counter()
+    linear_hits = sum(min(hamming(q, v) for v in stored) <= PHASH_NEAR_DISTANCE for q in sample)
+    linear = (time.perf_counter() - started) / len(sample) * n_queries
+
+    print(f"indexed: {indexed / n_queries * 1e6:8.1f} us/lookup  ({hits} hits)")
+    print(f"linear:  {linear / n_queries * 1e6:8.1f} us/lookup  ({linear_hits} hits in {len(sample)} sampled)")
+
+
+if __name__ == "__main__":
+    main()
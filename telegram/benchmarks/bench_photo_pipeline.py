@@ -0,0 +1,102 @@
+"""Disk I/O and peak memory of the report photo pipeline.
+
+Compares the previous flow (download_to_drive, re-read with aiofiles into a
+BytesIO copy, remove) with in-memory PhotoBuffers handed to the multipart
+upload. Telegram downloads are simulated with random bytes.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_photo_pipeline.py [n_reports] [photo_kb]
+"""
+import asyncio
+import io
+import os
+import sys
+import tempfile
+import tracemalloc
+
+import aiofiles
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.photos import PhotoBuffer, close_all
+
+
+class FakeTelegramFile:
+    def __init__(self, file_id: str, payload: bytes) -> None:
+        self.file_id = file_id
+        self.file_unique_id = file_id
+        self.payload = payload
+
+    async def download_to_drive(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.payload)
+
+    async def download_to_memory(self, out) -> None:
+        out.write(self.payload)
+
+
+def io_counters() -> tuple:
+    with open("/proc/self/io") as f:
+        values = dict(line.split(": ") for line in f.read().splitlines())
+    return int(values["rchar"]), int(values["wchar"])
+
+
+def upload(files) -> int:
+    # Encode the multipart body exactly as httpx would send it
+    request = httpx.Request("POST", "http://backend/api/v1/reports", data={"title": "t"}, files=files)
+    return sum(len(chunk) for chunk in request.stream)
+
+
+async def disk_pipeline(tg_files, photos_dir) -> int:
+    paths = []
+    for tg_file in tg_files:
+        path = os.path.join(photos_dir, f"{tg_file.file_id}.jpg")
+        await tg_file.download_to_drive(path)
+        paths.append(path)
+    files = []
+    for p in paths:
+        async with aiofiles.open(p, "rb") as af:
+            data = await af.read()
+        files.append(("photos", (os.path.basename(p), io.BytesIO(data), "image/jpeg")))
+    sent = upload(files)
+    for p in paths:
+        os.remove(p)
+    return sent
+
+
+async def memory_pipeline(tg_files) -> int:
+    photos = []
+    for tg_file in tg_files:
+        photo = PhotoBuffer(tg_file.file_id, f"{tg_file.file_unique_id}.jpg")
+        await photo.download(tg_file)
+        photos.append(photo)
+    sent = upload([photo.as_multipart() for photo in photos])
+    close_all(photos)
+    return sent
+
+
+async def run(label, n_reports, make_pipeline) -> None:
+    tracemalloc.start()
+    read_before, write_before = io_counters()
+    for _ in range(n_reports):
+        await make_pipeline()
+    read_after, write_after = io_counters()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<8} disk write {(write_after - write_before) / 1e6:8.1f} MB  "
+          f"disk read {(read_after - read_before) / 1e6:8.1f} MB  peak heap {peak / 1e6:6.1f} MB")
+
+
+async def main() -> None:
+    n_reports = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    photo_kb = int(sys.argv[2]) if len(sys.argv) > 2 else 1500
+    tg_files = [FakeTelegramFile(f"photo{i}", os.urandom(photo_kb * 1024)) for i in range(3)]
+    print(f"{n_reports} reports x 3 photos x {photo_kb} KB")
+    with tempfile.TemporaryDirectory() as photos_dir:
+        await run("disk", n_reports, lambda: disk_pipeline(tg_files, photos_dir))
+    await run("memory", n_reports, lambda: memory_pipeline(tg_files))
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
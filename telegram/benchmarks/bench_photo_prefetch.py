@@ -0,0 +1,87 @@
+"""Per-step latency of the photo step with inline vs background downloads.
+
+Telegram is simulated with a fixed get_file() round trip and a download
+time proportional to the photo size.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_photo_prefetch.py [get_file_ms] [download_ms]
+"""
+import asyncio
+import os
+import sys
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import endpoint
+from Functions.draft import new_draft
+from Functions.photos import PhotoBuffer, wait_for_photos
+
+
+class SlowTelegramFile:
+    def __init__(self, download_s: float) -> None:
+        self.download_s = download_s
+
+    async def download_to_memory(self, out) -> None:
+        await asyncio.sleep(self.download_s)
+        out.write(b"\xff\xd8" + b"\0" * 200_000)
+
+
+class SlowPhotoSize:
+    def __init__(self, i: int, get_file_s: float, download_s: float) -> None:
+        self.file_id = f"photo{i}"
+        self.file_unique_id = f"photo{i}"
+        self.get_file_s = get_file_s
+        self.download_s = download_s
+
+    async def get_file(self) -> SlowTelegramFile:
+        await asyncio.sleep(self.get_file_s)
+        return SlowTelegramFile(self.download_s)
+
+
+def make_update(photo_size) -> MagicMock:
+    update = MagicMock()
+    update.message.photo = [photo_size]
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+async def inline_step(photo_size) -> None:
+    # Previous behaviour: the handler awaited get_file() and the download
+    photo = PhotoBuffer(photo_size.file_id, photo_size.file_unique_id)
+    await photo.download(await photo_size.get_file())
+
+
+async def main() -> None:
+    get_file_s = (float(sys.argv[1]) if len(sys.argv) > 1 else 150) / 1000
+    download_s = (float(sys.argv[2]) if len(sys.argv) > 2 else 400) / 1000
+    sizes = [SlowPhotoSize(i, get_file_s, download_s) for i in range(3)]
+
+    started = time.perf_counter()
+    for size in sizes:
+        await inline_step(size)
+    inline_per_step = (time.perf_counter() - started) / len(sizes)
+
+    context = MagicMock()
+    context.user_data = {}
+    draft = new_draft(context.user_data)
+    step_times = []
+    for size in sizes:
+        started = time.perf_counter()
+        await endpoint.receive_photo(make_update(size), context)
+        step_times.append(time.perf_counter() - started)
+    # Simulated user think time between the last photo and the submit tap
+    await asyncio.sleep(0.2)
+    started = time.perf_counter()
+    ready = await wait_for_photos(draft.photos)
+    submit_wait = time.perf_counter() - started
+
+    print(f"inline download:      {inline_per_step * 1000:7.1f} ms per photo step")
+    print(f"background download:  {sum(step_times) / len(step_times) * 1000:7.1f} ms per photo step")
+    print(f"submit waited         {submit_wait * 1000:7.1f} ms for {len(ready)} photo(s)")
+    draft.discard_photos()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
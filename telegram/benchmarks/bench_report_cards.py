@@ -0,0 +1,55 @@
+"""Cost of rendering report cards, with and without the memo.
+
+Renders a page worth of synthetic reports (titles and descriptions full
+of Markdown characters) many times in each template: once rebuilding every
+card, once through the memo as the report browser does.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_report_cards.py [reports] [views]
+"""
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.report_cards import TEMPLATES, CardCache
+
+
+def raw_report(report_id, rng):
+    words = ["pothole", "*broken*", "street_light", "`bin`", "[graffiti]", "near", "the", "school"]
+    return {
+        "id": report_id,
+        "title": " ".join(rng.choice(words) for _ in range(6)),
+        "state": rng.choice(["PENDING", "ASSIGNED", "IN_PROGRESS", "RESOLVED"]),
+        "date": "2025-01-01",
+        "document": {"description": " ".join(rng.choice(words) for _ in range(40))},
+    }
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    views = int(sys.argv[2]) if len(sys.argv) > 2 else 20_000
+    rng = random.Random(0)
+    reports = [raw_report(i, rng) for i in range(n)]
+
+    for template, build in TEMPLATES.items():
+        started = time.perf_counter()
+        for _ in range(views):
+            for rpt in reports:
+                build(rpt)
+        uncached = (time.perf_counter() - started) / (views * n)
+
+        cache = CardCache()
+        started = time.perf_counter()
+        for _ in range(views):
+            for rpt in reports:
+                cache.render(rpt, template)
+        cached = (time.perf_counter() - started) / (views * n)
+        print(f"{template:>9}: rebuilt {uncached * 1e6:6.2f} µs/card  memoized {cached * 1e6:6.2f} µs/card "
+              f"({uncached / cached:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Cost of /map: rendering in the process pool versus cache hits.
+
+Indexes N synthetic reports concentrated around the city centre, then
+times the first render of the whole city and of a zoomed area (point
+selection on the loop plus the render in the imaging pool), a cache
+hit, and how long the event loop stays blocked during a render.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_report_map.py [reports]
+"""
+import asyncio
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import geofence, imaging
+from Functions.nearby import ReportIndex
+from Functions.report_map import MAP_ADDRESS_ZOOM, MapCache, area, points_in
+
+
+async def loop_lag(stop: asyncio.Event) -> float:
+    """Longest delay of a 1 ms ticker while the render runs."""
+    worst = 0.0
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.001)
+        worst = max(worst, time.perf_counter() - started - 0.001)
+    return worst
+
+
+async def run(n: int) -> None:
+    rng = random.Random(0)
+    index = ReportIndex()
+    index.apply([
+        {"id": i, "location": {"coordinates": {"latitude": rng.gauss(45.07, 0.025), "longitude": rng.gauss(7.68, 0.03)}}}
+        for i in range(n)
+    ])
+    geofence.get_geofence()
+    # Start the workers outside the measurements
+    await imaging.run_in_pool(sum, [1])
+    cache = MapCache()
+    for name, bbox, zoom in (("city", area(), 0), ("zoomed", area((45.0703, 7.6869), MAP_ADDRESS_ZOOM), MAP_ADDRESS_ZOOM)):
+        started = time.perf_counter()
+        points = points_in(list(index.reports.values()), bbox)
+        selection = time.perf_counter() - started
+        stop = asyncio.Event()
+        lag = asyncio.create_task(loop_lag(stop))
+        await asyncio.sleep(0)
+        started = time.perf_counter()
+        entry = await cache.get_or_render(index, bbox, zoom)
+        render = time.perf_counter() - started
+        stop.set()
+        worst_lag = await lag
+        started = time.perf_counter()
+        await cache.get_or_render(index, bbox, zoom)
+        hit = time.perf_counter() - started
+        print(f"{name:>7}: {len(points) // 2} reports, selection {selection * 1e3:.0f} ms, "
+              f"first request {render * 1e3:.0f} ms ({len(entry.png) / 1024:.0f} KiB PNG, "
+              f"loop blocked at most {worst_lag * 1e3:.0f} ms), cache hit {hit * 1e6:.0f} µs")
+    imaging.shutdown()
+
+
+def main() -> None:
+    asyncio.run(run(int(sys.argv[1]) if len(sys.argv) > 1 else 100_000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,60 @@
+"""Reverse geocoding latency and memory on the memory-mapped index.
+
+Uses the synthetic Turin-sized gazetteer of bench_geocoder.py (or a real
+one given as argument). Reports the index build time and file size, the
+Python heap used once it is opened (the points stay in the page cache),
+and the latency of lookups at random points of the city.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_reverse_geocoder.py [gazetteer.csv]
+"""
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from bench_geocoder import percentile, synthetic_gazetteer
+from Functions.reverse_geocoder import ReverseGeocoder, build_index
+
+
+def main() -> None:
+    directory = tempfile.mkdtemp()
+    if len(sys.argv) > 1:
+        gazetteer = sys.argv[1]
+    else:
+        gazetteer = os.path.join(directory, "addresses.csv")
+        synthetic_gazetteer(gazetteer)
+    path = os.path.join(directory, "reverse.idx")
+
+    started = time.perf_counter()
+    count = build_index(gazetteer, path)
+    print(f"{count} addresses indexed in {time.perf_counter() - started:.2f} s, "
+          f"file {os.path.getsize(path) / 2**20:.1f} MiB")
+
+    tracemalloc.start()
+    started = time.perf_counter()
+    reverse = ReverseGeocoder(path)
+    opened = time.perf_counter() - started
+    heap = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"opened in {opened * 1e6:.0f} µs, {heap / 1024:.1f} KiB of Python heap")
+
+    rng = random.Random(0)
+    samples = []
+    found = 0
+    for _ in range(5_000):
+        lat, lon = rng.uniform(45.02, 45.12), rng.uniform(7.61, 7.74)
+        started = time.perf_counter()
+        found += reverse.nearest(lat, lon) is not None
+        samples.append(time.perf_counter() - started)
+    print(f"lookup: p50 {percentile(samples, 0.5) * 1e6:.1f} µs  p99 {percentile(samples, 0.99) * 1e6:.1f} µs  "
+          f"(address found for {found}/5000 points)")
+    reverse.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,46 @@
+"""Soak test of the bounded session cache with millions of distinct chats.
+
+RSS should grow until the cache is full and then stay flat.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_session_soak.py [n_chats] [max_entries]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.session_cache import SessionCache
+from Functions import metrics
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def main() -> None:
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3_000_000
+    max_entries = int(sys.argv[2]) if len(sys.argv) > 2 else 100_000
+    cache = SessionCache(max_entries=max_entries)
+    # JWT-sized token, shared so the benchmark measures the cache and not the strings
+    token = "eyJhbGciOiJIUzI1NiJ9." + "x" * 180
+    step = max(n // 10, 1)
+    started = time.perf_counter()
+    print(f"{'chats':>10} {'size':>8} {'rss MB':>8}")
+    for chat_id in range(1, n + 1):
+        cache[chat_id] = token
+        if chat_id % 7 == 0:
+            cache.get(chat_id - 3)
+        if chat_id % step == 0:
+            print(f"{chat_id:>10} {len(cache):>8} {rss_mb():>8.1f}")
+    elapsed = time.perf_counter() - started
+    print(f"{n / elapsed:,.0f} inserts/s")
+    print(f"evicted_lru={metrics.counters.get('sessions.evicted_lru', 0)} "
+          f"occupancy={metrics.gauges['sessions.occupancy']:.2f}")
+
+
+if __name__ == "__main__":
+    main()
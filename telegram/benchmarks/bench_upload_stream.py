@@ -0,0 +1,102 @@
+"""Peak RSS of concurrent report uploads.
+
+Each mode runs in its own process, so the peak resident set
+(``ru_maxrss``) belongs to that mode alone:
+
+- copies: every photo copied into a new BytesIO before encoding (the
+  original aiofiles flow);
+- files:  PhotoBuffers passed to httpx as ``files=``;
+- stream: MultipartBody producing bounded chunks from the buffers.
+
+The backend is a transport that consumes the body chunk by chunk
+with a short pause, so all submissions are in flight at the same time.
+
+Run from the telegram/ directory:
+    python benchmarks/bench_upload_stream.py [concurrency] [photo_kb]
+"""
+import asyncio
+import io
+import os
+import resource
+import subprocess
+import sys
+import time
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.multipart import MultipartBody
+from Functions.photos import PhotoBuffer
+
+FIELDS = {"title": "Buca", "description": "x" * 200, "category": "Roads",
+          "latitude": "45.07", "longitude": "7.68", "anonymity": "0"}
+
+
+def rss_mb() -> float:
+    with open("/proc/self/statm") as f:
+        pages = int(f.read().split()[1])
+    return pages * os.sysconf("SC_PAGE_SIZE") / 1e6
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024 / 1e6
+
+
+class SlowBackend(httpx.AsyncBaseTransport):
+    # httpx.MockTransport reads the whole body before calling its handler,
+    # which would hide the difference between the modes
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        received = 0
+        async for chunk in request.stream:
+            received += len(chunk)
+            await asyncio.sleep(0.001)
+        return httpx.Response(201, json={"received": received})
+
+
+async def submit(client: httpx.AsyncClient, mode: str, photos) -> int:
+    if mode == "stream":
+        body = MultipartBody(FIELDS, photos)
+        response = await client.post("http://backend/reports", content=body, headers=body.headers)
+    elif mode == "files":
+        files = [photo.as_multipart() for photo in photos]
+        response = await client.post("http://backend/reports", data=FIELDS, files=files)
+    else:
+        files = [("photos", (p.name, io.BytesIO(p.read_all()), "image/jpeg")) for p in photos]
+        response = await client.post("http://backend/reports", data=FIELDS, files=files)
+    return response.json()["received"]
+
+
+async def run_mode(mode: str, concurrency: int, photo_kb: int) -> None:
+    drafts = []
+    for i in range(concurrency):
+        photos = []
+        for j in range(3):
+            photo = PhotoBuffer(f"{i}-{j}", f"{i}-{j}.jpg")
+            photo.write(os.urandom(photo_kb * 1024))
+            photos.append(photo)
+        drafts.append(photos)
+    baseline = rss_mb()
+    started = time.perf_counter()
+    async with httpx.AsyncClient(transport=SlowBackend()) as client:
+        sent = await asyncio.gather(*(submit(client, mode, photos) for photos in drafts))
+    elapsed = time.perf_counter() - started
+    print(f"{mode:<7} baseline {baseline:7.1f} MB  peak {peak_rss_mb():7.1f} MB  "
+          f"upload overhead {peak_rss_mb() - baseline:7.1f} MB  "
+          f"{sum(sent) / 1e6:7.1f} MB sent in {elapsed:5.2f} s")
+
+
+def main() -> None:
+    if len(sys.argv) > 1 and sys.argv[1] == "--mode":
+        asyncio.run(run_mode(sys.argv[2], int(sys.argv[3]), int(sys.argv[4])))
+        return
+    concurrency = sys.argv[1] if len(sys.argv) > 1 else "50"
+    photo_kb = sys.argv[2] if len(sys.argv) > 2 else "1500"
+    print(f"{concurrency} concurrent submissions x 3 photos x {photo_kb} KB")
+    for mode in ("copies", "files", "stream"):
+        subprocess.run([sys.executable, __file__, "--mode", mode, concurrency, photo_kb], check=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,3 +1,4 @@
+import asyncio
 from telegram.ext import (
     Application,
     CommandHandler,
@@ -9,7 +10,7 @@ from telegram.ext import (
 )
 
 from Functions.login import ( build_main_menu, handle_login, retrieve_account, logout)
-from Functions.start import ( _httpx_with_retry, _normalize_server_url, start)
+from Functions.start import ( _httpx_with_retry, _normalize_server_url, start, open_http_client, close_http_client)
 from Functions.endpoint import (
     send_report,
     receive_title,
@@ -19,9 +20,18 @@ from Functions.endpoint import (
     done_photos,
     skip_photo,
     receive_location,
+    use_photo_location,
+    receive_address,
+    use_address,
     receive_anonymous,
+    follow_instead,
     handle_start_report,
     handle_back,
+    handle_stale_anonymous,
+    answer_in_flight_tap,
+    receive_unsupported_document,
+    handle_city_during_report,
+    IMAGE_DOCUMENTS,
     cancel,
     WAITING_TITLE,
     WAITING_DESCRIPTION,
@@ -29,7 +39,7 @@ from Functions.endpoint import (
     WAITING_PHOTO,
     WAITING_LOCATION,
     WAITING_ANONYMOUS,
-    load_categories
+    load_all_categories
     )
 from Functions.notifications import (
     handle_view_reports,
@@ -45,7 +55,18 @@ from Functions.notifications import (
     WAITING_ID_TO_FOLLOW,
     WAITING_ID_TO_UNFOLLOW,
     handle_back_to_main_menu,
+    handle_reports_page,
 )
+from Functions.nearby import (
+    nearby_command,
+    receive_nearby_location,
+    cancel_nearby,
+    WAITING_NEARBY_LOCATION,
+)
+from Functions.report_map import map_command
+from Functions.tenants import city_command, handle_city
+from Functions.chatlock import ChatLockUpdateProcessor
+from Functions import geocoder, nearby, reverse_geocoder, snapshot, imaging, spool, tenants
 from Functions.help import ( handle_help_menu, help_command, handle_basic_commands, handle_faq, handle_contact_support, handle_back_to_main_menu)
 # Pattern constants (rinominati per non collidere con le funzioni)
 BACK_PATTERN = r"^back_"
@@ -88,6 +109,9 @@ conv_handler = ConversationHandler(
         ],
         WAITING_PHOTO: [
             MessageHandler(filters.PHOTO, receive_photo),
+            # Uncompressed photos keep their EXIF, GPS included
+            MessageHandler(IMAGE_DOCUMENTS, receive_photo),
+            MessageHandler(filters.Document.ALL, receive_unsupported_document),
             CommandHandler('done', done_photos),  # callback è la funzione done_photos
             CommandHandler('skip', skip_photo),
             CallbackQueryHandler(done_photos, pattern=DONE_PHOTOS_PATTERN),
@@ -95,14 +119,23 @@ conv_handler = ConversationHandler(
         ],
         WAITING_LOCATION: [
             MessageHandler(filters.LOCATION, receive_location),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, receive_address),
+            CallbackQueryHandler(use_photo_location, pattern=r"^use_photo_location$"),
+            CallbackQueryHandler(use_address, pattern=r"^address_-?[\d.]+_-?[\d.]+$"),
             CallbackQueryHandler(handle_back, pattern=BACK_PATTERN),
         ],
         WAITING_ANONYMOUS: [
             CallbackQueryHandler(receive_anonymous, pattern=r"^anonymous_(yes|no)$"),
+            CallbackQueryHandler(follow_instead, pattern=r"^follow_instead_\d+$"),
             CallbackQueryHandler(handle_back, pattern=BACK_PATTERN),
         ],
     },
-    fallbacks=[CommandHandler('cancel', cancel), CallbackQueryHandler(cancel, pattern=CANCEL_REPORT_PATTERN)],
+    fallbacks=[
+        CommandHandler('cancel', cancel),
+        CallbackQueryHandler(cancel, pattern=CANCEL_REPORT_PATTERN),
+        # A city switch ends the report: its draft belongs to the previous city
+        CallbackQueryHandler(handle_city_during_report, pattern=r"^city_\w+$"),
+    ],
     per_message=False
 )
 
@@ -123,10 +156,65 @@ id_notification_handler = ConversationHandler(
     }
 )
 
+nearby_handler = ConversationHandler(
+    entry_points=[CommandHandler('nearby', nearby_command)],
+    states={
+        WAITING_NEARBY_LOCATION: [MessageHandler(filters.LOCATION, receive_nearby_location)],
+    },
+    fallbacks=[CommandHandler('cancel', cancel_nearby)],
+)
+
+snapshot_task = None
+spool_task = None
+nearby_task = None
+
 async def post_init(application: Application) -> None:
-    await load_categories()
+    global snapshot_task, spool_task, nearby_task
+    # Before anything starts a thread: the image workers are forked
+    imaging.start_pool()
+    # One connection pool for the backends of every tenant
+    await open_http_client()
+    # Spilled photos of a previous run belong to drafts that no longer exist
+    spool.photo_spool.scan_orphans()
+    spool_task = asyncio.create_task(spool.run_periodic_sweeps())
+    # Build the boundary indexes now rather than on the first location received
+    for tenant in tenants.all_tenants():
+        tenant.geofence()
+    geocoder.get_geocoder()
+    # Rewrites the reverse index if the gazetteer changed; its pages are mapped in on demand
+    reverse_geocoder.get_reverse_geocoder()
+    # Keeps the /nearby index of every tenant in sync with its approved reports
+    nearby_task = asyncio.create_task(nearby.run_periodic_refresh())
+    # Restore caches before polling starts; refresh categories without blocking if we have a copy
+    if snapshot.load():
+        application.create_task(load_all_categories())
+    else:
+        await load_all_categories()
+    snapshot_task = asyncio.create_task(snapshot.run_periodic_saves())
 
-app = Application.builder().token("7796981555:AAFAU2xf7n6f-BihJhw5bjXo3H--_fzgwGg").post_init(post_init).build()
+async def post_shutdown(application: Application) -> None:
+    for task in (snapshot_task, spool_task, nearby_task):
+        if task is not None:
+            task.cancel()
+    imaging.shutdown()
+    await close_http_client()
+    spool.photo_spool.release_all()
+    try:
+        size = snapshot.save()
+        print(f"Snapshot written ({size} bytes)")
+    except Exception as e:
+        print(f"Failed to write snapshot: {e}")
+
+app = (
+    Application.builder()
+    .token("7796981555:AAFAU2xf7n6f-BihJhw5bjXo3H--_fzgwGg")
+    .post_init(post_init)
+    .post_shutdown(post_shutdown)
+    # Updates run concurrently across chats, serialized per chat (across replicas too);
+    # repeated anonymity taps are answered without waiting behind the upload
+    .concurrent_updates(ChatLockUpdateProcessor(bypass=answer_in_flight_tap))
+    .build()
+)
 
 def on_error(update, context):
     print(f"Error: {context.error}")
@@ -143,6 +231,7 @@ app.add_handler(CallbackQueryHandler(handle_follow_all_personal_reports, pattern
 app.add_handler(CallbackQueryHandler(handle_unfollow_report, pattern=r"^stop_follow_\d+$"))
 app.add_handler(CallbackQueryHandler(handle_unfollow_all_personal_reports, pattern=UNFOLLOW_ALL_PERSONAL_REPORT))
 app.add_handler(CallbackQueryHandler(handle_back_to_main_menu, pattern=BACK_MAIN_MENU))
+app.add_handler(CallbackQueryHandler(handle_reports_page, pattern=r"^reports_page_(\d+|current)$"))
 
 # Handlers per il menu di help
 app.add_handler(CommandHandler("help", help_command))
@@ -154,4 +243,10 @@ app.add_handler(CallbackQueryHandler(handle_contact_support, pattern=CONTACT_SUP
 
 app.add_handler(conv_handler)
 app.add_handler(id_notification_handler)
+app.add_handler(nearby_handler)
+app.add_handler(CommandHandler("map", map_command))
+app.add_handler(CommandHandler("city", city_command))
+app.add_handler(CallbackQueryHandler(handle_city, pattern=r"^city_\w+$"))
+# Anonymity taps that reach us after the report conversation ended
+app.add_handler(CallbackQueryHandler(handle_stale_anonymous, pattern=r"^anonymous_(yes|no)$"))
 app.run_polling(drop_pending_updates=True)
\ No newline at end of file
@@ -0,0 +1,111 @@
+"""Build the gazetteer used for typed addresses and reverse geocoding.
+
+Writes the CSV read by Functions/geocoder.py
+    street,number,latitude,longitude,district
+from either source:
+
+    osm <area name>     house numbers of an OpenStreetMap area, fetched
+                        from the Overpass API (default area: Torino)
+    csv <file>          a house-number open data export; name its columns
+                        with --street/--number/--lat/--lon [--district]
+
+docker-compose mounts telegram/data at /data in the bot container and
+points GAZETTEER_PATH at /data/turin_addresses.csv.
+
+Run from the telegram/ directory:
+    python scripts/build_gazetteer.py osm Torino data/turin_addresses.csv
+    python scripts/build_gazetteer.py csv civici.csv data/turin_addresses.csv \\
+        --street DENOMINAZIONE --number CIVICO --lat LAT --lon LON
+"""
+import argparse
+import csv
+import os
+import sys
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.geocoder import read_gazetteer
+
+OVERPASS_URL = os.getenv("OVERPASS_URL", "https://overpass-api.de/api/interpreter")
+_OVERPASS_QUERY = """
+[out:json][timeout:600];
+area["name"="{area}"]["boundary"="administrative"]->.city;
+nwr(area.city)["addr:housenumber"]["addr:street"];
+out center tags;
+"""
+
+
+def from_overpass(area: str):
+    response = httpx.post(OVERPASS_URL, data={"data": _OVERPASS_QUERY.format(area=area)}, timeout=900)
+    response.raise_for_status()
+    for element in response.json().get("elements", []):
+        tags = element.get("tags", {})
+        # Ways and relations (buildings) come with their centre
+        point = element if "lat" in element else element.get("center")
+        if not point:
+            continue
+        district = tags.get("addr:suburb") or tags.get("addr:quarter") or ""
+        # "12;14" tags several numbers on one entrance
+        for number in tags["addr:housenumber"].split(";"):
+            yield tags["addr:street"], number.strip(), point["lat"], point["lon"], district
+
+
+def from_csv(path: str, street: str, number: str, lat: str, lon: str, district: str = "", delimiter: str = ","):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        for row in csv.DictReader(f, delimiter=delimiter):
+            try:
+                # Italian exports often use a decimal comma
+                latitude = float(row[lat].replace(",", "."))
+                longitude = float(row[lon].replace(",", "."))
+            except (KeyError, AttributeError, ValueError):
+                continue
+            yield row.get(street, "").strip(), row.get(number, "").strip(), latitude, longitude, \
+                (row.get(district) or "").strip() if district else ""
+
+
+def write_gazetteer(rows, out_path: str) -> int:
+    """Write the rows to ``out_path`` atomically; returns the rows written."""
+    seen = set()
+    count = 0
+    tmp = f"{out_path}.tmp"
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["street", "number", "latitude", "longitude", "district"])
+        for street, number, lat, lon, district in rows:
+            key = (street.lower(), number.lower())
+            if not street or not number or key in seen:
+                continue
+            seen.add(key)
+            writer.writerow([street, number, f"{lat:.7f}", f"{lon:.7f}", district])
+            count += 1
+    os.replace(tmp, out_path)
+    return count
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", choices=("osm", "csv"))
+    parser.add_argument("input", help="OpenStreetMap area name, or the open data CSV")
+    parser.add_argument("output", nargs="?", default="data/turin_addresses.csv")
+    parser.add_argument("--street", default="street")
+    parser.add_argument("--number", default="number")
+    parser.add_argument("--lat", default="latitude")
+    parser.add_argument("--lon", default="longitude")
+    parser.add_argument("--district", default="")
+    parser.add_argument("--delimiter", default=",")
+    args = parser.parse_args()
+
+    if args.source == "osm":
+        rows = from_overpass(args.input)
+    else:
+        rows = from_csv(args.input, args.street, args.number, args.lat, args.lon, args.district, args.delimiter)
+    count = write_gazetteer(rows, args.output)
+    usable = sum(1 for _ in read_gazetteer(args.output))
+    print(f"{count} addresses written to {args.output} ({usable} with a usable house number)")
+
+
+if __name__ == "__main__":
+    main()
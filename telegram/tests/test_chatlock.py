@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import MagicMock
+from telegram import Update
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.chatlock import ChatLockUpdateProcessor, LocalLeaseStore
+from Functions import metrics
+
+
+def make_update(chat_id: int):
+    update = MagicMock(spec=Update)
+    update.update_id = chat_id
+    update.effective_chat = MagicMock()
+    update.effective_chat.id = chat_id
+    return update
+
+
+class TestLocalLeaseStore:
+    """Test per lo store locale dei lease"""
+
+    @pytest.mark.asyncio
+    async def test_tokens_are_unique(self):
+        """Ogni acquisizione restituisce un token diverso"""
+        store = LocalLeaseStore()
+        first = await store.acquire("1", 1000)
+        assert await store.acquire("1", 1000) is None
+        assert await store.release("1", first)
+        second = await store.acquire("1", 1000)
+        assert second > first
+
+    @pytest.mark.asyncio
+    async def test_stale_token_cannot_release(self):
+        """Un token scaduto non rilascia il lease corrente"""
+        store = LocalLeaseStore()
+        token = await store.acquire("1", 1)
+        await asyncio.sleep(0.01)
+        newer = await store.acquire("1", 1000)
+        assert not await store.release("1", token)
+        assert await store.extend("1", newer, 1000)
+
+
+class TestChatLockUpdateProcessor:
+    """Test per la serializzazione degli update per chat"""
+
+    @pytest.mark.asyncio
+    async def test_same_chat_is_serialized(self):
+        """Due update della stessa chat non si sovrappongono"""
+        processor = ChatLockUpdateProcessor(store=LocalLeaseStore(), max_concurrent_updates=8)
+        running = []
+        overlaps = []
+
+        async def handler():
+            if running:
+                overlaps.append(True)
+            running.append(True)
+            await asyncio.sleep(0.01)
+            running.pop()
+
+        await asyncio.gather(
+            processor.process_update(make_update(1), handler()),
+            processor.process_update(make_update(1), handler()),
+        )
+        assert overlaps == []
+
+    @pytest.mark.asyncio
+    async def test_busy_chat_does_not_block_others(self):
+        """Gli update in coda dietro una chat lenta non occupano gli slot delle altre"""
+        processor = ChatLockUpdateProcessor(store=LocalLeaseStore(), max_concurrent_updates=2,
+                                            max_queued_updates=16, max_pending_per_chat=8)
+        finished = {}
+        started = asyncio.get_running_loop().time()
+
+        async def handler(name, delay):
+            await asyncio.sleep(delay)
+            finished[name] = asyncio.get_running_loop().time() - started
+
+        busy = [asyncio.create_task(processor.process_update(make_update(1), handler(f"busy{i}", 0.05)))
+                for i in range(4)]
+        await asyncio.sleep(0)
+        await processor.process_update(make_update(2), handler("other", 0))
+        assert finished["other"] < 0.05
+        await asyncio.gather(*busy)
+
+    @pytest.mark.asyncio
+    async def test_pending_updates_per_chat_are_bounded(self):
+        processor = ChatLockUpdateProcessor(store=LocalLeaseStore(), max_pending_per_chat=1)
+        metrics.reset()
+        called = []
+
+        async def handler():
+            called.append(True)
+            await asyncio.sleep(0.01)
+
+        await asyncio.gather(*(processor.process_update(make_update(3), handler()) for _ in range(3)))
+        assert len(called) == 2
+        assert metrics.counters["chatlock.overflow"] == 1
+        assert processor._chats == {}
+
+    @pytest.mark.asyncio
+    async def test_locked_elsewhere_drops_update(self):
+        """Se un'altra istanza tiene il lock l'update viene scartato"""
+        store = LocalLeaseStore()
+        await store.acquire("7", 60_000)
+        processor = ChatLockUpdateProcessor(store=store, wait_s=0.05)
+        metrics.reset()
+        called = []
+
+        async def handler():
+            called.append(True)
+
+        await processor.process_update(make_update(7), handler())
+        assert called == []
+        assert metrics.counters["chatlock.timeouts"] == 1
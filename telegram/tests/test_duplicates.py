@@ -0,0 +1,91 @@
+import random
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import duplicates
+from Functions.duplicates import find_duplicates, normalize, query_trigrams, similarity, trigrams
+from Functions.nearby import ReportIndex
+
+
+def raw_report(report_id, lat, lon, title, description="", category="Roads", state="ASSIGNED"):
+    return {
+        "id": report_id,
+        "title": title,
+        "location": {"name": "", "coordinates": {"latitude": lat, "longitude": lon}},
+        "date": "2025-01-01",
+        "category": category,
+        "document": {"description": description, "photos": []},
+        "state": state,
+    }
+
+
+@pytest.fixture
+def index():
+    index = ReportIndex()
+    index.apply([
+        raw_report(1, 45.0703, 7.6869, "Buca profonda in via Roma", "Una buca enorme davanti al civico 12"),
+        raw_report(2, 45.0704, 7.6870, "Lampione spento", "Il lampione non funziona da giorni", "Lighting"),
+        raw_report(3, 45.0800, 7.6869, "Buca profonda in via Roma", "Stessa buca ma lontana"),
+        raw_report(4, 45.0703, 7.6871, "Buca profonda in via Roma", "Già sistemata", state="RESOLVED"),
+    ])
+    return index
+
+
+class TestTrigrams:
+    """Test per la similarità a trigrammi"""
+
+    def test_normalize(self):
+        assert normalize("  Città: BUCA_profonda!! ") == "citta buca profonda"
+
+    def test_identical_and_unrelated(self):
+        grams = trigrams("Buca in via Roma")
+        assert similarity(query_trigrams("buca in via roma"), grams) == pytest.approx(1.0)
+        assert similarity(query_trigrams("Lampione spento"), grams) < 0.1
+        assert similarity(query_trigrams(""), grams) == 0.0
+
+    def test_query_does_not_grow_vocabulary(self):
+        trigrams("rifiuti abbandonati")
+        size = len(duplicates._vocabulary)
+        known, total = query_trigrams("rifiuti xqzwk")
+        assert len(duplicates._vocabulary) == size
+        assert len(known) < total
+
+
+class TestFindDuplicates:
+    """Test per la ricerca di segnalazioni duplicate"""
+
+    def test_similar_nearby_report(self, index):
+        """Trova la segnalazione vicina e simile, non quella lontana o chiusa"""
+        found = find_duplicates(index, 45.0703, 7.6869, "Buca in via Roma", "buca grande", "Roads")
+        assert [report.id for _, _, report in found] == [1]
+        score, distance, _ = found[0]
+        assert score >= duplicates.DUPLICATE_MIN_SIMILARITY
+        assert distance < 1
+
+    def test_different_problem_is_not_a_duplicate(self, index):
+        assert find_duplicates(index, 45.0703, 7.6869, "Rifiuti abbandonati", "sacchi sul marciapiede") == []
+
+    def test_description_match(self, index):
+        """Il testo della descrizione conta anche con titoli diversi"""
+        found = find_duplicates(index, 45.0703, 7.6869, "Guasto", "Il lampione non funziona da giorni")
+        assert [report.id for _, _, report in found] == [2]
+
+    def test_grams_are_recomputed_when_a_report_changes(self, index):
+        find_duplicates(index, 45.0703, 7.6869, "Buca in via Roma", "")
+        index.apply([raw_report(1, 45.0703, 7.6869, "Marciapiede rotto", "")])
+        assert find_duplicates(index, 45.0703, 7.6869, "Buca in via Roma", "") == []
+
+    def test_limit(self):
+        index = ReportIndex()
+        rng = random.Random(0)
+        index.apply([
+            raw_report(i, 45.0703 + rng.uniform(-0.0005, 0.0005), 7.6869, "Buca in via Roma")
+            for i in range(20)
+        ])
+        found = find_duplicates(index, 45.0703, 7.6869, "Buca in via Roma", "", limit=3)
+        assert len(found) == 3
+        distances = [distance for _, distance, _ in found]
+        assert distances == sorted(distances)
@@ -0,0 +1,107 @@
+import io
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+Image = pytest.importorskip("PIL.Image")
+
+from Functions import imaging
+from Functions.exif import read_gps
+from Functions.photos import PhotoBuffer
+
+
+def make_jpeg_with_gps(lat, lat_ref, lon, lon_ref) -> bytes:
+    exif = Image.Exif()
+    exif[0x010F] = "TestCam"
+    gps = exif.get_ifd(0x8825)
+    gps[1] = lat_ref
+    gps[2] = lat
+    gps[3] = lon_ref
+    gps[4] = lon
+    out = io.BytesIO()
+    Image.new("RGB", (64, 48), (10, 20, 30)).save(out, "JPEG", exif=exif)
+    return out.getvalue()
+
+
+def plain_jpeg() -> bytes:
+    out = io.BytesIO()
+    Image.new("RGB", (64, 48)).save(out, "JPEG")
+    return out.getvalue()
+
+
+class FakeDocument:
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    async def get_file(self):
+        return self
+
+    async def download_to_memory(self, out):
+        out.write(self.payload)
+
+
+class TestReadGps:
+    """Test per la lettura delle coordinate GPS dai metadati EXIF"""
+
+    def test_turin_coordinates(self):
+        """Gradi, minuti e secondi vengono convertiti in gradi decimali"""
+        data = make_jpeg_with_gps((45.0, 4.0, 12.0), "N", (7.0, 41.0, 6.0), "E")
+        lat, lon = read_gps(data)
+        assert lat == pytest.approx(45.07)
+        assert lon == pytest.approx(7.685)
+
+    def test_southern_western_hemisphere(self):
+        """I riferimenti S e W rendono negative le coordinate"""
+        lat, lon = read_gps(make_jpeg_with_gps((33.0, 52.0, 0.0), "S", (70.0, 30.0, 0.0), "W"))
+        assert lat < 0 and lon < 0
+
+    def test_missing_or_broken_exif(self):
+        """Foto senza EXIF o con dati troncati non hanno coordinate"""
+        assert read_gps(plain_jpeg()) is None
+        assert read_gps(b"not a jpeg") is None
+        data = make_jpeg_with_gps((45.0, 4.0, 12.0), "N", (7.0, 41.0, 6.0), "E")
+        assert read_gps(data[:60]) is None
+
+    @pytest.mark.asyncio
+    async def test_gps_survives_processing(self):
+        """Le coordinate vengono lette prima che l'elaborazione rimuova i metadati"""
+        photo = PhotoBuffer("doc", "doc.jpg")
+        photo.prefetch(FakeDocument(make_jpeg_with_gps((45.0, 4.0, 12.0), "N", (7.0, 41.0, 6.0), "E")))
+        await photo._task
+        assert photo.gps == pytest.approx((45.07, 7.685))
+        assert read_gps(photo.read_all()) is None
+        photo.close()
+        imaging.shutdown()
+
+
+def document_update(mime_type: str):
+    from datetime import datetime
+    from telegram import Chat, Document, Message, Update
+    document = Document("file", "unique", file_name="photo", mime_type=mime_type)
+    message = Message(1, datetime.now(), Chat(1, Chat.PRIVATE), document=document)
+    return Update(1, message=message)
+
+
+class TestImageDocuments:
+    """Test per i formati accettati come documento"""
+
+    def test_only_decodable_formats_are_accepted(self):
+        from Functions.endpoint import IMAGE_DOCUMENTS
+        assert IMAGE_DOCUMENTS.check_update(document_update("image/jpeg"))
+        assert IMAGE_DOCUMENTS.check_update(document_update("image/png"))
+        assert not IMAGE_DOCUMENTS.check_update(document_update("image/heic"))
+
+    @pytest.mark.asyncio
+    async def test_png_document_is_uploaded_as_jpeg(self):
+        """Un PNG viene ricodificato, quindi nome e MIME .jpg sono corretti"""
+        out = io.BytesIO()
+        Image.new("RGB", (64, 48)).save(out, "PNG")
+        photo = PhotoBuffer("doc", "doc.jpg")
+        photo.prefetch(FakeDocument(out.getvalue()))
+        await photo._task
+        with Image.open(photo.open()) as img:
+            assert img.format == "JPEG"
+        photo.close()
+        imaging.shutdown()
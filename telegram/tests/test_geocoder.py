@@ -0,0 +1,119 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.geocoder import Geocoder, StreetTrie, parse_address
+
+GAZETTEER = """street,number,latitude,longitude
+Via Roma,10,45.0680,7.6830
+Via Roma,12,45.0682,7.6831
+Via Roma,12/A,45.0683,7.6832
+Via Roma,14,45.0684,7.6833
+Via Roma,11,45.0681,7.6828
+Piazza Castello,1,45.0712,7.6855
+Corso Vittorio Emanuele II,5,45.0620,7.6790
+Corso Vittorio Emanuele II,7,45.0621,7.6795
+Via Garibaldi,10,45.0735,7.6810
+Via XX Settembre,3,45.0660,7.6780
+Via Rosa,2,45.0500,7.6500
+Via Nizza,abc,45.0,7.6
+"""
+
+
+@pytest.fixture(scope="module")
+def geocoder(tmp_path_factory):
+    path = tmp_path_factory.mktemp("gazetteer") / "addresses.csv"
+    path.write_text(GAZETTEER, encoding="utf-8")
+    return Geocoder.from_csv(str(path))
+
+
+class TestParseAddress:
+    """Test per la scomposizione degli indirizzi digitati"""
+
+    def test_parse(self):
+        assert parse_address("Via Roma 12, Torino") == ("via roma", 12, "")
+        assert parse_address("c.so Vittorio Emanuele II 5/b") == ("corso vittorio emanuele ii", 5, "b")
+        assert parse_address("P.za Castello n. 1, 10121 Torino") == ("piazza castello", 1, "")
+        assert parse_address("via XX Settembre") == ("via xx settembre", None, "")
+
+
+class TestGeocoder:
+    """Test per il geocoder offline"""
+
+    def test_exact_address(self, geocoder):
+        best = geocoder.lookup("Via Roma 12")[0]
+        assert best.label == "Via Roma 12"
+        assert best.exact
+        assert (best.lat, best.lon) == (45.0682, 7.6831)
+
+    def test_number_suffix(self, geocoder):
+        best = geocoder.lookup("via roma 12a")[0]
+        assert best.label == "Via Roma 12/A" and best.exact
+
+    def test_typo_and_abbreviation(self, geocoder):
+        best = geocoder.lookup("c.so Vitorio Emanuelle II 7")[0]
+        assert best.label == "Corso Vittorio Emanuele II 7"
+        assert best.edits == 2 and not best.exact
+
+    def test_street_type_can_be_omitted(self, geocoder):
+        assert geocoder.lookup("garibaldi 10")[0].label == "Via Garibaldi 10"
+
+    def test_missing_number_uses_same_side(self, geocoder):
+        best = geocoder.lookup("Via Roma 16")[0]
+        assert best.label == "Via Roma 14"
+        assert not best.exact
+        assert geocoder.lookup("Via Roma 13")[0].label == "Via Roma 11"
+
+    def test_close_names_are_all_offered(self, geocoder):
+        """Un nome esatto vince, un refuso propone tutte le vie vicine"""
+        assert [r.label for r in geocoder.lookup("via rosa 2")] == ["Via Rosa 2"]
+        labels = [r.label for r in geocoder.lookup("via rora 2")]
+        assert sorted(labels) == ["Via Roma 10", "Via Rosa 2"]
+
+    def test_unknown_street(self, geocoder):
+        assert geocoder.lookup("Via Inesistente 3") == []
+        assert geocoder.lookup("") == []
+
+    def test_rows_without_number_are_skipped(self, geocoder):
+        assert geocoder.lookup("via nizza 1") == []
+        assert geocoder.stats()["addresses"] == 11
+
+
+class TestStreetTrie:
+    """Test per il trie radix dei nomi di via"""
+
+    def test_fuzzy_search_matches_brute_force(self):
+        words = ["via roma", "via rosa", "via romagna", "corso francia", "corso regina", "via po", "via pio"]
+        trie = StreetTrie()
+        for i, word in enumerate(words):
+            trie.insert(word, i)
+
+        def distance(a, b):
+            row = list(range(len(b) + 1))
+            for i, ca in enumerate(a, 1):
+                previous, row = row, [i]
+                for j, cb in enumerate(b, 1):
+                    row.append(min(row[j - 1] + 1, previous[j] + 1, previous[j - 1] + (ca != cb)))
+            return row[-1]
+
+        for query in ["via roma", "via rma", "corso francai", "via p", "vía pio", "xyz"]:
+            for max_edits in (0, 1, 2):
+                expected = {i: distance(query, w) for i, w in enumerate(words) if distance(query, w) <= max_edits}
+                assert trie.search(query, max_edits) == expected
+
+
+class TestBuildGazetteer:
+    """Test per lo script che costruisce il gazetteer dagli open data"""
+
+    def test_open_data_csv(self, tmp_path):
+        from scripts.build_gazetteer import from_csv, write_gazetteer
+        source = tmp_path / "civici.csv"
+        source.write_text("VIA;CIV;LAT;LON\nVia Po;3/A;45,07;7,69\nVia Po;3/A;45,07;7,69\nVia Po;;45,07;7,69\n",
+                          encoding="utf-8")
+        out = str(tmp_path / "data" / "addresses.csv")
+        rows = from_csv(str(source), "VIA", "CIV", "LAT", "LON", delimiter=";")
+        assert write_gazetteer(rows, out) == 1
+        result = Geocoder.from_csv(out).lookup("via po 3/a")[0]
+        assert result.exact and result.lat == pytest.approx(45.07)
@@ -0,0 +1,57 @@
+import random
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import geofence
+from Functions.geofence import Geofence, load_rings, point_in_rings
+
+
+@pytest.fixture(scope="module")
+def rings():
+    return load_rings()
+
+
+@pytest.fixture(scope="module")
+def fence(rings):
+    return Geofence(rings, grid_size=128)
+
+
+class TestGeofence:
+    """Test per il confine della città di Torino"""
+
+    def test_known_places(self):
+        """Il centro è dentro, i comuni vicini sono fuori"""
+        assert geofence.contains(45.0703, 7.6869)      # Piazza Castello
+        assert geofence.contains(45.1096, 7.6413)      # Madonna di Campagna
+        assert not geofence.contains(44.9990, 7.6820)  # Moncalieri
+        assert not geofence.contains(45.1372, 7.6133)  # Venaria Reale, inside the old rectangle
+        assert not geofence.contains(41.9028, 12.4964) # Roma
+
+    def test_matches_exact_point_in_polygon(self, fence, rings):
+        """La griglia dà lo stesso risultato del test esatto"""
+        rng = random.Random(0)
+        for _ in range(5_000):
+            lat = rng.uniform(fence.min_lat - 0.01, fence.max_lat + 0.01)
+            lon = rng.uniform(fence.min_lon - 0.01, fence.max_lon + 0.01)
+            assert fence.contains(lat, lon) == point_in_rings(lon, lat, rings)
+
+    def test_points_near_the_boundary(self, fence, rings):
+        """Anche i punti a pochi metri dal confine sono classificati correttamente"""
+        rng = random.Random(1)
+        vertices = [point for ring in rings for point in ring]
+        for vertex_lon, vertex_lat in vertices:
+            lat = vertex_lat + rng.uniform(-0.0003, 0.0003)
+            lon = vertex_lon + rng.uniform(-0.0003, 0.0003)
+            assert fence.contains(lat, lon) == point_in_rings(lon, lat, rings)
+
+    def test_hole_is_outside(self):
+        """I buchi del poligono sono esclusi"""
+        outer = [(0, 0), (10, 0), (10, 10), (0, 10), (0, 0)]
+        hole = [(4, 4), (6, 4), (6, 6), (4, 6), (4, 4)]
+        fence = Geofence([outer, hole], grid_size=16)
+        assert fence.contains(2, 2)
+        assert not fence.contains(5, 5)
+        assert fence.contains(4.5, 3.9)
@@ -0,0 +1,91 @@
+import io
+import random
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+Image = pytest.importorskip("PIL.Image")
+
+from Functions import imaging
+
+
+def make_jpeg(width: int, height: int, with_exif: bool = False) -> bytes:
+    img = Image.new("RGB", (width, height), (120, 80, 40))
+    out = io.BytesIO()
+    if with_exif:
+        exif = Image.Exif()
+        exif[0x010F] = "TestCam"
+        img.save(out, "JPEG", exif=exif)
+    else:
+        img.save(out, "JPEG")
+    return out.getvalue()
+
+
+class TestShrinkJpeg:
+    """Test per il ridimensionamento delle foto"""
+
+    def test_large_photo_is_downscaled(self):
+        """Le foto troppo grandi vengono ridimensionate mantenendo le proporzioni"""
+        result = imaging.shrink_jpeg(make_jpeg(3200, 2400), max_dimension=800, quality=80)
+        with Image.open(io.BytesIO(result)) as img:
+            assert img.size == (800, 600)
+
+    def test_metadata_is_stripped(self):
+        """I metadati EXIF vengono rimossi"""
+        result = imaging.shrink_jpeg(make_jpeg(100, 100, with_exif=True), max_dimension=800, quality=80)
+        with Image.open(io.BytesIO(result)) as img:
+            assert "exif" not in img.info
+
+    def test_xmp_is_stripped(self):
+        """Anche l'XMP (che può contenere il GPS) forza la ricodifica"""
+        out = io.BytesIO()
+        Image.new("RGB", (100, 100)).save(out, "JPEG", xmp=b"<x:xmpmeta>GPSLatitude</x:xmpmeta>")
+        result = imaging.shrink_jpeg(out.getvalue(), max_dimension=800, quality=80)
+        assert b"xmpmeta" not in result
+
+    @pytest.mark.asyncio
+    async def test_invalid_data_is_rejected(self):
+        """Se la pulizia dei metadati fallisce la foto non viene caricata"""
+        with pytest.raises(imaging.ImageRejected):
+            await imaging.prepare(b"not an image", shrink=True)
+        imaging.shutdown()
+
+    @pytest.mark.asyncio
+    async def test_invalid_data_without_shrink_is_returned_untouched(self):
+        data = b"not an image"
+        processed, phash = await imaging.prepare(data, shrink=False)
+        assert processed is data
+        assert phash is None
+        imaging.shutdown()
+
+
+def make_scene(width: int, height: int, seed: int) -> Image.Image:
+    # Coarse random blocks, scaled up: structure survives resizing and recompression
+    rng = random.Random(seed)
+    blocks = Image.frombytes("L", (16, 12), bytes(rng.randrange(256) for _ in range(16 * 12)))
+    return blocks.resize((width, height), Image.BILINEAR).convert("RGB")
+
+
+def to_jpeg(img: Image.Image, quality: int = 90) -> bytes:
+    out = io.BytesIO()
+    img.save(out, "JPEG", quality=quality)
+    return out.getvalue()
+
+
+class TestPhotoHash:
+    """Test per l'hash percettivo delle foto"""
+
+    def test_rescaled_copy_has_close_hash(self):
+        """La stessa foto ricompressa e ridimensionata ha un hash quasi identico"""
+        original = make_scene(1600, 1200, seed=1)
+        a = imaging.photo_hash(to_jpeg(original))
+        b = imaging.photo_hash(to_jpeg(original.resize((800, 600)), quality=60))
+        assert (a ^ b).bit_count() <= 6
+
+    def test_different_photos_have_distant_hashes(self):
+        """Foto diverse hanno hash lontani"""
+        a = imaging.photo_hash(to_jpeg(make_scene(800, 600, seed=1)))
+        b = imaging.photo_hash(to_jpeg(make_scene(800, 600, seed=2)))
+        assert (a ^ b).bit_count() > 6
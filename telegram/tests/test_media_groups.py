@@ -0,0 +1,117 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import endpoint, media_groups, metrics
+from Functions.chatlock import ChatLockUpdateProcessor, LocalLeaseStore
+from Functions.draft import new_draft, WAITING_PHOTO
+from telegram import Update
+
+
+class FakeTelegramFile:
+    async def download_to_memory(self, out):
+        out.write(b"jpeg")
+
+
+def make_album_update(message_id: int, group_id: str = "album1"):
+    size = MagicMock()
+    size.width, size.height, size.file_size = 800, 600, 50_000
+    size.file_id = size.file_unique_id = f"p{message_id}"
+    size.get_file = AsyncMock(return_value=FakeTelegramFile())
+    update = MagicMock()
+    update.effective_chat.id = 5
+    update.message.chat_id = 5
+    update.message.message_id = message_id
+    update.message.media_group_id = group_id
+    update.message.photo = [size]
+    update.message.reply_text = AsyncMock()
+    return update
+
+
+class TestMediaGroupAggregation:
+    """Test per l'aggregazione degli album di foto"""
+
+    @pytest.fixture(autouse=True)
+    def short_debounce(self, monkeypatch):
+        monkeypatch.setattr(media_groups, "MEDIA_GROUP_DEBOUNCE_S", 0.02)
+
+    @pytest.mark.asyncio
+    async def test_album_is_handled_once_with_cap(self):
+        """Un album di 4 foto produce una sola risposta e rispetta il limite di 3"""
+        metrics.reset()
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        updates = [make_album_update(i) for i in (3, 1, 4, 2)]
+        for update in updates:
+            assert await endpoint.receive_photo(update, context) == WAITING_PHOTO
+        assert media_groups.is_pending(5)
+        await asyncio.sleep(0.1)
+
+        assert not media_groups.is_pending(5)
+        assert [p.file_id for p in draft.photos] == ["p1", "p2", "p3"]
+        assert metrics.counters["photos.over_cap"] == 1
+        replies = [u.message.reply_text for u in updates if u.message.reply_text.called]
+        assert len(replies) == 1
+        assert "Maximum reached" in replies[0].call_args.args[0]
+        draft.discard_photos()
+
+    @pytest.mark.asyncio
+    async def test_flush_waits_for_chat_lock(self):
+        """L'album viene elaborato solo quando la chat non ha altri update in corso"""
+        processor = ChatLockUpdateProcessor(store=LocalLeaseStore())
+        context = MagicMock()
+        context.user_data = {}
+        context.application.update_processor = processor
+        draft = new_draft(context.user_data)
+        await endpoint.receive_photo(make_album_update(1, group_id="album3"), context)
+
+        busy = MagicMock(spec=Update)
+        busy.update_id = 2
+        busy.effective_chat = MagicMock(id=5)
+        release = asyncio.Event()
+        running = asyncio.create_task(processor.process_update(busy, release.wait()))
+        await asyncio.sleep(0.1)
+        # Debounce elapsed, but the chat's update is still being handled
+        assert draft.photos == []
+        release.set()
+        await running
+        await asyncio.sleep(0.05)
+        assert [p.file_id for p in draft.photos] == ["p1"]
+        draft.discard_photos()
+
+    @pytest.mark.asyncio
+    async def test_cancelled_draft_is_ignored(self):
+        """Se il report viene annullato durante l'attesa l'album viene ignorato"""
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        update = make_album_update(1, group_id="album2")
+        await endpoint.receive_photo(update, context)
+        context.user_data.clear()
+        await asyncio.sleep(0.1)
+        assert draft.photos == []
+        update.message.reply_text.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_resent_photo_is_rejected(self):
+        """Una foto già presente nella bozza non viene aggiunta di nuovo"""
+        metrics.reset()
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        first = make_album_update(1, group_id="a")
+        await endpoint.receive_photo(first, context)
+        await asyncio.sleep(0.1)
+        updates = [make_album_update(i, group_id="b") for i in (1, 2)]
+        for update in updates:
+            await endpoint.receive_photo(update, context)
+        await asyncio.sleep(0.1)
+
+        assert [p.file_id for p in draft.photos] == ["p1", "p2"]
+        assert metrics.counters["photos.duplicates_rejected"] == 1
+        draft.discard_photos()
@@ -0,0 +1,91 @@
+import pytest
+import sys
+import os
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import photos as photos_module
+from Functions.multipart import MultipartBody
+from Functions.photos import PhotoBuffer
+
+
+def make_photo(name: str, payload: bytes) -> PhotoBuffer:
+    photo = PhotoBuffer(name, f"{name}.jpg")
+    photo.write(payload)
+    return photo
+
+
+async def collect(body: MultipartBody) -> list:
+    return [chunk async for chunk in body]
+
+
+FIELDS = {"title": "Buca", "description": "Una buca profonda in via Roma", "anonymity": "0"}
+
+
+class TestMultipartBody:
+    """Test per il corpo multipart inviato in streaming"""
+
+    @pytest.mark.asyncio
+    async def test_matches_httpx_encoding(self):
+        """Il corpo è identico a quello che httpx genera con files="""
+        photos = [make_photo("a", os.urandom(150_000)), make_photo("b", os.urandom(10))]
+        body = MultipartBody(FIELDS, photos, chunk_size=4096)
+        expected = httpx.Request(
+            "POST", "http://backend/reports",
+            data=FIELDS,
+            files=[p.as_multipart() for p in photos],
+            headers={"Content-Type": body.headers["Content-Type"]},
+        )
+        streamed = b"".join(await collect(body))
+        assert streamed == b"".join(expected.stream)
+        assert len(streamed) == body.length == int(expected.headers["Content-Length"])
+
+    @pytest.mark.asyncio
+    async def test_chunks_are_bounded_and_progress_is_reported(self):
+        """Nessun blocco supera la dimensione massima e il progresso arriva al totale"""
+        progress = []
+        body = MultipartBody(FIELDS, [make_photo("a", os.urandom(100_000))], chunk_size=8192,
+                             on_progress=lambda sent, total: progress.append((sent, total)))
+        chunks = await collect(body)
+        assert max(len(c) for c in chunks) <= 8192
+        assert len(progress) == len(chunks)
+        assert progress[-1] == (body.length, body.length)
+        assert [sent for sent, _ in progress] == sorted(sent for sent, _ in progress)
+
+    @pytest.mark.asyncio
+    async def test_body_can_be_resent(self):
+        """Il corpo può essere inviato di nuovo dopo un errore di connessione"""
+        body = MultipartBody(FIELDS, [make_photo("a", b"jpeg" * 1000)], chunk_size=1024)
+        assert b"".join(await collect(body)) == b"".join(await collect(body))
+
+    @pytest.mark.asyncio
+    async def test_spooled_photo_is_streamed(self, monkeypatch):
+        """Le foto salvate su file temporaneo vengono lette a blocchi"""
+        monkeypatch.setattr(photos_module, "PHOTO_SPOOL_THRESHOLD", 1000)
+        payload = os.urandom(50_000)
+        photo = make_photo("big", payload)
+        assert photo.spilled
+        body = MultipartBody({}, [photo], chunk_size=4096)
+        streamed = b"".join(await collect(body))
+        assert payload in streamed
+        assert len(streamed) == body.length
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_httpx_sends_content_length(self):
+        """httpx usa il Content-Length invece del chunked encoding"""
+        seen = {}
+
+        async def handler(request: httpx.Request) -> httpx.Response:
+            seen["headers"] = request.headers
+            seen["size"] = sum([len(chunk) async for chunk in request.stream])
+            return httpx.Response(201)
+
+        body = MultipartBody(FIELDS, [make_photo("a", os.urandom(70_000))])
+        async with httpx.AsyncClient(transport=httpx.MockTransport(handler)) as client:
+            response = await client.post("http://backend/reports", content=body, headers=body.headers)
+        assert response.status_code == 201
+        assert "transfer-encoding" not in seen["headers"]
+        assert int(seen["headers"]["content-length"]) == seen["size"] == body.length
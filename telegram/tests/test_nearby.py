@@ -0,0 +1,97 @@
+import random
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.nearby import ReportIndex, build_nearby_message, format_distance
+
+
+def raw_report(report_id, lat, lon, title="Buca", state="Assigned"):
+    return {
+        "id": report_id,
+        "title": title,
+        "location": {"name": "", "coordinates": {"latitude": lat, "longitude": lon}},
+        "date": "2025-01-01",
+        "category": "Roads",
+        "document": {"description": "", "photos": []},
+        "state": state,
+    }
+
+
+def random_reports(n, seed=0):
+    rng = random.Random(seed)
+    return [raw_report(i, rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77)) for i in range(n)]
+
+
+def linear_nearest(index, lat, lon, k, radius_m):
+    found = sorted(
+        (index.distance_m(lat, lon, r.lat, r.lon), r.id)
+        for r in index.reports.values()
+    )
+    return [(d, report_id) for d, report_id in found if d <= radius_m][:k]
+
+
+class TestReportIndex:
+    """Test per l'indice spaziale delle segnalazioni pubbliche"""
+
+    def test_matches_linear_scan(self):
+        """I k più vicini coincidono con una scansione lineare"""
+        index = ReportIndex(cell_m=250)
+        index.apply(random_reports(5_000))
+        rng = random.Random(1)
+        for _ in range(200):
+            lat, lon = rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77)
+            k = rng.choice((1, 5, 20))
+            radius = rng.choice((100, 500, 2_000))
+            got = [(round(d, 6), r.id) for d, r in index.nearest(lat, lon, k, radius)]
+            expected = [(round(d, 6), i) for d, i in linear_nearest(index, lat, lon, k, radius)]
+            assert got == expected
+
+    def test_radius_is_respected(self):
+        """Le segnalazioni oltre il raggio non compaiono"""
+        index = ReportIndex()
+        index.apply([raw_report(1, 45.0703, 7.6869), raw_report(2, 45.0803, 7.6869)])
+        results = index.nearest(45.0703, 7.6869, k=5, radius_m=500)
+        assert [r.id for _, r in results] == [1]
+        assert results[0][0] == pytest.approx(0)
+
+    def test_incremental_apply(self):
+        """Un nuovo elenco aggiorna, sposta e rimuove solo ciò che è cambiato"""
+        index = ReportIndex()
+        assert index.apply([raw_report(1, 45.07, 7.68), raw_report(2, 45.08, 7.69)]) == (2, 0)
+        assert index.apply([raw_report(1, 45.07, 7.68), raw_report(2, 45.08, 7.69)]) == (0, 0)
+        changed, removed = index.apply([raw_report(1, 45.10, 7.70, state="Resolved"), raw_report(3, 45.05, 7.66)])
+        assert (changed, removed) == (2, 1)
+        assert sorted(index.reports) == [1, 3]
+        assert index.reports[1].state == "Resolved"
+        # The moved report is found at its new position only
+        assert [r.id for _, r in index.nearest(45.10, 7.70, k=1, radius_m=50)] == [1]
+        assert index.nearest(45.07, 7.68, k=1, radius_m=50) == []
+        assert sum(len(bucket) for bucket in index.cells.values()) == 2
+
+    def test_reports_without_position_are_skipped(self):
+        """Le segnalazioni senza coordinate vengono ignorate"""
+        index = ReportIndex()
+        broken = raw_report(2, 0, 0)
+        broken["location"] = None
+        assert index.apply([raw_report(1, 45.07, 7.68), broken]) == (1, 0)
+        assert len(index) == 1
+
+
+class TestNearbyMessage:
+    """Test per il testo della risposta a /nearby"""
+
+    def test_format_distance(self):
+        assert format_distance(3) == "10 m"
+        assert format_distance(234) == "230 m"
+        assert format_distance(1530) == "1.5 km"
+
+    def test_message(self):
+        index = ReportIndex()
+        index.apply([raw_report(7, 45.0703, 7.6869, title="Lampione rotto")])
+        text = build_nearby_message(index.nearest(45.0703, 7.6869, k=5, radius_m=500), 500)
+        assert "#7 Lampione rotto" in text
+        assert "Roads" in text and "Assigned" in text
+        assert "No public reports" in build_nearby_message([], 500)
@@ -0,0 +1,70 @@
+import random
+import pytest
+import subprocess
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.phash_index import HashIndex, hamming
+
+
+def flip_bits(value: int, count: int, rng: random.Random) -> int:
+    for bit in rng.sample(range(64), count):
+        value ^= 1 << bit
+    return value
+
+
+class TestHashIndex:
+    """Test per l'indice degli hash delle foto recenti"""
+
+    def test_finds_near_duplicates(self):
+        """Un hash entro la distanza massima viene trovato"""
+        rng = random.Random(1)
+        index = HashIndex(capacity=100)
+        base = rng.getrandbits(64)
+        index.add(base)
+        for distance in range(7):
+            found = index.nearest(flip_bits(base, distance, rng), max_distance=6)
+            assert found is not None and found[0] == distance
+        assert index.nearest(flip_bits(base, 7, rng), max_distance=6) is None
+
+    def test_matches_linear_scan(self):
+        """Il risultato coincide con una ricerca lineare"""
+        rng = random.Random(2)
+        index = HashIndex(capacity=2000)
+        stored = [rng.getrandbits(64) for _ in range(2000)]
+        for value in stored:
+            index.add(value)
+        for _ in range(200):
+            query = flip_bits(rng.choice(stored), rng.randint(0, 7), rng)
+            best = min(hamming(query, value) for value in stored)
+            found = index.nearest(query, max_distance=7)
+            if best <= 7:
+                assert found is not None and found[0] == best
+            else:
+                assert found is None
+
+    def test_oldest_entries_are_evicted(self):
+        """Oltre la capacità gli hash più vecchi vengono dimenticati"""
+        index = HashIndex(capacity=3)
+        for value in (0x1111, 0x2222, 0x3333, 0x4444):
+            index.add(value << 32)
+        assert len(index) == 3
+        assert index.nearest(0x1111 << 32, max_distance=0) is None
+        assert index.nearest(0x4444 << 32, max_distance=0) is not None
+
+    def test_distance_limit(self):
+        """Distanze oltre 7 non sono supportate dall'indice a bande"""
+        with pytest.raises(ValueError):
+            HashIndex(capacity=10).nearest(0, max_distance=8)
+
+    def test_invalid_configuration_fails_at_startup(self):
+        """Un PHASH_NEAR_DISTANCE non supportato blocca l'avvio invece di ogni ricerca"""
+        root = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+        result = subprocess.run(
+            [sys.executable, "-c", "import Functions.phash_index"],
+            cwd=root, env={**os.environ, "PHASH_NEAR_DISTANCE": "9"}, capture_output=True, text=True,
+        )
+        assert result.returncode != 0
+        assert "PHASH_NEAR_DISTANCE" in result.stderr
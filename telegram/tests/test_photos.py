@@ -0,0 +1,160 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import imaging, photos
+from Functions.photos import PhotoBuffer, wait_for_photos, select_photo_size, needs_shrink
+from Functions.draft import ReportDraft, WAITING_CATEGORY
+
+
+class FakeTelegramFile:
+    def __init__(self, payload: bytes):
+        self.payload = payload
+
+    async def download_to_memory(self, out):
+        out.write(self.payload)
+
+
+class TestPhotoBuffer:
+    """Test per i buffer in memoria delle foto"""
+
+    @pytest.mark.asyncio
+    async def test_small_photo_stays_in_memory(self):
+        """Le foto sotto la soglia restano in memoria"""
+        photo = await PhotoBuffer("id", "a.jpg").download(FakeTelegramFile(b"x" * 100))
+        assert not photo.spilled
+        assert photo.size == 100
+        field, (name, fileobj, mime) = photo.as_multipart()
+        assert (field, name, mime) == ("photos", "a.jpg", "image/jpeg")
+        assert fileobj.read() == b"x" * 100
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_large_photo_spills(self, monkeypatch):
+        """Le foto sopra la soglia vengono spostate su file temporaneo"""
+        monkeypatch.setattr(photos, "PHOTO_SPOOL_THRESHOLD", 10)
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.write(b"12345")
+        photo.write(b"6789012345")
+        assert photo.spilled
+        assert photo.open().read() == b"123456789012345"
+        photo.close()
+
+
+class SlowPhotoSize:
+    def __init__(self, payload: bytes, delay: float = 0):
+        self.payload = payload
+        self.delay = delay
+
+    async def get_file(self):
+        await asyncio.sleep(self.delay)
+        return FakeTelegramFile(self.payload)
+
+
+class TestPhotoPrefetch:
+    """Test per il download in background delle foto"""
+
+    @pytest.mark.asyncio
+    async def test_wait_for_photos(self):
+        """Al submit si attendono i download ancora in corso"""
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.prefetch(SlowPhotoSize(b"abc", delay=0.01), shrink=False)
+        assert not photo.ready
+        assert await wait_for_photos([photo]) == [photo]
+        assert photo.open().read() == b"abc"
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_unreadable_photo_is_rejected(self):
+        """Un file che non si riesce a pulire dai metadati non viene caricato"""
+        pytest.importorskip("PIL")
+        seen = []
+
+        async def on_ready(photo):
+            seen.append(photo.closed)
+
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.prefetch(SlowPhotoSize(b"not a jpeg"), shrink=True, on_ready=on_ready)
+        assert await wait_for_photos([photo]) == []
+        assert seen == [True]
+
+    @pytest.mark.asyncio
+    async def test_documents_rejected_without_pillow(self, monkeypatch):
+        """Senza Pillow i file non ricompressi da Telegram non vengono caricati"""
+        monkeypatch.setattr(imaging, "Image", None)
+        document = PhotoBuffer("id", "a.jpg")
+        document.prefetch(SlowPhotoSize(b"\xff\xd8 with exif"), shrink=True)
+        photo = PhotoBuffer("id2", "b.jpg")
+        photo.prefetch(SlowPhotoSize(b"abc"), shrink=False)
+        assert await wait_for_photos([document, photo]) == [photo]
+        assert document.closed
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_callback_keeps_photo(self):
+        """Un errore nella risposta all'utente non scarta la foto scaricata"""
+        async def on_ready(photo):
+            raise RuntimeError("network down")
+
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.prefetch(SlowPhotoSize(b"abc"), shrink=False, on_ready=on_ready)
+        assert await wait_for_photos([photo]) == [photo]
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_timeout_drops_photo(self):
+        """Le foto non scaricate entro il timeout vengono escluse"""
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.prefetch(SlowPhotoSize(b"abc", delay=10))
+        assert await wait_for_photos([photo], timeout=0.01) == []
+        photo.close()
+
+    @pytest.mark.asyncio
+    async def test_discard_cancels_download(self):
+        """Annullare il draft interrompe i download"""
+        draft = ReportDraft()
+        photo = PhotoBuffer("id", "a.jpg")
+        photo.prefetch(SlowPhotoSize(b"abc", delay=10))
+        draft.add_photo(photo)
+        task = photo._task
+        draft.rewind(WAITING_CATEGORY)
+        await asyncio.sleep(0)
+        assert task.cancelled()
+
+
+def photo_size(side: int, file_size: int):
+    size = MagicMock()
+    size.width = side
+    size.height = side * 3 // 4
+    size.file_size = file_size
+    return size
+
+
+class TestSelectPhotoSize:
+    """Test per la scelta della variante PhotoSize"""
+
+    @pytest.fixture
+    def sizes(self):
+        return [photo_size(90, 1_000), photo_size(320, 15_000), photo_size(800, 70_000),
+                photo_size(1280, 160_000), photo_size(2560, 600_000)]
+
+    def test_smallest_meeting_resolution(self, sizes):
+        """Si sceglie la variante più piccola che raggiunge la risoluzione minima"""
+        assert select_photo_size(sizes, min_dimension=1024, max_bytes=0) is sizes[3]
+
+    def test_largest_when_none_is_big_enough(self, sizes):
+        """Se nessuna variante basta si usa la più grande"""
+        assert select_photo_size(sizes[:3], min_dimension=1024, max_bytes=0) is sizes[2]
+
+    def test_byte_budget(self, sizes):
+        """Il budget in byte fa scendere alla variante più grande che rientra"""
+        assert select_photo_size(sizes, min_dimension=2000, max_bytes=100_000) is sizes[2]
+
+    def test_needs_shrink(self, sizes):
+        """Le varianti entro il limite non vengono ricodificate"""
+        assert not needs_shrink(sizes[3])
+        assert needs_shrink(sizes[4])
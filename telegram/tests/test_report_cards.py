@@ -0,0 +1,63 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import metrics
+from Functions.report_cards import CardCache, escape_markdown, render_card
+
+
+def report(**overrides):
+    rpt = {"id": 7, "title": "Pothole", "state": "ASSIGNED", "date": "2025-01-01",
+           "document": {"description": "Deep hole"}}
+    rpt.update(overrides)
+    return rpt
+
+
+class TestEscaping:
+    """Test per l'escape del Markdown nei testi degli utenti"""
+
+    def test_special_characters(self):
+        assert escape_markdown("a_b *c* `d` [e]") == r"a\_b \*c\* \`d\` \[e]"
+
+    def test_title_is_escaped(self):
+        card = CardCache().render(report(title="snake_case *bold"), "expanded")
+        assert r"snake\_case \*bold" in card
+        assert "📢 *State:* `ASSIGNED`" in card
+
+    def test_truncation_does_not_split_escapes(self):
+        card = CardCache().render(report(document={"description": "x" * 99 + "_tail"}), "expanded")
+        assert "x" * 99 + "\\_...\n" in card
+
+    def test_compact_template(self):
+        card = CardCache().render(report(title="t" * 60), "compact")
+        assert card == "📝 *#7* · " + "t" * 40 + "... · `ASSIGNED`"
+
+
+class TestCardCache:
+    """Test per la memoizzazione delle schede"""
+
+    def test_same_version_is_memoized(self):
+        metrics.reset()
+        cache = CardCache()
+        first = cache.render(report(), "expanded")
+        assert cache.render(report(), "expanded") is first
+        assert metrics.counters["report_cards.hits"] == 1
+        assert metrics.counters["report_cards.misses"] == 1
+
+    def test_state_or_update_changes_the_card(self):
+        cache = CardCache()
+        cache.render(report(), "expanded")
+        assert "`RESOLVED`" in cache.render(report(state="RESOLVED"), "expanded")
+        changed = cache.render(report(title="Fixed", updatedAt="2025-02-01"), "expanded")
+        assert "Fixed" in changed and len(cache) == 3
+
+    def test_lru_eviction(self):
+        cache = CardCache(capacity=2)
+        for report_id in (1, 2, 3):
+            cache.render(report(id=report_id), "compact")
+        assert len(cache) == 2
+
+    def test_default_template(self):
+        assert render_card(report()).startswith("📝 *Report ID:* 7")
@@ -0,0 +1,97 @@
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.draft import (
+    ReportDraft,
+    get_draft,
+    new_draft,
+    WAITING_DESCRIPTION,
+    WAITING_CATEGORY,
+    WAITING_PHOTO,
+    WAITING_LOCATION,
+    WAITING_ANONYMOUS,
+)
+
+
+class TestReportDraft:
+    """Test per il modello ReportDraft"""
+
+    @pytest.fixture
+    def full_draft(self):
+        draft = ReportDraft()
+        draft.set_title("Buca")
+        draft.set_description("Buca enorme in mezzo alla strada, pericolosa")
+        draft.set_category("ROAD_MAINTENANCE")
+        draft.add_photo("a.jpg")
+        draft.finish_photos()
+        draft.set_location(45.07, 7.68)
+        return draft
+
+    def test_transitions_return_next_state(self):
+        """Ogni transizione restituisce lo stato successivo"""
+        draft = ReportDraft()
+        assert draft.set_title("Buca") == WAITING_DESCRIPTION
+        assert draft.set_description("x" * 30) == WAITING_CATEGORY
+        assert draft.set_category("WASTE") == WAITING_PHOTO
+        assert draft.add_photo("a.jpg") == 1
+        assert draft.finish_photos() == WAITING_LOCATION
+        assert draft.set_location(45.0, 7.6) == WAITING_ANONYMOUS
+
+    def test_set_category_resets_photos(self, full_draft):
+        """Una nuova categoria azzera le foto"""
+        full_draft.set_category("WASTE")
+        assert full_draft.photos == []
+
+    def test_rewind_to_photo_keeps_photos(self, full_draft):
+        """Tornare alle foto mantiene quelle ricevute ma rimuove la posizione"""
+        assert full_draft.rewind(WAITING_PHOTO) == WAITING_PHOTO
+        assert full_draft.photos == ["a.jpg"]
+        assert full_draft.latitude is None
+
+    def test_rewind_to_category_drops_photos(self, full_draft):
+        """Tornare alla categoria rimuove categoria e foto"""
+        full_draft.rewind(WAITING_CATEGORY)
+        assert full_draft.category is None
+        assert full_draft.photos == []
+        assert full_draft.title == "Buca"
+
+    def test_to_form(self, full_draft):
+        """Il form contiene i campi attesi da POST /reports"""
+        full_draft.anonymous = True
+        form = full_draft.to_form()
+        assert form["latitude"] == "45.07"
+        assert form["anonymity"] == "1"
+        assert form["category"] == "ROAD_MAINTENANCE"
+
+    def test_address_in_form(self, full_draft):
+        """L'indirizzo viene inviato solo se noto"""
+        assert "address" not in full_draft.to_form()
+        full_draft.set_location(45.07, 7.68, "Via Roma 12, Centro")
+        assert full_draft.to_form()["address"] == "Via Roma 12, Centro"
+        full_draft.rewind(WAITING_LOCATION)
+        assert full_draft.address is None
+
+    def test_serialization_roundtrip(self, full_draft):
+        """dumps/loads preserva tutti i campi"""
+        full_draft.photo_location = (45.07, 7.68)
+        restored = ReportDraft.loads(full_draft.dumps())
+        assert restored.photo_location == (45.07, 7.68)
+        assert restored.title == full_draft.title
+        assert restored.photos == full_draft.photos
+        assert restored.step == full_draft.step
+        assert restored.longitude == full_draft.longitude
+
+    def test_loads_rejects_unknown_version(self):
+        """Versioni sconosciute vengono rifiutate"""
+        with pytest.raises(ValueError):
+            ReportDraft.loads(b"[99]")
+
+    def test_get_draft_creates_when_missing(self):
+        """get_draft crea un draft se manca"""
+        user_data = {}
+        draft = get_draft(user_data)
+        assert user_data["draft"] is draft
+        assert new_draft(user_data) is not draft
@@ -0,0 +1,142 @@
+import asyncio
+import io
+import pytest
+import sys
+import os
+from array import array
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from PIL import Image
+
+from Functions import imaging
+from Functions.nearby import ReportIndex
+from Functions.report_map import MapCache, MapEntry, area, cluster_points, city_bbox, render_map, _Projection
+
+
+def index_with(points):
+    index = ReportIndex()
+    index.apply([
+        {"id": i, "location": {"coordinates": {"latitude": lat, "longitude": lon}}}
+        for i, (lat, lon) in enumerate(points)
+    ])
+    return index
+
+
+@pytest.fixture
+def inline_pool(monkeypatch):
+    """Rendering runs inline instead of in the process pool"""
+    calls = []
+
+    async def run_inline(func, *args):
+        calls.append(func)
+        await asyncio.sleep(0)
+        return func(*args)
+
+    monkeypatch.setattr(imaging, "run_in_pool", run_inline)
+    return calls
+
+
+class TestClustering:
+    """Test per il raggruppamento a griglia"""
+
+    def test_counts_and_centroids(self):
+        bbox = (45.0, 7.6, 45.1, 7.7)
+        projection = _Projection(bbox, 800)
+        points = array("d", [45.05, 7.65, 45.0501, 7.6501, 45.09, 7.61, 46.0, 8.0])
+        clusters = cluster_points(points, projection, 48)
+        assert sorted(n for _, _, n in clusters) == [1, 2]
+        x, y, _ = max(clusters, key=lambda c: c[2])
+        ex, ey = projection(45.05005, 7.65005)
+        assert x == pytest.approx(ex) and y == pytest.approx(ey)
+
+    def test_render_png(self):
+        bbox = area()
+        png = render_map(array("d", [45.07, 7.68, 45.0701, 7.6801]), bbox, size=400)
+        with Image.open(io.BytesIO(png)) as img:
+            assert img.format == "PNG"
+            assert max(img.size) == 400
+
+
+class TestArea:
+    """Test per le aree della mappa"""
+
+    def test_zoom_zero_is_the_city(self):
+        min_lat, min_lon, max_lat, max_lon = area()
+        c_min_lat, c_min_lon, c_max_lat, c_max_lon = city_bbox()
+        assert (min_lat, min_lon) == pytest.approx((c_min_lat, c_min_lon), abs=1e-6)
+        assert (max_lat, max_lon) == pytest.approx((c_max_lat, c_max_lon), abs=1e-6)
+
+    def test_close_requests_share_the_area(self):
+        """Richieste vicine allo stesso zoom usano la stessa area (e la stessa cache)"""
+        assert area((45.0703, 7.6869), 3) == area((45.0706, 7.6872), 3)
+        min_lat, _, max_lat, _ = area((45.0703, 7.6869), 3)
+        assert min_lat < 45.0703 < max_lat
+
+
+class TestMapCache:
+    """Test per la cache LRU delle mappe"""
+
+    def test_lru_eviction(self):
+        cache = MapCache(capacity=2)
+        for key in ("a", "b"):
+            cache.put(key, MapEntry(b"png", 0))
+        cache.get("a")
+        cache.put("c", MapEntry(b"png", 0))
+        assert cache.get("b") is None
+        assert cache.get("a") is not None and cache.get("c") is not None
+
+    @pytest.mark.asyncio
+    async def test_render_once_per_version(self, inline_pool):
+        """Stessa area e stessa versione: una sola renderizzazione, anche in parallelo"""
+        cache = MapCache()
+        index = index_with([(45.07, 7.68), (45.071, 7.681)])
+        bbox = area()
+        first, second = await asyncio.gather(
+            cache.get_or_render(index, bbox, 0), cache.get_or_render(index, bbox, 0)
+        )
+        assert first is second
+        assert first.reports == 2
+        assert len(inline_pool) == 1
+        first.file_id = "telegram-file-id"
+        assert (await cache.get_or_render(index, bbox, 0)).file_id == "telegram-file-id"
+
+        # New data: a new image without the old file_id
+        index.apply([{"id": 9, "location": {"coordinates": {"latitude": 45.07, "longitude": 7.68}}}])
+        updated = await cache.get_or_render(index, bbox, 0)
+        assert updated.file_id is None and updated.reports == 1
+        assert len(inline_pool) == 2
+
+    @pytest.mark.asyncio
+    async def test_failed_render_is_not_cached(self, monkeypatch):
+        async def failing(func, *args):
+            raise RuntimeError("pool broken")
+
+        monkeypatch.setattr(imaging, "run_in_pool", failing)
+        cache = MapCache()
+        with pytest.raises(RuntimeError):
+            await cache.get_or_render(index_with([]), area(), 0)
+        assert len(cache) == 0
+
+    @pytest.mark.asyncio
+    async def test_cancelled_render_cancels_waiters(self, monkeypatch):
+        """Se la renderizzazione viene annullata, chi la attende riceve un annullamento"""
+        started = asyncio.Event()
+
+        async def slow(func, *args):
+            started.set()
+            await asyncio.sleep(10)
+
+        monkeypatch.setattr(imaging, "run_in_pool", slow)
+        cache = MapCache()
+        index = index_with([])
+        render = asyncio.create_task(cache.get_or_render(index, area(), 0))
+        await started.wait()
+        waiter = asyncio.create_task(cache.get_or_render(index, area(), 0))
+        await asyncio.sleep(0)
+        (shared,) = cache._pending.values()
+        render.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        assert shared.cancelled()
+        assert len(cache) == 0
@@ -0,0 +1,204 @@
+import asyncio
+import pytest
+import sys
+import os
+import time
+from unittest.mock import AsyncMock, MagicMock
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import metrics, notifications, start
+from Functions.report_pages import (
+    PageFetchError, ReportListCache, ReportPager, build_page_keyboard, build_page_text, report_lists,
+)
+
+REPORTS = [{"id": i, "title": f"Report {i}", "state": "ASSIGNED"} for i in range(1, 13)]
+
+
+def paged_backend(reports=REPORTS, delay=0.0):
+    """Backend che rispetta page/limit e registra le pagine richieste"""
+    calls = []
+
+    async def fetch(page, limit):
+        calls.append(page)
+        await asyncio.sleep(delay)
+        return {"reports": reports[page * limit:(page + 1) * limit], "page": page, "limit": limit, "total": len(reports)}
+
+    return fetch, calls
+
+
+def callbacks(keyboard):
+    return [button.callback_data for row in keyboard.inline_keyboard for button in row]
+
+
+class TestReportPager:
+    """Test per il caricamento pigro delle pagine di segnalazioni"""
+
+    @pytest.mark.asyncio
+    async def test_pages_are_fetched_lazily(self):
+        fetch, calls = paged_backend()
+        pager = ReportPager(fetch, page_size=5)
+        number, reports = await pager.page(0)
+        assert number == 0 and [r["id"] for r in reports] == [1, 2, 3, 4, 5]
+        assert pager.total == 12 and pager.page_count == 3
+        assert calls == [0]
+
+    @pytest.mark.asyncio
+    async def test_prefetch_neighbours(self):
+        """La pagina successiva è già pronta quando l'utente preme ▶"""
+        metrics.reset()
+        fetch, calls = paged_backend()
+        pager = ReportPager(fetch, page_size=5)
+        await pager.page(0)
+        pager.prefetch(0)
+        await asyncio.sleep(0.01)
+        assert calls == [0, 1]
+        _, reports = await pager.page(1)
+        assert reports[0]["id"] == 6
+        assert calls == [0, 1]
+        assert metrics.counters["report_pages.hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_concurrent_requests_share_a_fetch(self):
+        fetch, calls = paged_backend(delay=0.01)
+        pager = ReportPager(fetch, page_size=5)
+        await pager.page(0)
+        pager.prefetch(0)
+        await pager.page(1)
+        assert calls == [0, 1]
+
+    @pytest.mark.asyncio
+    async def test_full_list_is_sliced_locally(self):
+        """Un backend senza paginazione restituisce tutto: si divide in locale"""
+        calls = []
+
+        async def fetch(page, limit):
+            calls.append(page)
+            return REPORTS
+
+        pager = ReportPager(fetch, page_size=5)
+        await pager.page(0)
+        number, reports = await pager.page(2)
+        assert number == 2 and [r["id"] for r in reports] == [11, 12]
+        pager.prefetch(2)
+        assert calls == [0]
+
+    @pytest.mark.asyncio
+    async def test_page_past_the_end(self):
+        """Un bottone vecchio oltre la fine mostra l'ultima pagina"""
+        fetch, calls = paged_backend()
+        pager = ReportPager(fetch, page_size=5)
+        number, reports = await pager.page(7)
+        assert number == 2 and [r["id"] for r in reports] == [11, 12]
+
+    @pytest.mark.asyncio
+    async def test_failed_fetch_is_retried(self):
+        attempts = []
+
+        async def fetch(page, limit):
+            attempts.append(page)
+            if len(attempts) == 1:
+                raise PageFetchError(500, "boom")
+            return {"reports": [], "total": 0}
+
+        pager = ReportPager(fetch)
+        with pytest.raises(PageFetchError):
+            await pager.page(0)
+        assert await pager.page(0) == (0, [])
+
+
+class TestReportPageMessage:
+    """Test per il testo e la tastiera del browser"""
+
+    @pytest.mark.asyncio
+    async def test_navigation_buttons(self):
+        fetch, _ = paged_backend()
+        pager = ReportPager(fetch, page_size=5)
+        _, first = await pager.page(0)
+        assert "reports_page_1" in callbacks(build_page_keyboard(pager, 0, first))
+        assert not any(c.startswith("reports_page_-") for c in callbacks(build_page_keyboard(pager, 0, first)))
+        number, last = await pager.page(2)
+        data = callbacks(build_page_keyboard(pager, number, last))
+        assert "reports_page_1" in data and "reports_page_3" not in data
+        assert "stop_follow_12" in data
+
+    @pytest.mark.asyncio
+    async def test_single_page_has_no_navigation(self):
+        fetch, _ = paged_backend(REPORTS[:2])
+        pager = ReportPager(fetch, page_size=5)
+        _, reports = await pager.page(0)
+        assert not any(c.startswith("reports_page_") for c in callbacks(build_page_keyboard(pager, 0, reports)))
+        text = build_page_text(pager, 0, reports, lambda r: r["title"])
+        assert text.startswith("📊 Your reports 1-2 of 2:")
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.text = ""
+
+    def json(self):
+        return self._payload
+
+
+def make_update(chat_id, data="view_reports"):
+    update = MagicMock()
+    update.effective_chat.id = chat_id
+    update.callback_query.data = data
+    update.callback_query.answer = AsyncMock()
+    update.callback_query.edit_message_text = AsyncMock()
+    update.callback_query.message.reply_text = AsyncMock()
+    return update
+
+
+class TestReportListCache:
+    """Test per la cache per chat delle liste di segnalazioni"""
+
+    def test_hits_misses_and_ttl(self, monkeypatch):
+        metrics.reset()
+        now = [100.0]
+        monkeypatch.setattr(time, "monotonic", lambda: now[0])
+        cache = ReportListCache(ttl=60)
+        pager = ReportPager(paged_backend()[0])
+        assert cache.get(1) is None
+        cache.put(1, pager)
+        assert cache.get(1) is pager
+        now[0] += 61
+        assert cache.get(1) is None
+        assert metrics.counters["report_lists.hits"] == 1
+        assert metrics.counters["report_lists.misses"] == 2
+        assert metrics.counters["report_lists.expired"] == 1
+
+    def test_invalidate_and_eviction(self):
+        cache = ReportListCache(max_entries=2)
+        for chat_id in (1, 2, 3):
+            cache.put(chat_id, ReportPager(paged_backend()[0]))
+        assert cache.get(1) is None and len(cache) == 2
+        cache.invalidate(2)
+        assert cache.get(2) is None and cache.get(3) is not None
+
+    @pytest.mark.asyncio
+    async def test_view_uses_cache_until_follow(self, monkeypatch):
+        """La lista viene riscaricata solo dopo un follow"""
+        calls = []
+
+        async def fake_request(method, url, **kwargs):
+            calls.append((method, url))
+            if method == "GET":
+                return FakeResponse(payload={"reports": REPORTS[:2], "total": 2})
+            return FakeResponse(201)
+
+        monkeypatch.setattr(start, "_httpx_with_retry", fake_request)
+        report_lists.clear()
+        start.sessions[77] = "token"
+        context = MagicMock()
+        await notifications.handle_view_reports(make_update(77), context)
+        await notifications.handle_view_reports(make_update(77), context)
+        assert sum(1 for method, _ in calls if method == "GET") == 1
+
+        await notifications.handle_follow_report(make_update(77, "start_follow_1"), context)
+        await notifications.handle_view_reports(make_update(77), context)
+        assert sum(1 for method, _ in calls if method == "GET") == 2
+        start.sessions.clear()
+        report_lists.clear()
@@ -0,0 +1,120 @@
+import math
+import random
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.reverse_geocoder import ReverseGeocoder, build_index, ensure_index
+
+
+@pytest.fixture(scope="module")
+def addresses():
+    rng = random.Random(0)
+    rows = [("Via Roma", "12", 45.0682, 7.6831, "Centro"), ("Via Roma", "12/A", 45.0683, 7.6832, "Centro")]
+    for i in range(2_000):
+        rows.append((f"Via Test {i % 50}", str(i), rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77), ""))
+    return rows
+
+
+@pytest.fixture(scope="module")
+def index_path(tmp_path_factory, addresses):
+    directory = tmp_path_factory.mktemp("reverse")
+    gazetteer = directory / "addresses.csv"
+    lines = ["street,number,latitude,longitude,district"]
+    lines += [f"{s},{n},{lat},{lon},{d}" for s, n, lat, lon, d in addresses]
+    gazetteer.write_text("\n".join(lines), encoding="utf-8")
+    path = str(directory / "reverse.idx")
+    assert build_index(str(gazetteer), path, cell_m=50) == len(addresses)
+    return path
+
+
+def distance_m(lat1, lon1, lat2, lon2):
+    dy = (lat2 - lat1) * 111_320.0
+    dx = (lon2 - lon1) * 111_320.0 * math.cos(math.radians(45.0))
+    return math.hypot(dx, dy)
+
+
+class TestReverseGeocoder:
+    """Test per il reverse geocoding su indice mappato in memoria"""
+
+    def test_label_with_district(self, index_path):
+        reverse = ReverseGeocoder(index_path)
+        label, distance = reverse.nearest(45.06821, 7.68311)
+        assert label == "Via Roma 12, Centro"
+        assert distance < 2
+        assert reverse.nearest(45.06831, 7.68321)[0] == "Via Roma 12/A, Centro"
+        reverse.close()
+
+    def test_matches_linear_scan(self, index_path, addresses):
+        """Il civico trovato è il più vicino, come con una scansione lineare"""
+        reverse = ReverseGeocoder(index_path)
+        rng = random.Random(1)
+        for _ in range(300):
+            lat, lon = rng.uniform(45.00, 45.14), rng.uniform(7.58, 7.77)
+            found = reverse.nearest(lat, lon, max_distance_m=2_000)
+            closest = min(addresses, key=lambda a: distance_m(lat, lon, a[2], a[3]))
+            expected = distance_m(lat, lon, closest[2], closest[3])
+            if expected > 2_000:
+                assert found is None
+            else:
+                assert found is not None
+                # Same distance up to the micro-degree rounding of the index
+                assert found[1] == pytest.approx(expected, abs=0.5)
+        reverse.close()
+
+    def test_accept_filters_points(self, index_path):
+        """Con un confine si ignorano i civici fuori dalla città del tenant"""
+        reverse = ReverseGeocoder(index_path)
+        label, _ = reverse.nearest(45.06831, 7.68321, accept=lambda lat, lon: lat < 45.06825)
+        assert label == "Via Roma 12, Centro"
+        assert reverse.nearest(45.06831, 7.68321, accept=lambda lat, lon: False) is None
+        reverse.close()
+
+    def test_too_far(self, index_path):
+        reverse = ReverseGeocoder(index_path)
+        assert reverse.nearest(41.9028, 12.4964) is None
+        # South of every address: nothing within 100 m
+        assert reverse.nearest(44.99, 7.68, max_distance_m=100) is None
+        reverse.close()
+
+    def test_ensure_index_rebuilds_when_stale(self, tmp_path):
+        gazetteer = tmp_path / "addresses.csv"
+        gazetteer.write_text("street,number,latitude,longitude\nVia Po,1,45.07,7.69\n", encoding="utf-8")
+        path = str(tmp_path / "reverse.idx")
+        assert ensure_index(str(gazetteer), path)
+        assert ReverseGeocoder(path).nearest(45.07, 7.69)[0] == "Via Po 1"
+        gazetteer.write_text("street,number,latitude,longitude\nVia Po,3,45.07,7.69\n", encoding="utf-8")
+        os.utime(gazetteer, (os.path.getmtime(path) + 10, os.path.getmtime(path) + 10))
+        assert ensure_index(str(gazetteer), path)
+        assert ReverseGeocoder(path).nearest(45.07, 7.69)[0] == "Via Po 3"
+        assert not ensure_index(str(tmp_path / "missing.csv"), path)
+
+    def test_ensure_index_rebuilds_older_copy(self, tmp_path):
+        gazetteer = tmp_path / "addresses.csv"
+        gazetteer.write_text("street,number,latitude,longitude\nVia Po,1,45.07,7.69\n", encoding="utf-8")
+        path = str(tmp_path / "reverse.idx")
+        assert ensure_index(str(gazetteer), path)
+        # Same size, copied in with its original, older, mtime
+        gazetteer.write_text("street,number,latitude,longitude\nVia Po,3,45.07,7.69\n", encoding="utf-8")
+        os.utime(gazetteer, (os.path.getmtime(path) - 3600, os.path.getmtime(path) - 3600))
+        assert ensure_index(str(gazetteer), path)
+        assert ReverseGeocoder(path).nearest(45.07, 7.69)[0] == "Via Po 3"
+
+    def test_ensure_index_rebuilds_for_other_source(self, tmp_path):
+        gazetteer = tmp_path / "addresses.csv"
+        gazetteer.write_text("street,number,latitude,longitude\nVia Po,1,45.07,7.69\n", encoding="utf-8")
+        path = str(tmp_path / "reverse.idx")
+        assert ensure_index(str(gazetteer), path, cell_m=50)
+        built = os.stat(path).st_mtime_ns
+        assert ensure_index(str(gazetteer), path, cell_m=50)
+        assert os.stat(path).st_mtime_ns == built
+        assert ensure_index(str(gazetteer), path, cell_m=80)
+        assert ReverseGeocoder(path).cell_m == pytest.approx(80)
+        other = tmp_path / "other.csv"
+        other.write_text("street,number,latitude,longitude\nVia Po,5,45.07,7.69\n", encoding="utf-8")
+        os.utime(other, (os.path.getmtime(path) - 3600, os.path.getmtime(path) - 3600))
+        assert ensure_index(str(other), path, cell_m=80)
+        assert ReverseGeocoder(path).source[0] == str(other)
+        assert ReverseGeocoder(path).nearest(45.07, 7.69)[0] == "Via Po 5"
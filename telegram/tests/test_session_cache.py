@@ -0,0 +1,93 @@
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions.session_cache import SessionCache
+from Functions import login, start
+
+
+class TestSessionCache:
+    """Test per la cache limitata delle sessioni"""
+
+    def test_lru_eviction(self):
+        """Oltre la capacità viene rimossa la chat usata meno di recente"""
+        cache = SessionCache(max_entries=2)
+        cache[1] = "a"
+        cache[2] = "b"
+        assert cache.get(1) == "a"
+        cache[3] = "c"
+        assert 2 not in cache
+        assert 1 in cache and 3 in cache
+        assert len(cache) == 2
+
+    def test_idle_eviction(self):
+        """Le sessioni inattive oltre il TTL scadono"""
+        cache = SessionCache(max_entries=10, idle_ttl=0)
+        cache[1] = "a"
+        assert cache.get(1) is None
+
+    def test_logout_is_remembered(self):
+        """Il logout esplicito viene ricordato fino al prossimo login"""
+        cache = SessionCache()
+        cache[1] = "a"
+        assert cache.logout(1) == "a"
+        assert cache.is_logged_out(1)
+        cache[1] = "b"
+        assert not cache.is_logged_out(1)
+
+    def test_logged_out_chats_are_bounded(self):
+        """Solo gli ultimi logout vengono ricordati"""
+        cache = SessionCache(max_logged_out=2)
+        for chat_id in (1, 2, 3):
+            cache.logout(chat_id)
+        assert cache.logged_out_ids() == [2, 3]
+
+
+class TestEnsureSession:
+    """Test per la ri-autenticazione trasparente"""
+
+    @pytest.fixture
+    def mock_update(self):
+        update = MagicMock()
+        update.effective_chat.id = 42
+        update.effective_user.username = "testuser"
+        return update
+
+    @pytest.mark.asyncio
+    async def test_reauth_on_miss(self, mock_update):
+        """Una chat rimossa dalla cache viene ri-autenticata"""
+        response = MagicMock(status_code=200)
+        response.json.return_value = "new_token"
+        login.sessions.pop(42)
+        with patch.object(start, "_httpx_with_retry", AsyncMock(return_value=response)) as mock_post:
+            assert await login.ensure_session(mock_update) == "new_token"
+            assert await login.ensure_session(mock_update) == "new_token"
+        mock_post.assert_called_once()
+        assert mock_post.call_args.kwargs["json"] == {"username": "testuser", "chatId": 42}
+
+    @pytest.mark.asyncio
+    async def test_no_reauth_after_logout(self, mock_update):
+        """Dopo /logout non si ri-autentica automaticamente"""
+        login.sessions[42] = "token"
+        login.sessions.logout(42)
+        with patch.object(start, "_httpx_with_retry", AsyncMock()) as mock_post:
+            assert await login.ensure_session(mock_update) is None
+        mock_post.assert_not_called()
+
+    @pytest.mark.asyncio
+    async def test_logout_after_eviction(self, mock_update):
+        """/logout vale anche per una sessione già rimossa dalla cache"""
+        mock_update.message.reply_text = AsyncMock()
+        login.sessions[42] = "token"
+        # Evicted by the LRU or the idle TTL
+        login.sessions.pop(42)
+        await login.logout(mock_update, MagicMock())
+        assert "Logged out" in mock_update.message.reply_text.call_args.args[0]
+        with patch.object(start, "_httpx_with_retry", AsyncMock()) as mock_post:
+            assert await login.ensure_session(mock_update) is None
+        mock_post.assert_not_called()
+        await login.logout(mock_update, MagicMock())
+        assert "not logged in" in mock_update.message.reply_text.call_args.args[0]
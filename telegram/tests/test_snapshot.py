@@ -0,0 +1,94 @@
+import pytest
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import snapshot, endpoint, start, tenants
+
+
+class TestSnapshot:
+    """Test per lo snapshot di avvio a caldo"""
+
+    @pytest.fixture(autouse=True)
+    def clean_state(self):
+        endpoint.set_categories([])
+        start.sessions.clear()
+        start.file_ids.clear()
+        tenants.default().faq_cache.update(items=None, fetched_at=0.0)
+        yield
+        endpoint.set_categories([])
+        start.sessions.clear()
+        start.file_ids.clear()
+        tenants.chats.clear()
+
+    def test_roundtrip(self, tmp_path):
+        """Lo stato salvato viene ripristinato al riavvio"""
+        path = str(tmp_path / "bot.snapshot")
+        endpoint.set_categories(["WASTE", "ROAD_MAINTENANCE"])
+        start.sessions[1] = "token-1"
+        start.sessions[2] = "token-2"
+        start.sessions.logout(2)
+        start.file_ids["start_sticker"] = "CAACAgQ"
+        tenants.default().faq_cache.update(items=[{"question": "Q", "answer": "A"}], fetched_at=time.time())
+        snapshot.save(path)
+        assert oct(os.stat(path).st_mode & 0o777) == "0o600"
+
+        endpoint.set_categories([])
+        start.sessions.clear()
+        start.file_ids.clear()
+        tenants.default().faq_cache.update(items=None, fetched_at=0.0)
+
+        assert snapshot.load(path)
+        assert tenants.default().categories == ["WASTE", "ROAD_MAINTENANCE"]
+        assert endpoint.build_category_keyboard().inline_keyboard[1][0].callback_data == "category_1"
+        assert start.sessions.get(1) == "token-1"
+        assert start.sessions.is_logged_out(2)
+        assert start.file_ids["start_sticker"] == "CAACAgQ"
+        assert tenants.default().faq_cache["items"][0]["answer"] == "A"
+
+    def test_corrupt_snapshot_is_ignored(self, tmp_path):
+        """Uno snapshot corrotto viene ignorato"""
+        path = tmp_path / "bot.snapshot"
+        data = bytearray(snapshot.encode(snapshot.collect_state()))
+        data[-1] ^= 0xFF
+        path.write_bytes(bytes(data))
+        assert not snapshot.load(str(path))
+
+    def test_missing_snapshot(self, tmp_path):
+        """Senza file si parte a freddo"""
+        assert not snapshot.load(str(tmp_path / "missing"))
+
+    def test_sessions_keep_their_idle_time(self, tmp_path):
+        """Le sessioni ripristinate conservano il tempo di inattività"""
+        path = str(tmp_path / "bot.snapshot")
+        start.sessions.restore(1, "token-1", 3600)
+        start.sessions[2] = "token-2"
+        snapshot.save(path)
+        start.sessions.clear()
+
+        assert snapshot.load(path)
+        idle = {chat_id: idle_s for chat_id, _, idle_s in start.sessions.entries()}
+        assert idle[1] >= 3600
+        assert idle[2] < 60
+        # Least recently used still first
+        assert [chat_id for chat_id, _, _ in start.sessions.entries()] == [1, 2]
+
+    def test_downtime_counts_as_idle(self):
+        """Il tempo a bot spento conta come inattività"""
+        start.sessions[1] = "token-1"
+        state = snapshot.collect_state()
+        state["saved_at"] -= start.sessions.idle_ttl + 1
+        start.sessions.clear()
+
+        snapshot.apply_state(state)
+        assert start.sessions.get(1) is None
+
+    def test_reads_previous_version(self):
+        """Gli snapshot della versione precedente restano leggibili"""
+        state = {"saved_at": time.time(), "sessions": [[1, "token-1"]]}
+        raw = bytearray(snapshot.encode(state))
+        raw[4:6] = (2).to_bytes(2, "little")
+        snapshot.apply_state(snapshot.decode(bytes(raw)))
+        assert start.sessions.get(1) == "token-1"
@@ -0,0 +1,96 @@
+import os
+import subprocess
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import photos, spool
+from Functions.photos import PhotoBuffer
+from Functions.spool import SpoolManager, SpoolQuotaExceeded
+
+
+@pytest.fixture
+def manager(tmp_path, monkeypatch):
+    manager = SpoolManager(str(tmp_path), max_bytes=1000, chat_max_bytes=600, max_age=3600)
+    monkeypatch.setattr(spool, "photo_spool", manager)
+    monkeypatch.setattr(photos, "PHOTO_SPOOL_THRESHOLD", 100)
+    return manager
+
+
+def dead_pid() -> int:
+    process = subprocess.Popen([sys.executable, "-c", "pass"])
+    process.wait()
+    return process.pid
+
+
+class TestSpoolManager:
+    """Test per lo spool delle foto su file"""
+
+    def test_spilled_photo_is_accounted_and_released(self, manager, tmp_path):
+        """Le foto su file contano nella quota e vengono rimosse alla chiusura"""
+        photo = PhotoBuffer("id", "a.jpg", chat_id=7)
+        photo.write(b"x" * 150)
+        assert photo.spilled
+        assert manager.total_bytes == 150
+        assert len(os.listdir(tmp_path)) == 1
+        photo.close()
+        assert manager.total_bytes == 0
+        assert os.listdir(tmp_path) == []
+
+    def test_per_chat_quota(self, manager):
+        """Una chat non può superare la propria quota"""
+        photo = PhotoBuffer("id", "a.jpg", chat_id=7)
+        photo.write(b"x" * 500)
+        with pytest.raises(SpoolQuotaExceeded):
+            photo.write(b"x" * 200)
+        assert manager.has_room(8, 500)
+        assert not manager.has_room(7, 200)
+        photo.close()
+
+    def test_global_quota(self, manager):
+        """Lo spool non supera la quota globale"""
+        first = PhotoBuffer("a", "a.jpg", chat_id=1)
+        first.write(b"x" * 600)
+        second = PhotoBuffer("b", "b.jpg", chat_id=2)
+        with pytest.raises(SpoolQuotaExceeded):
+            second.write(b"x" * 500)
+        assert manager.total_bytes == 600
+        first.close()
+        second.close()
+
+    def test_orphans_are_removed(self, manager, tmp_path):
+        """All'avvio si rimuovono i file di processi terminati e non registrati"""
+        own = tmp_path / f"{os.getpid()}-1-aaaa.part"
+        dead = tmp_path / f"{dead_pid()}-1-bbbb.part"
+        alive = tmp_path / f"{os.getppid()}-1-cccc.part"
+        other = tmp_path / "notes.txt"
+        for path in (own, dead, alive, other):
+            path.write_bytes(b"x")
+        photo = PhotoBuffer("id", "a.jpg", chat_id=1)
+        photo.write(b"x" * 150)
+
+        assert manager.scan_orphans() == 2
+        assert sorted(os.listdir(tmp_path)) == sorted([alive.name, other.name, os.path.basename(photo._spool.path)])
+        photo.close()
+
+    def test_sweep_expires_abandoned_photos(self, manager, tmp_path):
+        """Le foto delle bozze abbandonate vengono liberate"""
+        photo = PhotoBuffer("id", "a.jpg", chat_id=1)
+        photo.write(b"x" * 150)
+        photo._spool.created_at = time.monotonic() - 7200
+        assert manager.sweep() == 1
+        assert photo.closed
+        assert not photo.ready
+        assert manager.total_bytes == 0
+        assert os.listdir(tmp_path) == []
+
+    def test_sweep_releases_files_of_lost_buffers(self, manager, tmp_path):
+        """I file di buffer non più referenziati vengono rimossi"""
+        photo = PhotoBuffer("id", "a.jpg", chat_id=1)
+        photo.write(b"x" * 150)
+        del photo
+        assert manager.sweep() == 1
+        assert os.listdir(tmp_path) == []
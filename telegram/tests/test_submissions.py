@@ -0,0 +1,220 @@
+import asyncio
+import pytest
+import sys
+import os
+from unittest.mock import AsyncMock, MagicMock, patch
+
+import httpx
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import submissions, endpoint, start
+from Functions.chatlock import ChatLockUpdateProcessor, LocalLeaseStore
+from Functions.draft import new_draft, WAITING_ANONYMOUS
+from Functions.photos import PhotoBuffer
+from telegram import Update
+from telegram.ext import ConversationHandler
+
+
+class TestSubmissionRegistry:
+    """Test per il registro degli invii in corso"""
+
+    def test_duplicate_begin_is_rejected(self):
+        """Lo stesso draft non può essere inviato due volte in parallelo"""
+        assert submissions.begin(1, "k1")
+        assert not submissions.begin(1, "k1")
+        submissions.finish(1, "k1", sent=True)
+        assert submissions.begin(1, "k1")
+        submissions.finish(1, "k1", sent=False)
+
+    def test_recently_sent(self):
+        """Dopo l'invio la chat ricorda l'ultimo draft inviato"""
+        submissions.begin(2, "k2")
+        assert submissions.is_in_flight(2)
+        submissions.finish(2, "k2", sent=True)
+        assert not submissions.is_in_flight(2)
+        assert submissions.recently_sent(2) == "k2"
+
+
+class TestReceiveAnonymousGuard:
+    """Test per la protezione dal doppio invio del report"""
+
+    @pytest.fixture
+    def mock_update(self):
+        update = MagicMock()
+        update.effective_chat.id = 99
+        update.callback_query.data = "anonymous_yes"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        update.callback_query.message.reply_text = AsyncMock()
+        return update
+
+    @pytest.mark.asyncio
+    async def test_repeated_tap_is_ignored(self, mock_update):
+        """Un secondo tap durante l'invio non genera un nuovo upload"""
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        submissions.begin(99, draft.idempotency_key)
+        with patch.object(start, "_httpx_with_retry", AsyncMock()) as mock_post:
+            result = await endpoint.receive_anonymous(mock_update, context)
+        assert result == WAITING_ANONYMOUS
+        mock_post.assert_not_called()
+        mock_update.callback_query.answer.assert_called_once_with("⏳ Already sending your report…")
+        submissions.finish(99, draft.idempotency_key, sent=False)
+
+    @pytest.mark.asyncio
+    async def test_idempotency_key_is_sent(self, mock_update):
+        """La chiave di idempotenza del draft viene inviata con POST /reports"""
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        response = MagicMock(status_code=201)
+        with patch.object(start, "_httpx_with_retry", AsyncMock(return_value=response)) as mock_post, \
+                patch.object(endpoint, "ensure_session", AsyncMock(return_value="token")):
+            result = await endpoint.receive_anonymous(mock_update, context)
+        assert result == ConversationHandler.END
+        assert mock_post.call_args.kwargs["headers"]["Idempotency-Key"] == draft.idempotency_key
+        assert submissions.recently_sent(99) == draft.idempotency_key
+
+    @pytest.mark.asyncio
+    async def test_repeated_tap_through_chat_lock(self):
+        """Il secondo tap riceve subito la risposta anche con il lock per chat"""
+        def tap():
+            update = MagicMock(spec=Update)
+            update.update_id = 1
+            update.effective_chat = MagicMock(id=98)
+            update.callback_query = MagicMock(data="anonymous_no")
+            update.callback_query.answer = AsyncMock()
+            update.callback_query.edit_message_text = AsyncMock()
+            update.callback_query.message.reply_text = AsyncMock()
+            return update
+
+        upload_done = asyncio.Event()
+
+        async def slow_post(*args, **kwargs):
+            await upload_done.wait()
+            return MagicMock(status_code=201)
+
+        context = MagicMock()
+        context.user_data = {}
+        new_draft(context.user_data)
+        processor = ChatLockUpdateProcessor(store=LocalLeaseStore(), bypass=endpoint.answer_in_flight_tap)
+        first, second = tap(), tap()
+        with patch.object(start, "_httpx_with_retry", AsyncMock(side_effect=slow_post)) as mock_post, \
+                patch.object(endpoint, "ensure_session", AsyncMock(return_value="token")):
+            upload = asyncio.create_task(processor.process_update(first, endpoint.receive_anonymous(first, context)))
+            await asyncio.sleep(0.01)
+            await asyncio.wait_for(
+                processor.process_update(second, endpoint.receive_anonymous(second, context)), timeout=1
+            )
+            # Answered while the first upload is still running
+            second.callback_query.answer.assert_called_once_with("⏳ Already sending your report…")
+            assert not upload.done()
+            upload_done.set()
+            await upload
+        assert mock_post.call_count == 1
+
+    @pytest.mark.asyncio
+    async def test_failure_before_upload_finishes_submission(self, mock_update):
+        """Un errore prima dell'upload non lascia il draft in invio"""
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        with patch.object(endpoint, "ensure_session", AsyncMock(side_effect=RuntimeError("boom"))):
+            with pytest.raises(RuntimeError):
+                await endpoint.receive_anonymous(mock_update, context)
+        assert not submissions.is_in_flight(99)
+        assert context.user_data == {}
+        assert submissions.begin(99, draft.idempotency_key)
+        submissions.finish(99, draft.idempotency_key, sent=False)
+
+    @pytest.mark.asyncio
+    async def test_no_session_is_not_uploaded(self, mock_update):
+        """Senza sessione il report non viene inviato"""
+        context = MagicMock()
+        context.user_data = {}
+        new_draft(context.user_data)
+        with patch.object(start, "_httpx_with_retry", AsyncMock()) as mock_post, \
+                patch.object(endpoint, "ensure_session", AsyncMock(return_value=None)):
+            result = await endpoint.receive_anonymous(mock_update, context)
+        assert result == ConversationHandler.END
+        mock_post.assert_not_called()
+        mock_update.callback_query.edit_message_text.assert_called_once_with("You must first log in with /login.")
+        assert not submissions.is_in_flight(99)
+
+    @pytest.mark.asyncio
+    async def test_upload_error_ends_conversation(self, mock_update):
+        """Un errore di rete durante l'upload viene segnalato all'utente"""
+        context = MagicMock()
+        context.user_data = {}
+        new_draft(context.user_data)
+        with patch.object(start, "_httpx_with_retry", AsyncMock(side_effect=httpx.ReadTimeout("slow"))), \
+                patch.object(endpoint, "ensure_session", AsyncMock(return_value="token")):
+            result = await endpoint.receive_anonymous(mock_update, context)
+        assert result == ConversationHandler.END
+        assert "Could not reach the server" in mock_update.callback_query.edit_message_text.call_args.args[0]
+        assert context.user_data == {}
+        assert not submissions.is_in_flight(99)
+
+
+    @pytest.mark.asyncio
+    async def test_dropped_photos_are_reported(self, mock_update):
+        """L'utente viene avvisato delle foto non allegate"""
+        class TelegramFile:
+            async def download_to_memory(self, out):
+                out.write(b"x" * 100)
+
+        context = MagicMock()
+        context.user_data = {}
+        draft = new_draft(context.user_data)
+        kept = await PhotoBuffer("kept", "a.jpg").download(TelegramFile())
+        # A failed download leaves its buffer closed
+        lost = PhotoBuffer("lost", "b.jpg")
+        lost.close()
+        draft.photos = [kept, lost]
+        response = MagicMock(status_code=201)
+        with patch.object(start, "_httpx_with_retry", AsyncMock(return_value=response)), \
+                patch.object(endpoint, "ensure_session", AsyncMock(return_value="token")):
+            await endpoint.receive_anonymous(mock_update, context)
+        text = mock_update.callback_query.edit_message_text.call_args.args[0]
+        assert "Report sent with 1 photo(s)" in text
+        assert "1 photo(s) could not be retrieved" in text
+
+class TestRequestRetry:
+    """Test per i retry delle richieste al backend"""
+
+    @staticmethod
+    def client(error):
+        calls = []
+
+        def handler(request):
+            calls.append(request)
+            raise error("failed", request=request)
+
+        return httpx.AsyncClient(transport=httpx.MockTransport(handler)), calls
+
+    @pytest.mark.asyncio
+    async def test_sent_post_is_not_retried(self, monkeypatch):
+        """Una POST che può essere arrivata al server non viene ripetuta"""
+        monkeypatch.setattr(asyncio, "sleep", AsyncMock())
+        client, calls = self.client(httpx.ReadTimeout)
+        async with client:
+            with pytest.raises(httpx.ReadTimeout):
+                await start._request_with_retry(client, "POST", "http://backend/reports", content=b"x")
+        assert len(calls) == 1
+
+    @pytest.mark.asyncio
+    async def test_connect_errors_are_retried(self, monkeypatch):
+        """Gli errori di connessione e le GET vengono ripetuti"""
+        monkeypatch.setattr(asyncio, "sleep", AsyncMock())
+        client, calls = self.client(httpx.ConnectError)
+        async with client:
+            with pytest.raises(httpx.ConnectError):
+                await start._request_with_retry(client, "POST", "http://backend/reports", content=b"x")
+        assert len(calls) == 3
+        client, calls = self.client(httpx.ReadTimeout)
+        async with client:
+            with pytest.raises(httpx.ReadTimeout):
+                await start._request_with_retry(client, "GET", "http://backend/reports")
+        assert len(calls) == 3
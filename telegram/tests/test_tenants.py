@@ -0,0 +1,204 @@
+import httpx
+import json
+import pytest
+from unittest.mock import AsyncMock, MagicMock
+import sys
+import os
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import endpoint, metrics, nearby, snapshot, start, tenants
+from Functions.draft import new_draft
+from telegram.ext import ConversationHandler
+from Functions import help as help_menu
+
+
+SQUARE = [[7.0, 44.0], [7.1, 44.0], [7.1, 44.1], [7.0, 44.1], [7.0, 44.0]]
+
+
+class FakeResponse:
+    def __init__(self, status_code=200, payload=None, headers=None):
+        self.status_code = status_code
+        self._payload = payload
+        self.headers = headers or {}
+
+    def json(self):
+        return self._payload
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise RuntimeError(self.status_code)
+
+
+@pytest.fixture
+def two_cities(tmp_path):
+    """Torino (confine reale) più una città quadrata con un proprio backend"""
+    boundary = tmp_path / "square.json"
+    boundary.write_text(json.dumps([
+        {"addresstype": "town", "geojson": {"type": "Polygon", "coordinates": [SQUARE]}}
+    ]))
+    config = tmp_path / "tenants.json"
+    config.write_text(json.dumps([
+        {"name": "torino", "label": "Turin", "server_url": "http://torino:5000"},
+        {"name": "quadra", "server_url": "quadra.example:5000", "geofence_path": "square.json",
+         "addresstype": "town", "max_requests": 2, "max_uploads": 1},
+    ]))
+    tenants.configure(tenants.load(str(config)))
+    yield
+    tenants.chats.clear()
+    tenants.configure(tenants.load(""))
+
+
+class TestRegistry:
+    """Test per la configurazione e l'instradamento dei tenant"""
+
+    def test_single_tenant_without_config(self):
+        only = tenants.load("")
+        assert len(only) == 1
+        assert only[0].base_url == start.BASE_URL
+
+    def test_config_file(self, two_cities, tmp_path):
+        quadra = tenants.get("quadra")
+        assert quadra.base_url == "http://quadra.example:5000/api/v1"
+        assert quadra.label == "Quadra"
+        assert quadra.geofence_path == str(tmp_path / "square.json")
+        assert tenants.default().name == "torino"
+
+    def test_chat_routing(self, two_cities):
+        assert tenants.for_chat(42).name == "torino"
+        tenants.assign(42, "quadra")
+        assert tenants.for_chat(42).name == "quadra"
+        assert tenants.for_chat(7).name == "torino"
+        # Back to the default: nothing left to remember
+        tenants.assign(42, "torino")
+        assert tenants.chats == {}
+
+    def test_removed_tenant_releases_its_chats(self, two_cities):
+        tenants.assign(42, "quadra")
+        tenants.configure([tenants.default()])
+        assert tenants.for_chat(42).name == "torino"
+
+    def test_geofence_per_tenant(self, two_cities):
+        torino, quadra = tenants.get("torino"), tenants.get("quadra")
+        assert torino.contains(45.0703, 7.6869) and not quadra.contains(45.0703, 7.6869)
+        assert quadra.contains(44.05, 7.05) and not torino.contains(44.05, 7.05)
+
+
+    def test_recent_photos_per_tenant(self, two_cities):
+        """Una foto inviata in una città non è un duplicato nell'altra"""
+        tenants.get("torino").recent_photos.add(0x0123456789ABCDEF)
+        assert tenants.get("torino").recent_photos.nearest(0x0123456789ABCDEF) is not None
+        assert tenants.get("quadra").recent_photos.nearest(0x0123456789ABCDEF) is None
+
+class TestCitySwitch:
+    """Test per il cambio di città durante una segnalazione"""
+
+    @pytest.mark.asyncio
+    async def test_switch_discards_draft(self, two_cities):
+        update = MagicMock()
+        update.effective_chat.id = 42
+        update.callback_query.data = "city_quadra"
+        update.callback_query.answer = AsyncMock()
+        update.callback_query.edit_message_text = AsyncMock()
+        update.callback_query.message.reply_text = AsyncMock()
+        context = MagicMock()
+        context.user_data = {}
+        new_draft(context.user_data).category = "WASTE"
+        assert await endpoint.handle_city_during_report(update, context) == ConversationHandler.END
+        assert "draft" not in context.user_data
+        assert tenants.for_chat(42).name == "quadra"
+        # Same city again: the report goes on
+        new_draft(context.user_data)
+        assert await endpoint.handle_city_during_report(update, context) is None
+        assert "draft" in context.user_data
+
+
+class TestTenantRequests:
+    """Test per le richieste al backend di ciascun tenant"""
+
+    @pytest.mark.asyncio
+    async def test_request_goes_to_tenant_backend(self, two_cities, monkeypatch):
+        calls = []
+
+        async def fake_request(method, url, **kwargs):
+            calls.append((method, url))
+            return FakeResponse()
+
+        monkeypatch.setattr(start, "_httpx_with_retry", fake_request)
+        metrics.reset()
+        await tenants.get("quadra").request("GET", "/reports")
+        await tenants.get("torino").request("POST", "/auth/telegram")
+        assert calls == [
+            ("GET", "http://quadra.example:5000/api/v1/reports"),
+            ("POST", "http://torino:5000/api/v1/auth/telegram"),
+        ]
+        assert metrics.counters["tenants.quadra.requests"] == 1
+        assert metrics.timings["tenants.torino.request_seconds"][0] == 1
+
+    @pytest.mark.asyncio
+    async def test_tenants_share_one_client(self, two_cities):
+        """Tutti i tenant usano lo stesso pool di connessioni"""
+        hosts = []
+
+        def handler(request):
+            hosts.append(request.url.host)
+            return httpx.Response(200, json=[])
+
+        client = await start.open_http_client(transport=httpx.MockTransport(handler))
+        try:
+            assert await start.open_http_client() is client
+            await tenants.get("quadra").request("GET", "/faqs/")
+            await tenants.get("torino").request("GET", "/faqs/")
+            assert hosts == ["quadra.example", "torino"]
+        finally:
+            await start.close_http_client()
+        assert start._client is None
+
+    @pytest.mark.asyncio
+    async def test_faq_cache_per_tenant(self, two_cities, monkeypatch):
+        """Ogni città ha le proprie FAQ, in cache separate"""
+        async def fake_request(method, url, **kwargs):
+            return FakeResponse(payload=[{"question": url, "answer": "A"}])
+
+        monkeypatch.setattr(start, "_httpx_with_retry", fake_request)
+        torino = await help_menu.get_faq_items(tenants.get("torino"))
+        quadra = await help_menu.get_faq_items(tenants.get("quadra"))
+        assert torino[0]["question"].startswith("http://torino")
+        assert quadra[0]["question"].startswith("http://quadra")
+        assert tenants.get("torino").faq_cache["items"] is torino
+
+    @pytest.mark.asyncio
+    async def test_nearby_index_per_tenant(self, two_cities, monkeypatch):
+        async def fake_request(method, url, **kwargs):
+            lat = 44.05 if "quadra" in url else 45.07
+            return FakeResponse(payload=[{"id": 1, "location": {"coordinates": {"latitude": lat, "longitude": 7.05}}}])
+
+        monkeypatch.setattr(start, "_httpx_with_retry", fake_request)
+        nearby.indexes.clear()
+        await nearby.refresh(tenants.get("quadra"))
+        await nearby.refresh(tenants.get("torino"))
+        assert nearby.index_for(tenants.get("quadra")).reports[1].lat == 44.05
+        assert nearby.index_for(tenants.get("torino")).reports[1].lat == 45.07
+        nearby.indexes.clear()
+
+
+class TestTenantSnapshot:
+    """Test per lo snapshot dello stato dei tenant"""
+
+    def test_roundtrip(self, two_cities, tmp_path):
+        path = str(tmp_path / "bot.snapshot")
+        tenants.get("quadra").set_categories(["WASTE"])
+        tenants.get("quadra").faq_cache.update(items=[{"question": "Q", "answer": "A"}], fetched_at=time.time())
+        tenants.assign(42, "quadra")
+        snapshot.save(path)
+
+        tenants.get("quadra").set_categories([])
+        tenants.get("quadra").faq_cache.update(items=None, fetched_at=0.0)
+        tenants.chats.clear()
+
+        assert snapshot.load(path)
+        assert tenants.get("quadra").categories == ["WASTE"]
+        assert tenants.get("torino").categories == []
+        assert tenants.get("quadra").faq_cache["items"][0]["answer"] == "A"
+        assert tenants.for_chat(42).name == "quadra"
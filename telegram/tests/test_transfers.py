@@ -0,0 +1,114 @@
+import asyncio
+import time
+import pytest
+import sys
+import os
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from Functions import metrics
+from Functions.transfers import TokenBucket, TransferScheduler
+
+
+async def run_transfers(scheduler, chats, duration=0.02):
+    running = {"now": 0, "peak": 0, "per_chat": {}, "peak_per_chat": 0}
+
+    async def transfer(chat_id):
+        async with scheduler.slot(chat_id, 100) as slot:
+            running["now"] += 1
+            running["per_chat"][chat_id] = running["per_chat"].get(chat_id, 0) + 1
+            running["peak"] = max(running["peak"], running["now"])
+            running["peak_per_chat"] = max(running["peak_per_chat"], running["per_chat"][chat_id])
+            await asyncio.sleep(duration)
+            running["now"] -= 1
+            running["per_chat"][chat_id] -= 1
+            slot.done(100)
+
+    await asyncio.gather(*(transfer(chat) for chat in chats))
+    return running
+
+
+class TestTransferScheduler:
+    """Test per lo scheduler dei trasferimenti di foto"""
+
+    @pytest.mark.asyncio
+    async def test_global_limit(self):
+        """Non più di max_concurrent trasferimenti alla volta"""
+        scheduler = TransferScheduler("test", max_concurrent=3, per_chat=10, bytes_per_s=0)
+        running = await run_transfers(scheduler, range(10))
+        assert running["peak"] == 3
+        assert scheduler.active == 0 and scheduler.queued == 0
+
+    @pytest.mark.asyncio
+    async def test_per_chat_limit(self):
+        """Una chat non occupa più dei propri slot, le altre non aspettano"""
+        scheduler = TransferScheduler("test", max_concurrent=10, per_chat=2, bytes_per_s=0)
+        running = await run_transfers(scheduler, [1] * 6 + [2, 3])
+        assert running["peak_per_chat"] == 2
+        assert running["peak"] == 4
+        assert scheduler._chats == {}
+
+    @pytest.mark.asyncio
+    async def test_per_tenant_limit(self):
+        """Un tenant con limite non occupa tutti gli slot condivisi"""
+        scheduler = TransferScheduler("test", max_concurrent=4, per_chat=10, bytes_per_s=0)
+        scheduler.set_tenant_limit("busy", 1)
+        running = {"busy": 0, "busy_peak": 0, "other_peak": 0, "other": 0}
+
+        async def transfer(chat_id, tenant):
+            async with scheduler.slot(chat_id, 100, tenant) as slot:
+                running[tenant] += 1
+                running[f"{tenant}_peak"] = max(running[f"{tenant}_peak"], running[tenant])
+                await asyncio.sleep(0.02)
+                running[tenant] -= 1
+                slot.done(100)
+
+        await asyncio.gather(*(transfer(i, "busy") for i in range(4)), *(transfer(10 + i, "other") for i in range(3)))
+        assert running["busy_peak"] == 1
+        assert running["other_peak"] == 3
+        assert metrics.counters["tenants.busy.transfers.test.bytes"] >= 400
+
+    @pytest.mark.asyncio
+    async def test_metrics(self):
+        """Attesa in coda e byte trasferiti vengono registrati"""
+        metrics.reset()
+        scheduler = TransferScheduler("test", max_concurrent=1, per_chat=1, bytes_per_s=0)
+        await run_transfers(scheduler, [1, 2])
+        assert metrics.counters["transfers.test.bytes"] == 200
+        assert metrics.timings["transfers.test.queue_wait_seconds"][0] == 2
+        assert metrics.timings["transfers.test.queue_wait_seconds"][2] > 0.01
+
+    @pytest.mark.asyncio
+    async def test_failed_transfer_releases_slots(self):
+        """Un trasferimento fallito libera i propri slot"""
+        scheduler = TransferScheduler("test", max_concurrent=1, per_chat=1, bytes_per_s=0)
+        with pytest.raises(RuntimeError):
+            async with scheduler.slot(1, 10):
+                raise RuntimeError("network down")
+        async with scheduler.slot(1, 10):
+            pass
+        assert scheduler.active == 0
+
+
+class TestTokenBucket:
+    """Test per il controllo della banda"""
+
+    @pytest.mark.asyncio
+    async def test_bandwidth_admission(self):
+        """Oltre il budget i trasferimenti attendono che il debito sia pagato"""
+        bucket = TokenBucket(rate=10_000)
+        started = time.perf_counter()
+        await bucket.consume(10_000)  # within the initial burst
+        await bucket.consume(2_000)   # admitted, puts the bucket in debt
+        assert time.perf_counter() - started < 0.05
+        await bucket.consume(100)     # waits for the 2000 B of debt
+        assert time.perf_counter() - started >= 0.18
+
+    @pytest.mark.asyncio
+    async def test_unlimited(self):
+        """Con rate 0 non c'è limite di banda"""
+        bucket = TokenBucket(rate=0)
+        started = time.perf_counter()
+        await bucket.consume(10**9)
+        await bucket.consume(10**9)
+        assert time.perf_counter() - started < 0.01